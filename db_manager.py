@@ -1,7 +1,14 @@
 import os
+import json
+import time
 import datetime
-from pymongo import MongoClient, ASCENDING, DESCENDING
+from pymongo import MongoClient, ASCENDING, DESCENDING, TEXT, UpdateOne
 import logging
+from side_store import side_hash, encode_modified_side, apply_side_patch, dump_side
+from profiling import profile_files_in_zip
+from log_index import extract_entries, text_search_query
+from metrics import timed_query, SAVE_RUN_SECONDS, SAVE_RUN_BYTES
+from driver_cache import DEFAULT_BROWSER
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -58,6 +65,8 @@ def get_mongo_uri():
     logger.warning(f"⚠️ Using fallback MongoDB URI: {fallback_uri}")
     return fallback_uri
 
+JOB_RETENTION_SECONDS = 7 * 24 * 3600  # Finished jobs (and any unclaimed result ZIPs) expire after a week
+
 # MongoDB connection with connection pooling and error handling
 MONGO_URI = get_mongo_uri()
 logger.info(f"🔗 Initializing MongoDB connection with URI: {MONGO_URI[:30]}...")
@@ -81,6 +90,14 @@ try:
     
     db = client["side_test_db"]
     runs_collection = db["runs"]
+    side_files_collection = db["side_files"]
+    baselines_collection = db["screenshot_baselines"]
+    step_history_collection = db["step_history"]
+    app_settings_collection = db["app_settings"]
+    load_tests_collection = db["load_tests"]
+    run_log_collection = db["run_log_index"]
+    jobs_collection = db["jobs"]
+    workers_collection = db["workers"]
     logger.info("✅ Database and collection initialized successfully!")
     
     # Create indexes for better query performance
@@ -89,6 +106,29 @@ try:
         runs_collection.create_index([("timestamp", DESCENDING)])
         runs_collection.create_index([("app_name", ASCENDING)])
         runs_collection.create_index([("app_name", ASCENDING), ("timestamp", DESCENDING)])
+        runs_collection.create_index([("original_side_hash", ASCENDING)])
+        runs_collection.create_index([("app_name", ASCENDING), ("side_name", ASCENDING), ("timestamp", DESCENDING)])
+        baselines_collection.create_index(
+            [("app_name", ASCENDING), ("side_name", ASCENDING), ("step", ASCENDING)], unique=True
+        )
+        # Step history is per browser; entries from before browser tagging were Chrome runs
+        if "app_name_1_side_name_1_key_1" in step_history_collection.index_information():
+            step_history_collection.drop_index("app_name_1_side_name_1_key_1")
+        step_history_collection.update_many({"browser": {"$exists": False}}, {"$set": {"browser": DEFAULT_BROWSER}})
+        step_history_collection.create_index(
+            [("app_name", ASCENDING), ("side_name", ASCENDING), ("browser", ASCENDING), ("key", ASCENDING)],
+            unique=True
+        )
+        # No stemming or stop words - log text, selectors and URLs are matched as written
+        run_log_collection.create_index(
+            [("text", TEXT), ("target", TEXT)], weights={"text": 2, "target": 1},
+            default_language="none", name="run_log_text"
+        )
+        run_log_collection.create_index([("run_id", ASCENDING)])
+        jobs_collection.create_index([("status", ASCENDING), ("created", ASCENDING)])
+        jobs_collection.create_index([("status", ASCENDING), ("lease_until", ASCENDING)])
+        # Failed/cancelled jobs and results nobody collected would otherwise pile up
+        jobs_collection.create_index([("finished", ASCENDING)], expireAfterSeconds=JOB_RETENTION_SECONDS)
         logger.info("✅ Database indexes created successfully!")
     except Exception as e:
         logger.warning(f"⚠️ Could not create indexes: {e}")
@@ -99,6 +139,14 @@ except Exception as e:
     client = None
     db = None
     runs_collection = None
+    side_files_collection = None
+    baselines_collection = None
+    step_history_collection = None
+    app_settings_collection = None
+    load_tests_collection = None
+    run_log_collection = None
+    jobs_collection = None
+    workers_collection = None
 
 # Log final database status
 if runs_collection is not None:
@@ -106,13 +154,114 @@ if runs_collection is not None:
 else:
     logger.warning("🚫 Database Status: NOT AVAILABLE (read-only mode)")
 
+# ============================================================================
+# SIDE FILE STORE
+# ============================================================================
+@timed_query
+def put_side_file(side_bytes):
+    """Store SIDE bytes once by content hash and take a reference on them."""
+    if side_files_collection is None or not side_bytes:
+        return None
+    
+    digest = side_hash(side_bytes)
+    side_files_collection.update_one(
+        {"_id": digest},
+        {
+            "$inc": {"ref_count": 1},
+            "$set": {"last_used": datetime.datetime.utcnow()},
+            "$setOnInsert": {
+                "data": side_bytes,
+                "size": len(side_bytes),
+                "created": datetime.datetime.utcnow()
+            }
+        },
+        upsert=True
+    )
+    return digest
+
+@timed_query
+def release_side_files(hashes):
+    """Drop one reference per hash and delete SIDE files nobody points to."""
+    if side_files_collection is None or not hashes:
+        return 0
+    
+    counts = {}
+    for digest in hashes:
+        if digest:
+            counts[digest] = counts.get(digest, 0) + 1
+    
+    for digest, count in counts.items():
+        side_files_collection.update_one({"_id": digest}, {"$inc": {"ref_count": -count}})
+    result = side_files_collection.delete_many({"_id": {"$in": list(counts)}, "ref_count": {"$lte": 0}})
+    if result.deleted_count:
+        logger.info(f"Removed {result.deleted_count} unreferenced SIDE files")
+    return result.deleted_count
+
+def _side_hashes_for(query):
+    """Collect the SIDE file references held by runs matching a query."""
+    hashes = []
+    cursor = runs_collection.find(query, {"original_side_hash": 1, "modified_side_hash": 1})
+    for doc in cursor:
+        hashes.extend(h for h in (doc.get("original_side_hash"), doc.get("modified_side_hash")) if h)
+    return hashes
+
+@timed_query
+def _delete_runs(query):
+    """Delete runs, release the SIDE files they reference and drop their log index entries."""
+    hashes = _side_hashes_for(query)
+    run_ids = [doc["_id"] for doc in runs_collection.find(query, {"_id": 1})] if query else None
+    result = runs_collection.delete_many(query)
+    try:
+        release_side_files(hashes)
+    except Exception as e:
+        logger.warning(f"⚠️ Could not release SIDE files: {e}")
+    try:
+        run_log_collection.delete_many({"run_id": {"$in": run_ids}} if run_ids is not None else {})
+    except Exception as e:
+        logger.warning(f"⚠️ Could not remove log index entries: {e}")
+    return result
+
+@timed_query
+def hydrate_side_fields(runs):
+    """Fill original_side/modified_side bytes on runs that only hold hashes."""
+    if side_files_collection is None:
+        return runs
+    
+    wanted = set()
+    for run in runs:
+        for field in ("original_side_hash", "modified_side_hash"):
+            if run.get(field):
+                wanted.add(run[field])
+    if not wanted:
+        return runs
+    
+    # One batched lookup - repeat runs of the same SIDE share a single document
+    blobs = {doc["_id"]: doc["data"] for doc in side_files_collection.find({"_id": {"$in": list(wanted)}})}
+    for run in runs:
+        original_bytes = blobs.get(run.get("original_side_hash"))
+        if original_bytes is not None and not run.get("original_side"):
+            run["original_side"] = original_bytes
+        if run.get("modified_side"):
+            continue
+        if run.get("modified_side_hash"):
+            run["modified_side"] = blobs.get(run["modified_side_hash"])
+        elif run.get("modified_side_patch") and original_bytes is not None:
+            try:
+                original = json.loads(original_bytes)
+                run["modified_side"] = dump_side(apply_side_patch(original, run["modified_side_patch"]))
+            except Exception as e:
+                logger.warning(f"⚠️ Could not rebuild modified SIDE for run {run.get('_id')}: {e}")
+    return runs
+
 def save_run(app_name, user_params, param_map, screenshot_steps, zip_bytes, 
-             original_side_bytes=None, modified_side_bytes=None, side_name=None):
+             original_side_bytes=None, modified_side_bytes=None, side_name=None,
+             visual_diffs=None, run_summary=None):
     """Save test run to database with error handling."""
     if runs_collection is None:
         logger.warning("Database not available - skipping save")
         return None
     
+    save_start = time.perf_counter()
     try:
         logger.info(f"Saving run for app: {app_name}")
         run_doc = {
@@ -123,22 +272,508 @@ def save_run(app_name, user_params, param_map, screenshot_steps, zip_bytes,
             "screenshot_steps": screenshot_steps or [],
             "timestamp": datetime.datetime.utcnow(),
             "zip_file": zip_bytes,
-            "original_side": original_side_bytes,
-            "modified_side": modified_side_bytes,
             # Add metadata for better querying
             "zip_size": len(zip_bytes) if zip_bytes else 0,
             "has_screenshots": bool(screenshot_steps),
-            "param_count": len(param_map) if param_map else 0
+            "param_count": len(param_map) if param_map else 0,
+            "original_side_size": len(original_side_bytes) if original_side_bytes else 0,
+            "modified_side_size": len(modified_side_bytes) if modified_side_bytes else 0,
+            "visual_diffs": visual_diffs or [],
+            "visual_changes": sum(1 for d in (visual_diffs or []) if d.get("status") == "changed"),
+            "profile_files": profile_files_in_zip(zip_bytes)
         }
         
-        result = runs_collection.insert_one(run_doc)
+        if run_summary:
+            run_doc["status"] = run_summary.get("status")
+            run_doc["step_results"] = run_summary.get("steps", [])
+            run_doc["run_error"] = run_summary.get("error")
+            run_doc["run_duration"] = run_summary.get("duration")
+            run_doc["checkpoint"] = run_summary.get("checkpoint")
+            run_doc["resume"] = run_summary.get("resume")
+            run_doc["test_results"] = run_summary.get("tests", [])
+            run_doc["workers"] = run_summary.get("workers", 1)
+            run_doc["browser"] = run_summary.get("browser")
+            run_doc["run_order"] = run_summary.get("run_order")
+            run_doc["shards"] = run_summary.get("shards")
+            run_doc["network"] = run_summary.get("network")
+            run_doc["resources"] = run_summary.get("resources")
+        
+        # SIDE files are stored once by hash; modified SIDEs as a patch on the original
+        run_doc["original_side_hash"] = put_side_file(original_side_bytes)
+        try:
+            if modified_side_bytes:
+                patch = encode_modified_side(original_side_bytes, modified_side_bytes)
+                if patch is not None and run_doc["original_side_hash"]:
+                    run_doc["modified_side_patch"] = patch
+                else:
+                    run_doc["modified_side_hash"] = put_side_file(modified_side_bytes)
+            result = runs_collection.insert_one(run_doc)
+        except Exception:
+            # No run points at them - give back the references taken above
+            release_side_files([run_doc["original_side_hash"], run_doc.get("modified_side_hash")])
+            raise
         logger.info(f"✅ Saved run for {app_name} with ID: {result.inserted_id}")
+        SAVE_RUN_SECONDS.observe(time.perf_counter() - save_start)
+        SAVE_RUN_BYTES.observe(run_doc["zip_size"] + run_doc["original_side_size"] + run_doc["modified_side_size"])
+        
+        if run_summary and run_summary.get("steps"):
+            try:
+                record_step_outcomes(run_doc["app_name"], side_name, run_summary["steps"], run_summary.get("browser"))
+            except Exception as e:
+                logger.warning(f"⚠️ Could not update step history: {e}")
+        try:
+            index_run_logs(result.inserted_id, run_doc, zip_bytes, run_summary)
+        except Exception as e:
+            logger.warning(f"⚠️ Could not index run logs: {e}")
         return result.inserted_id
         
     except Exception as e:
         logger.error(f"❌ Failed to save run: {e}")
         raise
 
+# ============================================================================
+# LOG SEARCH
+# ============================================================================
+@timed_query
+def index_run_logs(run_id, run_doc, zip_bytes, run_summary=None):
+    """Store a run's step errors, notable log lines and URLs in the text-indexed collection."""
+    if run_log_collection is None:
+        return 0
+    entries = extract_entries(zip_bytes, run_summary)
+    if not entries:
+        return 0
+    for entry in entries:
+        entry.update(run_id=run_id, app_name=run_doc["app_name"], side_name=run_doc.get("side_name"),
+                     timestamp=run_doc["timestamp"])
+    run_log_collection.insert_many(entries, ordered=False)
+    return len(entries)
+
+@timed_query
+def search_run_logs(query, app_name=None, days=None, kinds=None, limit=50):
+    """Runs whose errors, log lines or URLs match the query, best matches first."""
+    search = text_search_query(query or "")
+    if run_log_collection is None or not search:
+        return []
+    
+    try:
+        match = {"$text": {"$search": search}}
+        if app_name:
+            match["app_name"] = app_name
+        if days:
+            match["timestamp"] = {"$gte": datetime.datetime.utcnow() - datetime.timedelta(days=days)}
+        if kinds:
+            match["kind"] = {"$in": list(kinds)}
+        cursor = run_log_collection.find(match, {"score": {"$meta": "textScore"}}).sort(
+            [("score", {"$meta": "textScore"}), ("timestamp", DESCENDING)]
+        ).limit(limit)
+        return list(cursor)
+    except Exception as e:
+        logger.error(f"Failed to search run logs for {query!r}: {e}")
+        return []
+
+# ============================================================================
+# SCREENSHOT BASELINES
+# ============================================================================
+@timed_query
+def get_baselines(app_name, side_name):
+    """Get {step: {"hash", "image"}} baselines for an app's SIDE file."""
+    if baselines_collection is None:
+        return {}
+    
+    try:
+        cursor = baselines_collection.find({"app_name": app_name, "side_name": side_name})
+        return {doc["step"]: {"hash": doc.get("hash"), "image": doc.get("image")} for doc in cursor}
+    except Exception as e:
+        logger.error(f"Failed to get baselines for {app_name}/{side_name}: {e}")
+        return {}
+
+@timed_query
+def set_baseline(app_name, side_name, step, image_bytes, image_hash):
+    """Create or replace the baseline screenshot for one step."""
+    if baselines_collection is None:
+        return False
+    
+    try:
+        baselines_collection.update_one(
+            {"app_name": app_name, "side_name": side_name, "step": step},
+            {"$set": {"image": image_bytes, "hash": image_hash, "updated": datetime.datetime.utcnow()}},
+            upsert=True
+        )
+        logger.info(f"Baseline updated for {app_name}/{side_name}/{step}")
+        return True
+    except Exception as e:
+        logger.error(f"Failed to set baseline for {app_name}/{side_name}/{step}: {e}")
+        return False
+
+# ============================================================================
+# APP SETTINGS
+# ============================================================================
+@timed_query
+def get_app_settings(app_name):
+    """Get per-app settings (e.g. network_policy)."""
+    if app_settings_collection is None or not app_name:
+        return {}
+    
+    try:
+        doc = app_settings_collection.find_one({"_id": app_name})
+        return doc.get("settings", {}) if doc else {}
+    except Exception as e:
+        logger.error(f"Failed to get settings for app {app_name}: {e}")
+        return {}
+
+@timed_query
+def save_app_settings(app_name, **settings):
+    """Update one or more per-app settings."""
+    if app_settings_collection is None or not app_name:
+        return False
+    
+    try:
+        app_settings_collection.update_one(
+            {"_id": app_name},
+            {"$set": {**{f"settings.{k}": v for k, v in settings.items()}, "updated": datetime.datetime.utcnow()}},
+            upsert=True
+        )
+        logger.info(f"Saved settings {list(settings)} for app: {app_name}")
+        return True
+    except Exception as e:
+        logger.error(f"Failed to save settings for app {app_name}: {e}")
+        return False
+
+@timed_query
+def delete_app_data(app_name):
+    """Delete all screenshot baselines, step history, settings and load tests for an app."""
+    if baselines_collection is None or not app_name:
+        return 0
+    
+    try:
+        step_history_collection.delete_many({"app_name": app_name})
+        app_settings_collection.delete_one({"_id": app_name})
+        load_tests_collection.delete_many({"app_name": app_name})
+        return baselines_collection.delete_many({"app_name": app_name}).deleted_count
+    except Exception as e:
+        logger.error(f"Failed to delete baselines for app {app_name}: {e}")
+        return 0
+
+# ============================================================================
+# STEP HISTORY & FLAKINESS
+# ============================================================================
+STEP_HISTORY_WINDOW = 20
+STEP_OUTCOME_CODES = {"passed": "P", "failed": "F", "flaky": "R"}
+
+def _browser_filter(browser):
+    """Runs saved before browser tagging ran on Chrome."""
+    browser = browser or DEFAULT_BROWSER
+    return {"$in": [browser, None]} if browser == DEFAULT_BROWSER else browser
+
+def classify_step_history(outcomes):
+    """Classify a step from its recent outcome codes (oldest first).
+    
+    P = passed, F = failed, R = passed only after a retry.
+    A step that passes on retry or keeps flipping between pass and fail is flaky;
+    one that broke and stayed broken is failing.
+    """
+    if not outcomes:
+        return "unknown"
+    if "R" in outcomes:
+        return "flaky"
+    flips = sum(1 for prev, cur in zip(outcomes, outcomes[1:]) if prev != cur)
+    if "F" in outcomes and "P" in outcomes and flips >= 2:
+        return "flaky"
+    return "failing" if outcomes[-1] == "F" else "stable"
+
+@timed_query
+def record_step_outcomes(app_name, side_name, steps, browser=None):
+    """Append this run's step outcomes to the rolling per-step history of their browser."""
+    if step_history_collection is None or not steps:
+        return
+    
+    now = datetime.datetime.utcnow()
+    operations = []
+    for step in steps:
+        code = STEP_OUTCOME_CODES.get(step.get("status"))
+        if not code or not step.get("key"):
+            continue  # skipped/unknown commands say nothing about flakiness
+        operations.append(UpdateOne(
+            {"app_name": app_name, "side_name": side_name, "browser": browser or DEFAULT_BROWSER, "key": step["key"]},
+            {
+                "$push": {"outcomes": {"$each": [code], "$slice": -STEP_HISTORY_WINDOW}},
+                "$inc": {"runs": 1, "failures": 1 if code == "F" else 0, "retried_passes": 1 if code == "R" else 0},
+                "$set": {"command": step.get("command"), "target": step.get("target"),
+                         "test": step.get("test"), "updated": now}
+            },
+            upsert=True
+        ))
+    if operations:
+        step_history_collection.bulk_write(operations, ordered=False)
+
+@timed_query
+def get_step_history(app_name, side_name, browser=None):
+    """Get per-step outcome history with a flakiness classification (one browser, or all)."""
+    if step_history_collection is None:
+        return []
+    
+    try:
+        query = {"app_name": app_name, "side_name": side_name}
+        if browser:
+            query["browser"] = browser
+        cursor = step_history_collection.find(query)
+        history = []
+        for doc in cursor:
+            doc["classification"] = classify_step_history(doc.get("outcomes", []))
+            history.append(doc)
+        return history
+    except Exception as e:
+        logger.error(f"Failed to get step history for {app_name}/{side_name}: {e}")
+        return []
+
+def get_flaky_steps(app_name, side_name, browser=None):
+    """Get the step keys currently classified as flaky on a browser (Chrome by default)."""
+    return [h["key"] for h in get_step_history(app_name, side_name, browser or DEFAULT_BROWSER)
+            if h["classification"] == "flaky"]
+
+@timed_query
+def get_test_stats(app_name, side_name, limit=10, browser=None):
+    """Summarize recent runs of a SIDE file on one browser (Chrome by default) for the test scheduler.
+    
+    Returns {"durations": {test_key: mean seconds}, "failed": [test keys failed last run],
+    "fingerprints": {test_key: fingerprint from the last run}}.
+    """
+    stats = {"durations": {}, "failed": [], "fingerprints": {}}
+    if runs_collection is None or not side_name:
+        return stats
+    
+    try:
+        cursor = runs_collection.find(
+            {"app_name": app_name, "side_name": side_name, "test_results.0": {"$exists": True},
+             "browser": _browser_filter(browser)},
+            {"test_results": 1}
+        ).sort("timestamp", DESCENDING).limit(limit)
+        
+        totals = {}
+        for run_idx, run in enumerate(cursor):
+            for test in run.get("test_results", []):
+                key = test.get("key")
+                if not key:
+                    continue
+                total, count = totals.get(key, (0.0, 0))
+                totals[key] = (total + test.get("duration", 0.0), count + 1)
+                if run_idx == 0:
+                    stats["fingerprints"][key] = test.get("fingerprint")
+                    if test.get("status") == "failed":
+                        stats["failed"].append(key)
+        stats["durations"] = {key: total / count for key, (total, count) in totals.items() if count}
+    except Exception as e:
+        logger.error(f"Failed to get test stats for {app_name}/{side_name}: {e}")
+    return stats
+
+@timed_query
+def get_page_metric_history(app_name, side_name, limit=20):
+    """Per-step page metrics for recent runs of a SIDE file, oldest first.
+    
+    Returns [{"run_id", "timestamp", "steps": {step_key: step_result_with_metrics}}].
+    """
+    if runs_collection is None or not side_name:
+        return []
+    
+    try:
+        cursor = runs_collection.find(
+            {"app_name": app_name, "side_name": side_name, "step_results.metrics": {"$exists": True}},
+            {"timestamp": 1, "step_results": 1}
+        ).sort("timestamp", DESCENDING).limit(limit)
+        
+        history = []
+        for run in cursor:
+            steps = {s["key"]: s for s in run.get("step_results", []) if s.get("metrics") and s.get("key")}
+            history.append({"run_id": run["_id"], "timestamp": run.get("timestamp"), "steps": steps})
+        return history[::-1]
+    except Exception as e:
+        logger.error(f"Failed to get page metric history for {app_name}/{side_name}: {e}")
+        return []
+
+@timed_query
+def get_latest_run_zip(app_name, side_name):
+    """Get the results ZIP of the most recent run of a SIDE file."""
+    if runs_collection is None or not app_name or not side_name:
+        return None
+    
+    try:
+        run = runs_collection.find_one(
+            {"app_name": app_name, "side_name": side_name},
+            {"zip_file": 1},
+            sort=[("timestamp", DESCENDING)]
+        )
+        return run.get("zip_file") if run else None
+    except Exception as e:
+        logger.error(f"Failed to get latest run for {app_name}/{side_name}: {e}")
+        return None
+
+@timed_query
+def save_load_test(app_name, side_name, settings, report):
+    """Save a load test report."""
+    if load_tests_collection is None:
+        logger.warning("Database not available - skipping load test save")
+        return None
+    
+    try:
+        result = load_tests_collection.insert_one({
+            "app_name": app_name,
+            "side_name": side_name,
+            "settings": settings,
+            "totals": report.get("totals", {}),
+            "timeline": report.get("timeline", []),
+            "breakdown": report.get("breakdown", {}),
+            "timestamp": datetime.datetime.utcnow()
+        })
+        logger.info(f"✅ Saved load test for {app_name} with ID: {result.inserted_id}")
+        return result.inserted_id
+    except Exception as e:
+        logger.error(f"❌ Failed to save load test: {e}")
+        return None
+
+@timed_query
+def get_load_tests(app_name, limit=5):
+    """Get recent load test reports for an app."""
+    if load_tests_collection is None or not app_name:
+        return []
+    
+    try:
+        cursor = load_tests_collection.find({"app_name": app_name}).sort("timestamp", DESCENDING).limit(limit)
+        return list(cursor)
+    except Exception as e:
+        logger.error(f"Failed to get load tests for app {app_name}: {e}")
+        return []
+
+# Everything the history views need except the results ZIP, which is fetched lazily
+RUN_SUMMARY_PROJECTION = {
+    "app_name": 1,
+    "side_name": 1,
+    "user_params": 1,
+    "param_map": 1,
+    "screenshot_steps": 1,
+    "timestamp": 1,
+    "original_side": 1,
+    "modified_side": 1,
+    "original_side_hash": 1,
+    "modified_side_hash": 1,
+    "modified_side_patch": 1,
+    "zip_size": 1,
+    "has_screenshots": 1,
+    "param_count": 1,
+    # Diff images (PNG bytes) stay in the database - get_visual_diff_images loads them per run
+    "visual_diffs.step": 1,
+    "visual_diffs.status": 1,
+    "visual_diffs.hash": 1,
+    "visual_diffs.baseline_hash": 1,
+    "visual_diffs.distance": 1,
+    "visual_diffs.score": 1,
+    "visual_changes": 1,
+    "status": 1,
+    "step_results": 1,
+    "run_error": 1,
+    "run_duration": 1,
+    "checkpoint": 1,
+    "resume": 1,
+    "test_results": 1,
+    "workers": 1,
+    "browser": 1,
+    "run_order": 1,
+    "shards": 1,
+    "network": 1,
+    "resources": 1,
+    "profile_files": 1
+}
+
+# Run lists also leave out the SIDE bytes - get_run_sides fetches them for one run on demand
+RUN_LIST_PROJECTION = {k: v for k, v in RUN_SUMMARY_PROJECTION.items() if k not in ("original_side", "modified_side")}
+RUN_LIST_PROJECTION.update(original_side_size=1, modified_side_size=1)
+
+@timed_query
+def get_run_summaries(ids=None, limit=100):
+    """Get run summaries (no results ZIP or SIDE bytes), newest first, optionally only the given ids."""
+    if runs_collection is None:
+        return []
+    
+    try:
+        query = {"_id": {"$in": list(ids)}} if ids is not None else {}
+        cursor = runs_collection.find(query, RUN_LIST_PROJECTION).sort("timestamp", DESCENDING).limit(limit)
+        return list(cursor)
+    except Exception as e:
+        logger.error(f"❌ Failed to get run summaries: {e}")
+        return []
+
+@timed_query
+def get_visual_diff_images(run_id):
+    """Get {step: diff_png_bytes} for the changed screenshots of one run."""
+    if runs_collection is None:
+        return {}
+    
+    try:
+        run = runs_collection.find_one({"_id": run_id}, {"visual_diffs.step": 1, "visual_diffs.diff_image": 1})
+        return {d["step"]: d["diff_image"] for d in (run or {}).get("visual_diffs", [])
+                if d.get("step") and d.get("diff_image")}
+    except Exception as e:
+        logger.error(f"Failed to get visual diffs for run {run_id}: {e}")
+        return {}
+
+@timed_query
+def get_run_sides(run_id):
+    """Get {"original_side", "modified_side"} bytes of one run (None where it has none)."""
+    if runs_collection is None:
+        return {}
+    
+    try:
+        run = runs_collection.find_one({"_id": run_id}, {
+            "original_side": 1, "modified_side": 1, "original_side_hash": 1,
+            "modified_side_hash": 1, "modified_side_patch": 1
+        })
+        if not run:
+            return {}
+        hydrate_side_fields([run])
+        return {"original_side": run.get("original_side"), "modified_side": run.get("modified_side")}
+    except Exception as e:
+        logger.error(f"Failed to get SIDE files for run {run_id}: {e}")
+        return {}
+
+@timed_query
+def get_recent_run_ids(limit=100):
+    """Ids of the newest runs - a cheap index-only probe for changes."""
+    if runs_collection is None:
+        return []
+    
+    try:
+        cursor = runs_collection.find({}, {"_id": 1}).sort("timestamp", DESCENDING).limit(limit)
+        return [doc["_id"] for doc in cursor]
+    except Exception as e:
+        logger.error(f"Failed to get recent run ids: {e}")
+        return []
+
+@timed_query
+def get_run_zip(run_id):
+    """Get the results ZIP of one run."""
+    if runs_collection is None:
+        return None
+    
+    try:
+        run = runs_collection.find_one({"_id": run_id}, {"zip_file": 1})
+        return run.get("zip_file") if run else None
+    except Exception as e:
+        logger.error(f"Failed to get results for run {run_id}: {e}")
+        return None
+
+def watch_runs():
+    """Open a change stream on the runs collection (raises on standalone mongod).
+    
+    Events carry only the operation type and document key; callers fetch what they need.
+    """
+    if runs_collection is None:
+        raise RuntimeError("Database not available")
+    pipeline = [
+        {"$match": {"operationType": {"$in": ["insert", "update", "replace", "delete", "drop", "invalidate"]}}},
+        {"$project": {"operationType": 1, "documentKey": 1}}
+    ]
+    return runs_collection.watch(pipeline)
+
+@timed_query
 def get_recent_runs(limit=10):
     """Get recent runs with optimized query and error handling."""
     if runs_collection is None:
@@ -148,20 +783,7 @@ def get_recent_runs(limit=10):
     try:
         logger.info(f"Fetching {limit} recent runs...")
         # Use projection to limit data transfer
-        projection = {
-            "app_name": 1,
-            "side_name": 1,
-            "user_params": 1,
-            "param_map": 1,
-            "screenshot_steps": 1,
-            "timestamp": 1,
-            "zip_file": 1,
-            "original_side": 1,
-            "modified_side": 1,
-            "zip_size": 1,
-            "has_screenshots": 1,
-            "param_count": 1
-        }
+        projection = dict(RUN_SUMMARY_PROJECTION, zip_file=1)
         
         # Limit maximum records to prevent memory issues
         safe_limit = min(limit, 100)
@@ -171,7 +793,7 @@ def get_recent_runs(limit=10):
             projection
         ).sort("timestamp", DESCENDING).limit(safe_limit)
         
-        results = list(cursor)
+        results = hydrate_side_fields(list(cursor))
         logger.info(f"✅ Retrieved {len(results)} runs from database")
         return results
         
@@ -179,6 +801,7 @@ def get_recent_runs(limit=10):
         logger.error(f"❌ Failed to get recent runs: {e}")
         return []
 
+@timed_query
 def get_runs_for_app(app_name, limit=20):
     """Get runs for a specific app with better performance."""
     if runs_collection is None or not app_name:
@@ -189,7 +812,7 @@ def get_runs_for_app(app_name, limit=20):
             {"app_name": app_name}
         ).sort("timestamp", DESCENDING).limit(limit)
         
-        return list(cursor)
+        return hydrate_side_fields(list(cursor))
         
     except Exception as e:
         logger.error(f"Failed to get runs for app {app_name}: {e}")
@@ -201,7 +824,7 @@ def delete_runs_for_app(app_name):
         return 0
     
     try:
-        result = runs_collection.delete_many({"app_name": app_name})
+        result = _delete_runs({"app_name": app_name})
         logger.info(f"Deleted {result.deleted_count} runs for app: {app_name}")
         return result.deleted_count
     except Exception as e:
@@ -214,33 +837,27 @@ def delete_all_runs():
         return 0
     
     try:
-        result = runs_collection.delete_many({})
+        result = _delete_runs({})
         logger.info(f"Deleted all {result.deleted_count} runs")
         return result.deleted_count
     except Exception as e:
         logger.error(f"Failed to delete all runs: {e}")
         return 0
 
+@timed_query
 def get_app_list():
-    """Get list of unique app names for better performance."""
+    """Get every app name that has runs, sorted (answered from the app_name index)."""
     if runs_collection is None:
         return []
     
     try:
-        # Use aggregation for better performance
-        pipeline = [
-            {"$group": {"_id": "$app_name"}},
-            {"$sort": {"_id": 1}},
-            {"$limit": 50}  # Limit results
-        ]
-        
-        result = runs_collection.aggregate(pipeline)
-        return [doc["_id"] for doc in result if doc["_id"]]
+        return sorted(name for name in runs_collection.distinct("app_name") if name and name != "Unnamed")
         
     except Exception as e:
         logger.error(f"Failed to get app list: {e}")
         return []
 
+@timed_query
 def cleanup_old_runs(days=30):
     """Clean up runs older than specified days."""
     if runs_collection is None:
@@ -248,7 +865,7 @@ def cleanup_old_runs(days=30):
     
     try:
         cutoff_date = datetime.datetime.utcnow() - datetime.timedelta(days=days)
-        result = runs_collection.delete_many({"timestamp": {"$lt": cutoff_date}})
+        result = _delete_runs({"timestamp": {"$lt": cutoff_date}})
         logger.info(f"Cleaned up {result.deleted_count} old runs")
         return result.deleted_count
     except Exception as e:
@@ -0,0 +1,136 @@
+"""
+Driver Resolution Cache
+Remembers which browser/driver setup works on this host so browser startup can
+skip the fallback waterfall (and webdriver-manager downloads) on later runs.
+"""
+
+import datetime
+import json
+import os
+import shutil
+import socket
+import sys
+
+BROWSERS = ('chrome', 'firefox')  # Browsers a run can ask for (run config "browser")
+DEFAULT_BROWSER = 'chrome'         # Runs without a "browser" key (and runs saved before tagging)
+
+CACHE_PATH = os.environ.get(
+    'DRIVER_CACHE_PATH',
+    os.path.join(os.path.expanduser('~'), '.cache', 'testing-portal', 'driver_cache.json')
+)
+
+# Where Chrome/Chromium and chromedriver usually live when installed from system packages
+CHROME_BINARY_NAMES = ('google-chrome', 'google-chrome-stable', 'chromium', 'chromium-browser', 'chrome')
+CHROME_BINARY_PATHS = ('/usr/bin/chromium', '/usr/bin/chromium-browser', '/usr/bin/google-chrome',
+                       '/opt/google/chrome/chrome', '/usr/lib/chromium/chromium')
+CHROMEDRIVER_PATHS = ('/usr/bin/chromedriver', '/usr/lib/chromium/chromedriver',
+                      '/usr/lib/chromium-browser/chromedriver')
+
+
+def host_key():
+    """Cache key - resolved paths are only valid on the host that resolved them."""
+    return f"{socket.gethostname()}:{sys.platform}"
+
+
+def _executable(path):
+    return bool(path) and os.path.isfile(path) and os.access(path, os.X_OK)
+
+
+def find_chrome_binaries():
+    """Locate a system Chrome/Chromium and chromedriver. Returns (chrome, driver), None when missing."""
+    chrome = next((shutil.which(n) for n in CHROME_BINARY_NAMES if shutil.which(n)), None)
+    chrome = chrome or next((p for p in CHROME_BINARY_PATHS if _executable(p)), None)
+    driver = shutil.which('chromedriver') or next((p for p in CHROMEDRIVER_PATHS if _executable(p)), None)
+    return chrome, driver
+
+
+def _fingerprint(path):
+    """Cheap identity of a file: size and mtime (changes when a package upgrades it)."""
+    if not path:
+        return None
+    try:
+        stat = os.stat(path)
+        return [stat.st_size, int(stat.st_mtime)]
+    except OSError:
+        return None
+
+
+def _read_cache(path=CACHE_PATH):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_cache(cache, path=CACHE_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(cache, f, indent=2)
+    os.replace(tmp_path, path)  # Parallel workers may resolve at the same time
+
+
+def load_resolution(browser='chrome', path=CACHE_PATH):
+    """Cached resolution for this host, or None when missing or no longer valid.
+
+    Validation only stats the cached files, so a hit costs no process launches
+    or network calls.
+    """
+    entry = _read_cache(path).get(host_key(), {}).get(browser)
+    if not entry:
+        return None
+    for role in ('driver', 'binary'):
+        file_path = entry.get(f'{role}_path')
+        if file_path and (not _executable(file_path) or _fingerprint(file_path) != entry.get(f'{role}_fingerprint')):
+            return None
+    return entry
+
+
+def save_resolution(browser, strategy, driver_path=None, binary_path=None,
+                    browser_version=None, driver_version=None, path=CACHE_PATH):
+    """Remember the strategy and paths that started a browser on this host."""
+    entry = {
+        'strategy': strategy,
+        'driver_path': driver_path,
+        'driver_fingerprint': _fingerprint(driver_path),
+        'binary_path': binary_path,
+        'binary_fingerprint': _fingerprint(binary_path),
+        'browser_version': browser_version,
+        'driver_version': driver_version,
+        'resolved_at': datetime.datetime.utcnow().isoformat(),
+    }
+    try:
+        cache = _read_cache(path)
+        cache.setdefault(host_key(), {})[browser] = entry
+        _write_cache(cache, path)
+    except OSError as e:
+        print(f"⚠️ Could not write driver cache: {e}")
+    return entry
+
+
+def clear_resolution(browser=None, path=CACHE_PATH):
+    """Forget this host's cached resolution (one browser, or all)."""
+    cache = _read_cache(path)
+    host = cache.get(host_key(), {})
+    if browser:
+        host.pop(browser, None)
+    else:
+        host.clear()
+    try:
+        _write_cache(cache, path)
+    except OSError:
+        pass
+
+
+def describe_driver(driver):
+    """Resolved driver path and versions of a running WebDriver session."""
+    capabilities = getattr(driver, 'capabilities', {}) or {}
+    driver_version = (capabilities.get('chrome', {}).get('chromedriverVersion')
+                      or capabilities.get('moz:geckodriverVersion') or '')
+    service = getattr(driver, 'service', None)
+    return {
+        'driver_path': getattr(service, 'path', None),
+        'browser_version': capabilities.get('browserVersion'),
+        'driver_version': driver_version.split(' ')[0] or None,
+    }
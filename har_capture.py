@@ -0,0 +1,221 @@
+"""
+HAR Capture
+Builds HAR 1.2 entries from DevTools network events and streams them into a
+compressed file (zstd when available, gzip otherwise) with a size cap.
+"""
+
+import datetime
+import gzip
+import io
+import json
+
+from startup import lazy_module
+
+# Imported when the first HAR is written or read
+zstandard = lazy_module('zstandard')
+ZSTD_AVAILABLE = zstandard is not None
+
+HAR_EXTENSIONS = ('.har.zst', '.har.gz')
+DEFAULT_MAX_ENTRIES = 1000                 # Beyond this, entries are sampled
+DEFAULT_MAX_BYTES = 8 * 1024 * 1024        # Hard cap on uncompressed HAR JSON per test
+
+
+def har_filename(prefix):
+    """File name for a HAR using the best available compression."""
+    return f"{prefix}.har.zst" if ZSTD_AVAILABLE else f"{prefix}.har.gz"
+
+
+def _open_compressed(path):
+    if path.endswith('.zst'):
+        return zstandard.ZstdCompressor(level=6).stream_writer(open(path, 'wb'), closefd=True)
+    return gzip.open(path, 'wb', compresslevel=6)
+
+
+def _headers(headers):
+    return [{'name': k, 'value': str(v)} for k, v in (headers or {}).items()]
+
+
+def _iso(wall_time):
+    return datetime.datetime.fromtimestamp(wall_time, datetime.timezone.utc).isoformat()
+
+
+def _span(timing, start, end):
+    if timing.get(start, -1) < 0 or timing.get(end, -1) < 0:
+        return -1
+    return round(timing[end] - timing[start], 3)
+
+
+class HarWriter:
+    """Consumes DevTools events and streams finished requests as HAR entries.
+
+    Entries are written as soon as their request finishes so memory stays flat.
+    After max_entries the writer keeps every 2nd, then every 4th... entry, and
+    stops entirely at max_bytes of HAR JSON. The final log comment records how
+    many entries were seen versus written.
+    """
+
+    def __init__(self, path, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.seen = 0
+        self.written = 0
+        self.bytes_written = 0
+        self._pending = {}
+        self._stream = _open_compressed(path)
+        self._write('{"log":{"version":"1.2","creator":{"name":"Testing Portal","version":"1.0"},"entries":[')
+
+    def _write(self, text):
+        data = text.encode()
+        self._stream.write(data)
+        self.bytes_written += len(data)
+
+    def _keep(self):
+        """Deterministic sampling once the soft cap is reached."""
+        if self.seen <= self.max_entries:
+            return True
+        stride = 2 ** ((self.seen - self.max_entries - 1) // self.max_entries + 1)
+        return self.seen % stride == 0
+
+    def consume(self, events):
+        for event in events:
+            method = event.get('method', '')
+            params = event.get('params', {})
+            request_id = params.get('requestId')
+            if method == 'Network.requestWillBeSent':
+                if request_id in self._pending and params.get('redirectResponse'):
+                    # A redirect finishes the previous hop of this request id
+                    hop = self._pending.pop(request_id)
+                    hop['response'] = params['redirectResponse']
+                    hop['end'] = params.get('timestamp')
+                    self._emit(hop)
+                self._pending[request_id] = {
+                    'request': params.get('request', {}),
+                    'type': params.get('type'),
+                    'start': params.get('timestamp'),
+                    'wall_time': params.get('wallTime'),
+                }
+            elif request_id in self._pending:
+                entry = self._pending[request_id]
+                if method == 'Network.responseReceived':
+                    entry['response'] = params.get('response', {})
+                elif method == 'Network.loadingFinished':
+                    entry['end'] = params.get('timestamp')
+                    entry['encoded_length'] = params.get('encodedDataLength', 0)
+                    self._emit(self._pending.pop(request_id))
+                elif method == 'Network.loadingFailed':
+                    entry['end'] = params.get('timestamp')
+                    entry['error'] = params.get('blockedReason') or params.get('errorText')
+                    self._emit(self._pending.pop(request_id))
+
+    def _emit(self, raw):
+        self.seen += 1
+        if not self._keep() or self.bytes_written >= self.max_bytes:
+            return
+        text = json.dumps(self._to_har(raw), separators=(',', ':'))
+        self._write((',' if self.written else '') + text)
+        self.written += 1
+
+    def _to_har(self, raw):
+        request = raw.get('request', {})
+        response = raw.get('response') or {}
+        timing = response.get('timing') or {}
+        start, end = raw.get('start'), raw.get('end')
+        total = round((end - start) * 1000, 3) if start is not None and end is not None else 0
+
+        receive_headers = timing.get('receiveHeadersEnd', -1)
+        request_time = timing.get('requestTime')
+        if receive_headers >= 0 and request_time is not None and end is not None:
+            receive = max(0.0, round((end - request_time) * 1000 - receive_headers, 3))
+        else:
+            receive = 0
+        first_activity = next((timing[k] for k in ('dnsStart', 'connectStart', 'sendStart')
+                               if timing.get(k, -1) >= 0), -1)
+        timings = {
+            'blocked': round(first_activity, 3) if first_activity >= 0 else -1,
+            'dns': _span(timing, 'dnsStart', 'dnsEnd'),
+            'connect': _span(timing, 'connectStart', 'connectEnd'),
+            'ssl': _span(timing, 'sslStart', 'sslEnd'),
+            'send': max(0, _span(timing, 'sendStart', 'sendEnd')),
+            'wait': max(0, _span(timing, 'sendEnd', 'receiveHeadersEnd')),
+            'receive': receive,
+        }
+
+        entry = {
+            'startedDateTime': _iso(raw['wall_time']) if raw.get('wall_time') else None,
+            'time': total,
+            'request': {
+                'method': request.get('method', 'GET'),
+                'url': request.get('url', ''),
+                'httpVersion': response.get('protocol', ''),
+                'headers': _headers(request.get('headers')),
+                'queryString': [], 'cookies': [], 'headersSize': -1, 'bodySize': -1,
+            },
+            'response': {
+                'status': response.get('status', 0),
+                'statusText': response.get('statusText', ''),
+                'httpVersion': response.get('protocol', ''),
+                'headers': _headers(response.get('headers')),
+                'cookies': [],
+                'content': {'size': raw.get('encoded_length', 0), 'mimeType': response.get('mimeType', '')},
+                'redirectURL': '', 'headersSize': -1,
+                'bodySize': raw.get('encoded_length', -1),
+            },
+            'cache': {},
+            'timings': timings,
+            '_resourceType': raw.get('type'),
+        }
+        if raw.get('error'):
+            entry['_error'] = raw['error']
+        return entry
+
+    def close(self):
+        """Flush requests still in flight and finish the HAR document."""
+        for raw in list(self._pending.values()):
+            raw.setdefault('error', 'incomplete')
+            self._emit(raw)
+        self._pending.clear()
+        comment = json.dumps(f"{self.written} of {self.seen} requests written"
+                             + (" (sampled)" if self.written < self.seen else ""))
+        self._write(f'],"comment":{comment}}}}}')
+        self._stream.close()
+        return {'path': self.path, 'seen': self.seen, 'written': self.written}
+
+
+def load_har(data, name):
+    """Decompress and parse a HAR file produced by HarWriter."""
+    if name.endswith('.zst'):
+        if not ZSTD_AVAILABLE:
+            raise RuntimeError("zstandard is required to read .har.zst files")
+        with zstandard.ZstdDecompressor().stream_reader(io.BytesIO(data)) as reader:
+            raw = reader.read()
+    elif name.endswith('.gz'):
+        raw = gzip.decompress(data)
+    else:
+        raw = data
+    return json.loads(raw)
+
+
+def waterfall_rows(har, limit=300):
+    """Flatten HAR entries into rows for a waterfall chart (ms offsets from the first request)."""
+    entries = [e for e in har.get('log', {}).get('entries', []) if e.get('startedDateTime')]
+    if not entries:
+        return []
+    starts = [datetime.datetime.fromisoformat(e['startedDateTime']) for e in entries]
+    origin = min(starts)
+    rows = []
+    for entry, started in sorted(zip(entries, starts), key=lambda pair: pair[1])[:limit]:
+        offset = (started - origin).total_seconds() * 1000
+        url = entry['request']['url']
+        rows.append({
+            'request': f"{len(rows) + 1:03d} {url[:80]}",
+            'url': url,
+            'start': round(offset, 1),
+            'end': round(offset + max(entry.get('time', 0), 1), 1),
+            'duration': entry.get('time', 0),
+            'wait': entry.get('timings', {}).get('wait', 0),
+            'status': entry['response'].get('status', 0),
+            'type': entry.get('_resourceType') or 'Other',
+            'size': entry['response'].get('bodySize', 0),
+        })
+    return rows
@@ -0,0 +1,247 @@
+"""
+Job Queue
+MongoDB-backed coordinator for distributed runner workers (see worker.py).
+The portal submits SIDE jobs; workers claim them atomically, hold a lease
+they renew with heartbeats and upload the results ZIP. Jobs whose lease runs
+out - the worker crashed or lost its connection - go back to the queue.
+"""
+
+import datetime
+import io
+import json
+import logging
+import time
+import zipfile
+
+from pymongo import ASCENDING, ReturnDocument
+
+from db_manager import jobs_collection, workers_collection
+from metrics import counter, gauge
+
+logger = logging.getLogger(__name__)
+
+LEASE_SECONDS = 60          # A running job is lost when its lease isn't renewed for this long
+HEARTBEAT_INTERVAL = 10     # seconds between worker heartbeats (well inside the lease)
+MAX_ATTEMPTS = 3            # Claims per job before it is failed instead of requeued
+QUEUE_WAIT = 600            # seconds a job may wait for a worker on top of its run timeout
+POLL_INTERVAL = 1.0         # seconds between job status checks while waiting
+
+JOBS_REQUEUED = counter('portal_jobs_requeued_total', 'Jobs returned to the queue after their worker was lost')
+JOBS_FINISHED = counter('portal_jobs_finished_total', 'Distributed jobs finished', ['status'])
+JOBS_QUEUED = gauge('portal_jobs_queued', 'Distributed jobs waiting for a worker')
+
+
+def _now():
+    return datetime.datetime.utcnow()
+
+
+def queue_available():
+    return jobs_collection is not None
+
+
+# ============================================================================
+# COORDINATOR SIDE
+# ============================================================================
+def submit_job(side_data, app_name, test_type="test", config=None, timeout=300):
+    """Queue a SIDE run for the worker pool. Returns the job id."""
+    job = {
+        'status': 'queued',
+        'side': json.dumps(side_data, separators=(',', ':')),
+        'app_name': app_name,
+        'test_type': test_type,
+        'config': config or {},
+        'timeout': timeout,
+        'created': _now(),
+        'attempts': 0,
+        'worker_id': None,
+        'lease_until': None,
+        'lost_workers': [],
+    }
+    return jobs_collection.insert_one(job).inserted_id
+
+
+def requeue_expired():
+    """Return jobs with an expired lease to the queue (or fail them after MAX_ATTEMPTS).
+
+    Called by waiting portals and idle workers alike, so no separate reaper is needed.
+    """
+    now = _now()
+    expired = {'status': 'running', 'lease_until': {'$lt': now}}
+    failed = jobs_collection.update_many(
+        dict(expired, attempts={'$gte': MAX_ATTEMPTS}),
+        {'$set': {'status': 'failed', 'finished': now,
+                  'error': f"Worker lost {MAX_ATTEMPTS} times - giving up"}}
+    ).modified_count
+    lost = list(jobs_collection.find(expired, {'worker_id': 1}))
+    requeued = 0
+    for job in lost:
+        # Matching on the worker id makes this safe against a concurrent heartbeat or requeue
+        result = jobs_collection.update_one(
+            {'_id': job['_id'], 'status': 'running', 'worker_id': job['worker_id'], 'lease_until': {'$lt': now}},
+            {'$set': {'status': 'queued', 'worker_id': None, 'lease_until': None},
+             '$push': {'lost_workers': job['worker_id']}}
+        )
+        requeued += result.modified_count
+    if requeued or failed:
+        JOBS_REQUEUED.inc(requeued)
+        logger.warning(f"⚠️ Lost workers: {requeued} job(s) requeued, {failed} failed")
+    return requeued
+
+
+def cancel_job(job_id, reason):
+    jobs_collection.update_one(
+        {'_id': job_id, 'status': {'$in': ['queued', 'running']}},
+        {'$set': {'status': 'cancelled', 'error': reason, 'finished': _now()}}
+    )
+
+
+def wait_for_job(job_id, timeout, poll_interval=POLL_INTERVAL, on_status=None):
+    """Block until a job finishes and return its results ZIP.
+
+    Raises RuntimeError when the job failed and TimeoutError (after cancelling the
+    job) when it didn't finish within timeout + QUEUE_WAIT seconds.
+    on_status, when given, is called with the job's status as it changes.
+    """
+    deadline = time.time() + timeout + QUEUE_WAIT
+    last_status = None
+    while True:
+        requeue_expired()
+        job = jobs_collection.find_one({'_id': job_id}, {'side': 0})
+        if job is None:
+            raise RuntimeError(f"Job {job_id} disappeared")
+        if job['status'] != last_status:
+            last_status = job['status']
+            if on_status:
+                on_status(job['status'], job.get('worker_id'))
+        if job['status'] == 'done':
+            # The ZIP is saved with the run by the caller - don't keep a second copy
+            jobs_collection.delete_one({'_id': job_id})
+            JOBS_FINISHED.inc(status='done')
+            return job['result_zip']
+        if job['status'] in ('failed', 'cancelled'):
+            JOBS_FINISHED.inc(status=job['status'])
+            raise RuntimeError(job.get('error') or f"Job {job['status']}")
+        if time.time() > deadline:
+            cancel_job(job_id, "Timed out waiting for a worker")
+            JOBS_FINISHED.inc(status='timeout')
+            raise TimeoutError(f"Job did not finish within {timeout + QUEUE_WAIT}s")
+        time.sleep(poll_interval)
+
+
+def error_zip(message):
+    """A results ZIP carrying only an error summary, like a runner that produced nothing."""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr('error.txt', message)
+        zf.writestr('run_summary.json', json.dumps({'status': 'error', 'error': message, 'steps': []}))
+    return buffer.getvalue()
+
+
+def run_remote(side_data, app_name, test_type="test", config=None, timeout=300, on_status=None):
+    """Run a SIDE on the worker pool and return the results ZIP (an error ZIP on failure)."""
+    try:
+        job_id = submit_job(side_data, app_name, test_type, config, timeout)
+        return wait_for_job(job_id, timeout, on_status=on_status)
+    except Exception as e:
+        logger.error(f"❌ Distributed run failed: {e}")
+        return error_zip(f"Distributed run failed: {e}")
+
+
+# ============================================================================
+# WORKER SIDE
+# ============================================================================
+def register_worker(worker_id, info):
+    workers_collection.update_one(
+        {'_id': worker_id},
+        {'$set': dict(info, status='idle', job_id=None, last_seen=_now()), '$setOnInsert': {'started': _now()}},
+        upsert=True
+    )
+
+
+def unregister_worker(worker_id):
+    workers_collection.update_one({'_id': worker_id}, {'$set': {'status': 'offline', 'last_seen': _now()}})
+
+
+def claim_job(worker_id):
+    """Atomically take the oldest queued job. Returns the job or None."""
+    now = _now()
+    job = jobs_collection.find_one_and_update(
+        {'status': 'queued'},
+        {'$set': {'status': 'running', 'worker_id': worker_id, 'started': now,
+                  'lease_until': now + datetime.timedelta(seconds=LEASE_SECONDS)},
+         '$inc': {'attempts': 1}},
+        sort=[('created', ASCENDING)],
+        return_document=ReturnDocument.AFTER
+    )
+    if job:
+        workers_collection.update_one({'_id': worker_id},
+                                      {'$set': {'status': 'busy', 'job_id': job['_id'], 'last_seen': now}})
+    return job
+
+
+def heartbeat(worker_id, job_id=None, stats=None):
+    """Report the worker alive and renew its job lease.
+
+    Returns False when the job is no longer this worker's (requeued or cancelled).
+    """
+    now = _now()
+    update = {'last_seen': now}
+    if stats:
+        update['stats'] = stats
+    workers_collection.update_one({'_id': worker_id}, {'$set': update})
+    if job_id is None:
+        return True
+    result = jobs_collection.update_one(
+        {'_id': job_id, 'worker_id': worker_id, 'status': 'running'},
+        {'$set': {'lease_until': now + datetime.timedelta(seconds=LEASE_SECONDS)}}
+    )
+    return result.matched_count == 1
+
+
+def finish_job(worker_id, job_id, zip_bytes=None, error=None):
+    """Upload a job's results ZIP (or its error). Ignored when the job was taken away meanwhile."""
+    now = _now()
+    if error is None:
+        update = {'status': 'done', 'result_zip': zip_bytes, 'finished': now}
+    else:
+        update = {'status': 'failed', 'error': error, 'finished': now}
+    result = jobs_collection.update_one({'_id': job_id, 'worker_id': worker_id, 'status': 'running'},
+                                        {'$set': update})
+    accepted = result.modified_count == 1
+    worker_update = {'$set': {'status': 'idle', 'job_id': None, 'last_seen': now}}
+    if accepted:
+        worker_update['$inc'] = {'jobs_done': 1}  # A discarded result is not a job done
+    workers_collection.update_one({'_id': worker_id}, worker_update)
+    return accepted
+
+
+# ============================================================================
+# STATUS
+# ============================================================================
+def list_workers(include_offline=False):
+    """Registered workers; "online" means a heartbeat within three intervals."""
+    if workers_collection is None:
+        return []
+    cutoff = _now() - datetime.timedelta(seconds=3 * HEARTBEAT_INTERVAL)
+    workers = []
+    for worker in workers_collection.find({}, {'stats': 0}).sort('_id', ASCENDING):
+        worker['online'] = worker.get('status') != 'offline' and worker.get('last_seen', cutoff) > cutoff
+        if worker['online'] or include_offline:
+            workers.append(worker)
+    return workers
+
+
+def queue_status():
+    """Job counts by status plus the number of online workers."""
+    if jobs_collection is None:
+        return {'available': False}
+    counts = {doc['_id']: doc['count'] for doc in jobs_collection.aggregate(
+        [{'$group': {'_id': '$status', 'count': {'$sum': 1}}}])}
+    JOBS_QUEUED.set(counts.get('queued', 0))
+    return {
+        'available': True,
+        'queued': counts.get('queued', 0),
+        'running': counts.get('running', 0),
+        'failed': counts.get('failed', 0),
+        'workers': len(list_workers()),
+    }
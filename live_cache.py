@@ -0,0 +1,201 @@
+"""
+Live Run Cache
+Keeps the newest run summaries in memory and patches them as runs are
+inserted or deleted, driven by a MongoDB change stream (replica sets/Atlas)
+or, on a standalone mongod, by polling an index-only id probe.
+"""
+
+import datetime
+import threading
+import time
+import logging
+from collections import OrderedDict
+
+from db_manager import get_app_list, get_run_summaries, get_recent_run_ids, get_run_zip, watch_runs
+from metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+MAX_CACHED_RUNS = 200      # Summaries kept in memory (newest first)
+MAX_CACHED_ZIPS = 20       # Results ZIPs kept after being fetched on demand
+POLL_INTERVAL = 5          # seconds between id probes when change streams are unavailable
+RETRY_INTERVAL = 30        # seconds before reopening a change stream that broke
+
+
+def _newest_first_key(run):
+    return run.get('timestamp') or datetime.datetime.min
+
+
+class RunSummaryCache:
+    """Process-wide cache of run summaries shared by every Streamlit session."""
+
+    def __init__(self, window=MAX_CACHED_RUNS, poll_interval=POLL_INTERVAL):
+        self.window = window
+        self.poll_interval = poll_interval
+        self.mode = None              # "change_stream" or "polling" once started
+        self.events = 0
+        self.last_update = None
+        self._runs = {}
+        self._apps = None             # Every app name in the database, loaded on first use
+        self._zips = OrderedDict()
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._thread = None
+        self._stop = threading.Event()
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+    def _ensure_loaded(self):
+        with self._lock:
+            if self._loaded:
+                return True
+            self._reload()
+            self._loaded = True
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._follow, daemon=True, name="run-cache")
+                self._thread.start()
+            return False
+
+    def recent(self, limit=50):
+        """Newest run summaries (without results ZIPs)."""
+        if limit > self.window:
+            return get_run_summaries(limit=limit)
+        hit = self._ensure_loaded()
+        record_cache('recent_runs', hit)
+        with self._lock:
+            runs = sorted(self._runs.values(), key=_newest_first_key, reverse=True)
+        return runs[:limit]
+
+    def app_names(self):
+        """Every app with runs: those in the cached window most recently run first, then the rest."""
+        names = []
+        for run in self.recent(self.window):
+            name = run.get('app_name') or 'Unnamed'
+            if name not in names and name != 'Unnamed':
+                names.append(name)
+        with self._lock:
+            apps = self._apps
+        if apps is None:
+            # Older apps fall outside the window - one distinct query, then kept up to date
+            apps = set(get_app_list())
+            with self._lock:
+                self._apps = apps
+        return names + sorted(apps - set(names))
+
+    def zip(self, run_id):
+        """Results ZIP of a run, fetched on first use and kept in a small LRU."""
+        with self._lock:
+            if run_id in self._zips:
+                self._zips.move_to_end(run_id)
+                record_cache('run_zip', True)
+                return self._zips[run_id]
+        record_cache('run_zip', False)
+        data = get_run_zip(run_id) or b''
+        with self._lock:
+            self._zips[run_id] = data
+            while len(self._zips) > MAX_CACHED_ZIPS:
+                self._zips.popitem(last=False)
+        return data
+
+    # ------------------------------------------------------------------
+    # Updates
+    # ------------------------------------------------------------------
+    def _reload(self):
+        runs = get_run_summaries(limit=self.window)
+        with self._lock:
+            self._runs = {run['_id']: run for run in runs}
+            self._apps = None
+            self.last_update = time.time()
+
+    def _upsert(self, ids):
+        if not ids:
+            return
+        for run in get_run_summaries(ids=ids, limit=len(ids)):
+            with self._lock:
+                self._runs[run['_id']] = run
+                if self._apps is not None and run.get('app_name'):
+                    self._apps.add(run['app_name'])
+        with self._lock:
+            if len(self._runs) > self.window:
+                newest = sorted(self._runs.values(), key=_newest_first_key, reverse=True)
+                self._runs = {run['_id']: run for run in newest[:self.window]}
+            self.last_update = time.time()
+
+    def _remove(self, ids):
+        with self._lock:
+            for run_id in ids:
+                self._runs.pop(run_id, None)
+                self._zips.pop(run_id, None)
+            self._apps = None  # The deleted runs may have been an app's last
+            self.last_update = time.time()
+
+    def refresh(self):
+        """Reconcile with the database now (one id-only query when nothing changed).
+
+        Call after writes in this process so they show up without waiting for the
+        change stream or the next poll.
+        """
+        if not self._loaded:
+            return
+        ids = get_recent_run_ids(self.window)
+        with self._lock:
+            cached = set(self._runs)
+        current = set(ids)
+        self._remove(cached - current)
+        self._upsert([run_id for run_id in ids if run_id not in cached])
+
+    def _handle(self, change):
+        self.events += 1
+        operation = change.get('operationType')
+        run_id = (change.get('documentKey') or {}).get('_id')
+        if operation == 'delete':
+            self._remove([run_id])
+        elif operation in ('insert', 'update', 'replace'):
+            self._upsert([run_id])
+        else:
+            # drop / invalidate - the stream ends, start over from a full load
+            self._reload()
+
+    def _follow(self):
+        """Background loop: change stream when supported, polling otherwise."""
+        while not self._stop.is_set():
+            try:
+                with watch_runs() as stream:
+                    if self.mode != 'change_stream':
+                        logger.info("✅ Run cache following the change stream")
+                    self.mode = 'change_stream'
+                    self.refresh()  # Catch up on anything missed before the stream opened
+                    for change in stream:
+                        self._handle(change)
+                        if self._stop.is_set():
+                            return
+            except Exception as e:
+                if self.mode == 'change_stream':
+                    # Stream broke (network, failover) - poll until it can be reopened
+                    logger.warning(f"⚠️ Run cache change stream interrupted: {e}")
+                elif self.mode is None:
+                    logger.info(f"🔄 Change streams unavailable ({e}) - run cache polling every {self.poll_interval}s")
+                self.mode = 'polling'
+                self._poll(RETRY_INTERVAL)
+
+    def _poll(self, duration):
+        deadline = time.time() + duration
+        while time.time() < deadline and not self._stop.wait(self.poll_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.warning(f"⚠️ Run cache poll failed: {e}")
+
+    def status(self):
+        with self._lock:
+            return {
+                'mode': self.mode or 'not started',
+                'cached_runs': len(self._runs),
+                'cached_zips': len(self._zips),
+                'events': self.events,
+                'last_update': self.last_update,
+            }
+
+
+run_cache = RunSummaryCache()
@@ -0,0 +1,424 @@
+"""
+Load Testing
+Replays a recorded SIDE flow with many concurrent virtual users, either as
+HTTP-level requests or through a small pool of headless browsers, ramping
+users up gradually and reporting throughput, latency percentiles and errors.
+"""
+
+import json
+import queue
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urljoin
+
+DEFAULT_TIMEOUT = 10          # seconds per HTTP request
+DEFAULT_MAX_BROWSERS = 4      # browsers are expensive - users share a pool of them
+POOL_WAIT_INTERVAL = 0.5      # seconds between stop checks while waiting for a browser or run slot
+REPLAY_RESOURCE_TYPES = ('Document', 'XHR', 'Fetch', 'Stylesheet', 'Image', 'Font', 'Other')
+
+
+# ============================================================================
+# REQUEST PLANS
+# ============================================================================
+def http_plan_from_side(side_data):
+    """GET requests for every `open` command, resolved against the SIDE base URL."""
+    base_url = side_data.get('url', '')
+    plan = []
+    for test in side_data.get('tests', []):
+        for cmd in test.get('commands', []):
+            if (cmd.get('command') or '').strip().lower() == 'open' and cmd.get('target'):
+                plan.append({'method': 'GET', 'url': urljoin(base_url, cmd['target']), 'label': 'open'})
+    return plan
+
+
+def http_plan_from_har(har_entries):
+    """Replayable GET requests captured in HAR entries (scripts are skipped - no JS runs here)."""
+    plan = []
+    for entry in har_entries:
+        request = entry.get('request', {})
+        if request.get('method', 'GET') != 'GET' or not request.get('url', '').startswith('http'):
+            continue
+        resource_type = entry.get('_resourceType') or 'Other'
+        if resource_type in REPLAY_RESOURCE_TYPES:
+            plan.append({'method': 'GET', 'url': request['url'], 'label': resource_type})
+    return plan
+
+
+# ============================================================================
+# VIRTUAL USERS
+# ============================================================================
+def _make_http_client():
+    """requests.Session when available (keep-alive), plain urllib otherwise."""
+    try:
+        import requests
+        session = requests.Session()
+
+        def fetch(url, timeout):
+            response = session.get(url, timeout=timeout)
+            return response.status_code, len(response.content)
+        return fetch
+    except ImportError:
+        opener = urllib.request.build_opener()
+
+        def fetch(url, timeout):
+            try:
+                with opener.open(url, timeout=timeout) as response:
+                    return response.status, len(response.read())
+            except urllib.error.HTTPError as e:
+                return e.code, 0
+        return fetch
+
+
+def http_user(plan, record, stop, iterations=1, think_time=0.0, timeout=DEFAULT_TIMEOUT):
+    """One virtual user replaying the request plan."""
+    fetch = _make_http_client()
+    for _ in range(iterations):
+        for request in plan:
+            if stop.is_set():
+                return
+            start = time.time()
+            try:
+                status, size = fetch(request['url'], timeout)
+                record(start, time.time() - start, status < 400, request['label'], status)
+            except Exception as e:
+                record(start, time.time() - start, False, request['label'], type(e).__name__)
+            if think_time:
+                time.sleep(think_time)
+
+
+class BrowserPool:
+    """Lazily started headless browsers shared by browser-mode virtual users.
+
+    Every browser holds a run slot from the governor (when given) for as long as
+    it lives, so load tests and regular runs share the same admission control.
+    """
+
+    def __init__(self, size, driver_factory, governor=None, label='load test'):
+        self.size = size
+        self.driver_factory = driver_factory
+        self.governor = governor
+        self.label = label
+        self._idle = queue.Queue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._all = []
+        self._slots = []
+
+    def _take_slot(self, stop):
+        """A governor run id, waiting in short steps so stop interrupts. None when stopped."""
+        if self.governor is None:
+            return ''
+        while not (stop and stop.is_set()):
+            try:
+                return self.governor.acquire(self.label, timeout=POOL_WAIT_INTERVAL)
+            except TimeoutError:
+                continue
+        return None
+
+    def _start(self, stop):
+        """Start one browser outside the lock. Returns None when stopped while waiting for a slot."""
+        run_id = self._take_slot(stop)
+        if run_id is None:
+            return None
+        try:
+            driver = self.driver_factory()
+        except Exception:
+            if run_id:
+                self.governor.release(run_id)
+            raise
+        with self._lock:
+            self._all.append(driver)
+            if run_id:
+                self._slots.append(run_id)
+        return driver
+
+    def acquire(self, stop=None):
+        """An idle browser, or a new one while the pool is below size. None once stop is set.
+
+        A browser that fails to start gives its place in the pool back before the error is raised.
+        """
+        while not (stop and stop.is_set()):
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                pass
+            with self._lock:
+                start_new = self._created < self.size
+                if start_new:
+                    self._created += 1  # Reserved now, so concurrent users don't overshoot size
+            if start_new:
+                try:
+                    driver = self._start(stop)
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+                if driver is None:
+                    with self._lock:
+                        self._created -= 1
+                return driver
+            try:
+                return self._idle.get(timeout=POOL_WAIT_INTERVAL)
+            except queue.Empty:
+                continue  # Re-check stop and whether a failed start freed a place
+        return None
+
+    def release(self, driver):
+        self._idle.put(driver)
+
+    def close(self):
+        for driver in self._all:
+            try:
+                driver.quit()
+            except Exception:
+                pass
+        for run_id in self._slots:
+            self.governor.release(run_id)
+        self._slots = []
+
+
+def browser_user(side_data, pool, record, stop, iterations=1, think_time=0.0):
+    """One virtual user running the SIDE flow in a pooled browser, one sample per step."""
+    from main import execute_command
+    base_url = side_data.get('url')
+    for _ in range(iterations):
+        if stop.is_set():
+            return
+        start = time.time()
+        try:
+            driver = pool.acquire(stop)
+        except Exception as e:
+            record(start, time.time() - start, False, 'browser startup', type(e).__name__)
+            continue
+        if driver is None:
+            return
+        try:
+            try:
+                driver.delete_all_cookies()  # Users must not share sessions
+            except Exception:
+                pass
+            for t_index, test in enumerate(side_data.get('tests', [])):
+                for s_index, cmd in enumerate(test.get('commands', [])):
+                    command = (cmd.get('command') or '').strip()
+                    if stop.is_set() or command.lower() == 'customscreenshot':
+                        continue
+                    start = time.time()
+                    try:
+                        execute_command(driver, cmd, t_index, s_index, base_url=base_url)
+                        record(start, time.time() - start, True, command, 'ok')
+                    except Exception as e:
+                        record(start, time.time() - start, False, command, type(e).__name__)
+        finally:
+            pool.release(driver)
+        if think_time:
+            time.sleep(think_time)
+
+
+# ============================================================================
+# LOAD TEST DRIVER
+# ============================================================================
+def run_load_test(user_fn, users, ramp_up=0.0, max_duration=None, on_progress=None):
+    """Start `users` copies of user_fn(record, stop) spread evenly over ramp_up seconds.
+
+    Returns the raw samples as (offset_seconds, latency_seconds, ok, label, status).
+    """
+    samples = []
+    lock = threading.Lock()
+    stop = threading.Event()
+    started = time.time()
+
+    def record(start, latency, ok, label, status):
+        with lock:
+            samples.append((start - started, latency, ok, label, status))
+
+    def launch(user_index):
+        delay = ramp_up * user_index / max(users, 1)
+        if stop.wait(delay):
+            return
+        user_fn(record, stop)
+
+    with ThreadPoolExecutor(max_workers=users) as pool:
+        futures = [pool.submit(launch, i) for i in range(users)]
+        while not all(f.done() for f in futures):
+            if max_duration and time.time() - started > max_duration:
+                stop.set()
+            if on_progress:
+                with lock:
+                    on_progress(len(samples), time.time() - started)
+            time.sleep(0.25)
+        for future in futures:
+            future.result()  # Surface unexpected user errors
+    return samples
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100.0 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def build_report(samples, users, bucket_seconds=1.0):
+    """Summarize samples into totals and a per-interval timeline (latencies in ms)."""
+    latencies = sorted(s[1] * 1000 for s in samples)
+    errors = sum(1 for s in samples if not s[2])
+    duration = max((s[0] + s[1] for s in samples), default=0.0)
+    totals = {
+        'users': users,
+        'requests': len(samples),
+        'errors': errors,
+        'error_rate': round(errors / len(samples), 4) if samples else 0.0,
+        'duration': round(duration, 2),
+        'throughput': round(len(samples) / duration, 2) if duration else 0.0,
+        'p50': _percentile(latencies, 50),
+        'p90': _percentile(latencies, 90),
+        'p95': _percentile(latencies, 95),
+        'p99': _percentile(latencies, 99),
+        'max': latencies[-1] if latencies else None,
+    }
+
+    buckets = {}
+    for offset, latency, ok, label, status in samples:
+        buckets.setdefault(int(offset // bucket_seconds), []).append((latency * 1000, ok))
+    timeline = []
+    for index in range(max(buckets, default=-1) + 1):
+        entries = buckets.get(index, [])
+        values = sorted(v for v, _ in entries)
+        failed = sum(1 for _, ok in entries if not ok)
+        timeline.append({
+            'second': round(index * bucket_seconds, 2),
+            'throughput': round(len(entries) / bucket_seconds, 2),
+            'error_rate': round(failed / len(entries), 4) if entries else 0.0,
+            'p50': _percentile(values, 50),
+            'p95': _percentile(values, 95),
+        })
+
+    by_label = {}
+    for offset, latency, ok, label, status in samples:
+        by_label.setdefault(label, []).append(latency * 1000)
+    breakdown = {
+        label: {'requests': len(values), 'p50': _percentile(sorted(values), 50), 'p95': _percentile(sorted(values), 95)}
+        for label, values in by_label.items()
+    }
+
+    for row in [totals] + timeline + list(breakdown.values()):
+        for key in ('p50', 'p90', 'p95', 'p99', 'max'):
+            if row.get(key) is not None:
+                row[key] = round(row[key], 1)
+    return {'totals': totals, 'timeline': timeline, 'breakdown': breakdown}
+
+
+def load_test_http(plan, users, ramp_up=0.0, iterations=1, think_time=0.0, max_duration=None, on_progress=None):
+    """HTTP-level load test of a request plan."""
+    if not plan:
+        raise ValueError("Nothing to replay - the SIDE flow has no open commands or captured requests")
+    samples = run_load_test(
+        lambda record, stop: http_user(plan, record, stop, iterations, think_time),
+        users, ramp_up, max_duration, on_progress
+    )
+    return build_report(samples, users)
+
+
+def load_test_browsers(side_data, users, ramp_up=0.0, iterations=1, think_time=0.0,
+                       max_browsers=DEFAULT_MAX_BROWSERS, max_duration=None, on_progress=None):
+    """Browser-level load test: users share a pool of headless browsers."""
+    from main import create_driver
+    from resource_governor import governor
+    pool = BrowserPool(min(users, max_browsers), create_driver, governor)
+    try:
+        samples = run_load_test(
+            lambda record, stop: browser_user(side_data, pool, record, stop, iterations, think_time),
+            users, ramp_up, max_duration, on_progress
+        )
+    finally:
+        pool.close()
+    return build_report(samples, users)
+
+
+# ============================================================================
+# LOCAL FIXTURE SERVER
+# ============================================================================
+FIXTURE_PAGE = b"""<!DOCTYPE html>
+<html><head><title>Load Test Fixture</title><link rel="stylesheet" href="/style.css"></head>
+<body><form action="/submit"><input id="name" name="name"><button id="go">Go</button></form></body></html>"""
+
+
+class _FixtureHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.startswith('/slow'):
+            time.sleep(0.2)
+        if self.path.startswith('/missing'):
+            self.send_response(404)
+            body = b'not found'
+            content_type = 'text/plain'
+        elif self.path.startswith('/style.css'):
+            self.send_response(200)
+            body = b'body { font-family: sans-serif; }'
+            content_type = 'text/css'
+        else:
+            self.send_response(200)
+            body = FIXTURE_PAGE
+            content_type = 'text/html'
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Keep load test output readable
+
+
+def start_fixture_server(port=0):
+    """Start a local HTTP server to load test against. Returns (server, base_url)."""
+    server = ThreadingHTTPServer(('127.0.0.1', port), _FixtureHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/"
+
+
+def fixture_side(base_url):
+    """A small SIDE flow against the fixture server."""
+    return {
+        'id': 'load-fixture', 'name': 'Load Fixture', 'url': base_url,
+        'tests': [{'id': 'fixture', 'name': 'Fixture flow', 'commands': [
+            {'command': 'open', 'target': '/', 'value': ''},
+            {'command': 'type', 'target': 'id=name', 'value': 'load'},
+            {'command': 'open', 'target': '/slow', 'value': ''},
+        ]}],
+        'suites': [], 'urls': [base_url], 'plugins': []
+    }
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Load test a SIDE flow')
+    parser.add_argument('side_file', nargs='?', help='SIDE file (omit with --fixture)')
+    parser.add_argument('--fixture', action='store_true', help='Run against a local fixture server')
+    parser.add_argument('--mode', choices=['http', 'browser'], default='http')
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--ramp-up', type=float, default=2.0)
+    parser.add_argument('--iterations', type=int, default=5)
+    parser.add_argument('--think-time', type=float, default=0.0)
+    args = parser.parse_args()
+
+    if args.fixture:
+        fixture_server, fixture_url = start_fixture_server()
+        side = fixture_side(fixture_url)
+    elif args.side_file:
+        with open(args.side_file) as f:
+            side = json.load(f)
+    else:
+        parser.error('a SIDE file or --fixture is required')
+
+    print(f"🚀 Load testing with {args.users} users ({args.mode}), ramp-up {args.ramp_up}s")
+    if args.mode == 'http':
+        result = load_test_http(http_plan_from_side(side), args.users, args.ramp_up, args.iterations, args.think_time)
+    else:
+        result = load_test_browsers(side, args.users, args.ramp_up, args.iterations, args.think_time)
+    json.dump(result, sys.stdout, indent=2)
+    print()
@@ -0,0 +1,79 @@
+"""
+Log Index
+Extracts the searchable parts of a run - step errors, the run error, notable
+run.log lines and visited URLs - when the run is saved, so history search
+runs against a MongoDB text index and never opens a results ZIP.
+"""
+
+import io
+import re
+import zipfile
+
+RUN_LOG_FILE = 'run.log'
+MAX_LOG_LINES = 400          # Notable log lines kept per run
+MAX_TEXT_LENGTH = 500        # Characters kept per entry
+NOTABLE_LINE_RE = re.compile(
+    r"❌|⚠️|⏰|error|exception|traceback|failed|timed? ?out|not found|no such|unable|refused|invalid", re.I
+)
+ENTRY_KINDS = ('step_error', 'run_error', 'log', 'url')
+
+
+def read_run_log(zip_bytes):
+    """run.log text from a results ZIP ('' when missing)."""
+    if not zip_bytes:
+        return ''
+    try:
+        with io.BytesIO(zip_bytes) as zb, zipfile.ZipFile(zb) as zf:
+            if RUN_LOG_FILE not in zf.namelist():
+                return ''
+            return zf.read(RUN_LOG_FILE).decode('utf-8', errors='replace')
+    except zipfile.BadZipFile:
+        return ''
+
+
+def _entry(kind, text, step=None):
+    step = step or {}
+    return {
+        'kind': kind,
+        'text': str(text)[:MAX_TEXT_LENGTH],
+        'test': step.get('test'),
+        'step': step.get('step'),
+        'command': step.get('command'),
+        'target': str(step.get('target') or '')[:MAX_TEXT_LENGTH],
+    }
+
+
+def extract_entries(zip_bytes, run_summary=None):
+    """Index entries for one run: [{"kind", "text", "test", "step", "command", "target"}]."""
+    run_summary = run_summary or {}
+    entries = []
+    seen_urls = set()
+    for step in run_summary.get('steps', []):
+        if step.get('error'):
+            entries.append(_entry('step_error', step['error'], step))
+        if (step.get('command') or '').lower() == 'open' and step.get('target') not in seen_urls:
+            seen_urls.add(step.get('target'))
+            entries.append(_entry('url', step.get('target') or '', step))
+    if run_summary.get('error'):
+        entries.append(_entry('run_error', run_summary['error']))
+
+    seen_lines = set()
+    for line in read_run_log(zip_bytes).splitlines():
+        line = line.strip()
+        if not line or line in seen_lines or not NOTABLE_LINE_RE.search(line):
+            continue
+        seen_lines.add(line)
+        entries.append(_entry('log', line))
+        if len(seen_lines) >= MAX_LOG_LINES:
+            break
+    return entries
+
+
+def text_search_query(query):
+    """A $text $search string: selectors, URLs and multi-word input are searched as a phrase."""
+    query = query.strip().replace('"', ' ')
+    if not query:
+        return ''
+    if re.fullmatch(r"\w+", query):
+        return query
+    return f'"{query}"'
@@ -1,46 +1,34 @@
-# Streamlit Cloud package installer for main.py
+# One-time environment bootstrap - MUST BE FIRST (see startup.py)
 import os
 import sys
 
-# Fix for inotify limits and Python path on Streamlit Cloud
-if os.path.exists("/mount/src"):
-    print("🔍 Main.py on Streamlit Cloud - applying optimizations...")
-    os.environ["STREAMLIT_SERVER_FILE_WATCHER_TYPE"] = "none"
-    os.environ["STREAMLIT_RUNNER_POST_PROCESS_ENABLED"] = "false"
-    
-    # Fix Python path for Streamlit Cloud packages
-    user_site = "/home/appuser/.local/lib/python3.13/site-packages"
-    if user_site not in sys.path and os.path.exists(user_site):
-        sys.path.insert(0, user_site)
-        print(f"✅ Added {user_site} to Python path")
-    
-    try:
-        from streamlit_packages import ensure_packages
-        ensure_packages()
-    except Exception as e:
-        print(f"⚠️ Package installer error in main.py: {e}")
+from startup import bootstrap_environment, configure_warnings, mark, module_available, startup_report
+bootstrap_environment()
+configure_warnings()
 
 import json
 import time
 import traceback
+from urllib.parse import urljoin
 
-# Enhanced import with error handling for Streamlit Cloud
+from scheduler import test_key, test_fingerprint
+from network_policy import apply_network_policy, read_performance_events, NetworkStats
+from page_metrics import collect_page_metrics
+from har_capture import HarWriter, har_filename, DEFAULT_MAX_ENTRIES
+from screenshots import save_step_screenshot, screenshot_options
+
+# Enhanced import with error handling for Streamlit Cloud. webdriver_manager (and the
+# requests stack it pulls in) is only imported by the strategies that download drivers.
 try:
     from selenium import webdriver
     from selenium.webdriver.chrome.options import Options
     from selenium.webdriver.chrome.service import Service
     from selenium.webdriver.common.by import By
-    from webdriver_manager.chrome import ChromeDriverManager
+    from selenium.webdriver.firefox.options import Options as FirefoxOptions
+    from selenium.webdriver.firefox.service import Service as FirefoxService
     
-    # Also try Firefox as fallback
-    try:
-        from selenium.webdriver.firefox.options import Options as FirefoxOptions
-        from selenium.webdriver.firefox.service import Service as FirefoxService
-        from webdriver_manager.firefox import GeckoDriverManager
-        FIREFOX_AVAILABLE = True
-    except ImportError:
-        FIREFOX_AVAILABLE = False
-        
+    # Downloading geckodriver needs webdriver_manager (Selenium Manager may find one without it)
+    FIREFOX_AVAILABLE = module_available('webdriver_manager')
     SELENIUM_AVAILABLE = True
     print("✅ Selenium imported successfully")
 except ImportError as e:
@@ -48,14 +36,15 @@ except ImportError as e:
     SELENIUM_AVAILABLE = False
     FIREFOX_AVAILABLE = False
 
-# Import chrome setup
-try:
-    from chrome_setup import get_chrome_paths
-    print("✅ Chrome setup imported successfully")
-except ImportError as e:
-    print(f"⚠️ Chrome setup import failed: {e}")
-    def get_chrome_paths():
-        return None, None
+from driver_cache import BROWSERS, load_resolution, save_resolution, clear_resolution, describe_driver, find_chrome_binaries
+mark('runner imports')
+
+
+RUN_SUMMARY_FILE = 'run_summary.json'
+METRIC_COMMANDS = ('open', 'customscreenshot')
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_RETRY_BACKOFF = 0.5  # seconds, doubled after every failed attempt
+WINDOW_SIZE = (1920, 1080)   # Every browser and profile, so timings and screenshots compare across them
 
 
 def find_element(driver, target):
@@ -72,6 +61,8 @@ def find_element(driver, target):
         return driver.find_element(By.NAME, target[5:])
     if target.startswith('link='):
         return driver.find_element(By.LINK_TEXT, target[5:])
+    if target.startswith('linkText='):
+        return driver.find_element(By.LINK_TEXT, target[9:])
     if target.startswith('class='):
         return driver.find_element(By.CLASS_NAME, target[6:])
     # fallback: try CSS selector then id
@@ -84,8 +75,420 @@ def find_element(driver, target):
             raise
 
 
-def run_side_test(side_file_path):
-    """Run SIDE test with enhanced error handling for Streamlit Cloud."""
+def candidate_targets(cmd):
+    """Primary target followed by the alternative locators Selenium IDE recorded."""
+    targets = [cmd.get('target', '')]
+    for alt in cmd.get('targets') or []:
+        locator = alt[0] if isinstance(alt, (list, tuple)) and alt else alt
+        if isinstance(locator, str) and locator and locator not in targets:
+            targets.append(locator)
+    return targets
+
+
+def resolve_element(driver, cmd, attempt=0):
+    """Find the element for a command, re-resolving through alternate locators on retries."""
+    targets = candidate_targets(cmd)
+    if attempt == 0 or len(targets) == 1:
+        return find_element(driver, targets[0])
+    # Retry: start from a different locator each attempt, then try the rest
+    start = attempt % len(targets)
+    last_error = None
+    for locator in targets[start:] + targets[:start]:
+        try:
+            return find_element(driver, locator)
+        except Exception as e:
+            last_error = e
+    raise last_error
+
+
+def step_key(test, t_index, cmd, s_index):
+    """Stable identifier for a step across runs of the same SIDE file."""
+    return f"{test.get('id') or t_index}:{cmd.get('id') or s_index}"
+
+
+def screenshot_stem(t_index, s_index):
+    """File name (without extension) of a step's screenshot in the results ZIP."""
+    return f"screenshot_t{t_index+1}_s{s_index+1}"
+
+
+def find_anchor_step(commands, s_index):
+    """Index of the nearest `open` at or before s_index - a safe point to resume from."""
+    for idx in range(min(s_index, len(commands) - 1), -1, -1):
+        if (commands[idx].get('command') or '').strip().lower() == 'open':
+            return idx
+    return 0
+
+
+def resolve_resume_point(tests, resume):
+    """Turn a resume request into the (test_index, step_index) to start executing at.
+    
+    mode "test" restarts the failing test from its first step; mode "anchor" restarts
+    from the closest navigation anchor before the failing step.
+    """
+    if not resume:
+        return 0, 0
+    t_index = min(max(int(resume.get('test_index', 0)), 0), max(len(tests) - 1, 0))
+    if resume.get('mode') != 'anchor' or not tests:
+        return t_index, 0
+    commands = tests[t_index].get('commands', [])
+    return t_index, find_anchor_step(commands, int(resume.get('step', 0)))
+
+
+def resolve_url(base_url, target):
+    """An `open` target as Selenium IDE resolves it: relative paths against the SIDE base URL."""
+    return urljoin(base_url, target) if base_url else target
+
+
+def execute_command(driver, cmd, t_index, s_index, attempt=0, screenshot=None, base_url=None):
+    """Execute a single SIDE command. Raises on failure.
+    
+    screenshot holds the run's capture defaults (see screenshots.screenshot_options);
+    base_url is the SIDE file's url, which relative `open` targets are resolved against.
+    """
+    command = (cmd.get('command') or '').strip()
+    target = cmd.get('target', '')
+    value = cmd.get('value', '')
+    
+    if command.lower() == 'open':
+        url = resolve_url(base_url, target)
+        driver.get(url)
+        time.sleep(1)
+    elif command.lower() in ('type', 'settext'):
+        el = resolve_element(driver, cmd, attempt)
+        el.clear()
+        el.send_keys(value)
+        time.sleep(0.3)
+    elif command.lower() in ('sendkeys',):
+        el = resolve_element(driver, cmd, attempt)
+        el.send_keys(value)
+        time.sleep(0.3)
+    elif command.lower() == 'click':
+        el = resolve_element(driver, cmd, attempt)
+        el.click()
+        time.sleep(0.5)
+    elif command.lower() == 'pause':
+        # value in milliseconds in SIDE usually
+        ms = int(value) if value else 1000
+        time.sleep(ms / 1000.0)
+    elif command.lower() == 'customscreenshot':
+        # Captured once, written to the step file and the run's latest screenshot;
+        # a target clips to that element, the value overrides the run's options
+        options = screenshot_options(screenshot, value)
+        element = resolve_element(driver, cmd, attempt) if target else None
+        step_file, _ = save_step_screenshot(driver, screenshot_stem(t_index, s_index), options, element)
+        print(f"Saved screenshot: {step_file}")
+    else:
+        print(f"Unknown command: {command} - skipping")
+        return 'skipped'
+    return 'passed'
+
+
+def open_isolated_context(driver):
+    """Open a fresh browser context (separate cookies, storage and cache) with one tab.
+    
+    Uses the DevTools protocol on the already running browser, so no new
+    process is launched. Returns the handles needed to close it again.
+    """
+    previous_handle = driver.current_window_handle
+    context_id = driver.execute_cdp_cmd('Target.createBrowserContext', {})['browserContextId']
+    target_id = driver.execute_cdp_cmd(
+        'Target.createTarget', {'url': 'about:blank', 'browserContextId': context_id}
+    )['targetId']
+    # ChromeDriver uses DevTools target ids as window handles
+    handles = driver.window_handles
+    driver.switch_to.window(target_id if target_id in handles else handles[-1])
+    return {'context_id': context_id, 'target_id': target_id, 'previous_handle': previous_handle}
+
+
+def close_isolated_context(driver, context):
+    """Close a context opened by open_isolated_context and return to the default tab."""
+    try:
+        driver.execute_cdp_cmd('Target.closeTarget', {'targetId': context['target_id']})
+    finally:
+        driver.switch_to.window(context['previous_handle'])
+        driver.execute_cdp_cmd('Target.disposeBrowserContext', {'browserContextId': context['context_id']})
+
+
+def clear_browser_state(driver):
+    """Best-effort isolation for browsers without CDP: drop cookies and web storage."""
+    driver.delete_all_cookies()
+    try:
+        driver.execute_script("window.localStorage.clear(); window.sessionStorage.clear();")
+    except Exception:
+        pass  # about:blank and some origins have no storage
+
+
+def needs_performance_log(config):
+    """Whether this run reads DevTools events from Chrome's performance log."""
+    return bool(config.get('network_policy') or config.get('har'))
+
+
+def configure_chrome_options(chrome_options, config):
+    """Apply run-level capabilities to every Chrome options object we try."""
+    if needs_performance_log(config):
+        chrome_options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+    return chrome_options
+
+
+class EventCollector:
+    """Drains the performance log after each step and fans events out to consumers."""
+    
+    def __init__(self, driver, consumers, enabled=True):
+        self.driver = driver
+        self.consumers = [c for c in consumers if c is not None]
+        self.enabled = enabled
+    
+    def collect(self):
+        if not self.enabled or not self.consumers:
+            return
+        try:
+            events = read_performance_events(self.driver)
+        except Exception as e:
+            # Firefox and some driver setups have no performance log
+            print(f"⚠️ Performance log unavailable ({e}) - network accounting and HAR capture disabled")
+            self.enabled = False
+            return
+        for consumer in self.consumers:
+            consumer.consume(events)
+
+
+class RunRecorder:
+    """Collects per-step outcomes and keeps run_summary.json up to date."""
+    
+    def __init__(self, path=RUN_SUMMARY_FILE, resume=None):
+        self.path = path
+        self.started = time.time()
+        self.status = 'running'
+        self.error = None
+        self.resume = resume
+        self.steps = []
+        self.tests = {}
+        self.isolation = 'none'
+        self.extras = {}
+    
+    def start_test(self, t_index, test):
+        self.tests[t_index] = {
+            'index': t_index,
+            'key': test_key(test, t_index),
+            'name': test.get('name', f"Test {t_index+1}"),
+            'fingerprint': test_fingerprint(test)
+        }
+    
+    def test_summaries(self):
+        """Per-test duration and status aggregated from the recorded steps."""
+        summaries = {t_index: dict(info, duration=0.0, status='passed') for t_index, info in self.tests.items()}
+        for step in self.steps:
+            test = summaries.get(step['test_index'])
+            if test is None:
+                continue
+            test['duration'] = round(test['duration'] + step['duration'], 3)
+            if step['status'] == 'failed':
+                test['status'] = 'failed'
+        return [summaries[k] for k in sorted(summaries)]
+    
+    def record_step(self, result):
+        self.steps.append(result)
+        self.flush()
+    
+    def finish(self, status=None, error=None):
+        if status is None:
+            status = 'failed' if any(s['status'] == 'failed' for s in self.steps) else 'passed'
+        self.status = status
+        self.error = error
+        self.flush()
+    
+    def flush(self):
+        summary = {
+            'status': self.status,
+            'error': self.error,
+            'duration': round(time.time() - self.started, 3),
+            'resume': self.resume,
+            'isolation': self.isolation,
+            # Last completed step - where a killed run got to
+            'checkpoint': {k: self.steps[-1][k] for k in ('test_index', 'step', 'key')} if self.steps else None,
+            'tests': self.test_summaries(),
+            'steps': self.steps
+        }
+        summary.update(self.extras)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(summary, f, separators=(',', ':'))
+        os.replace(tmp_path, self.path)  # Never leave a half-written summary behind
+
+
+def chrome_options(config, profile='full'):
+    """Chrome options for a startup profile: 'full' (tuned for Streamlit Cloud), 'simple' or 'minimal'."""
+    config = config or {}
+    options = Options()
+    options.add_argument('--headless' if profile == 'minimal' else '--headless=new')
+    options.add_argument('--no-sandbox')
+    options.add_argument('--disable-dev-shm-usage')
+    options.add_argument(f'--window-size={WINDOW_SIZE[0]},{WINDOW_SIZE[1]}')
+    if profile != 'minimal':
+        options.add_argument('--disable-gpu')
+        if config.get('isolation', 'none') != 'context':
+            # Important for resource-constrained environments, but a crash takes the whole
+            # browser down - context isolation keeps one multi-process browser instead
+            options.add_argument('--single-process')
+    if profile == 'full':
+        options.add_argument('--disable-web-security')
+        options.add_argument('--disable-features=VizDisplayCompositor')
+        # Additional options for Streamlit Cloud compatibility
+        options.add_argument('--disable-software-rasterizer')
+        options.add_argument('--disable-background-timer-throttling')
+        options.add_argument('--disable-renderer-backgrounding')
+        options.add_argument('--disable-backgrounding-occluded-windows')
+        options.add_argument('--disable-ipc-flooding-protection')
+        options.add_argument('--disable-extensions')
+        options.add_argument('--disable-default-apps')
+        options.add_argument('--disable-hang-monitor')
+        options.add_argument('--disable-prompt-on-repost')
+        options.add_argument('--disable-domain-reliability')
+        options.add_argument('--disable-component-extensions-with-background-pages')
+        # Memory and process optimizations
+        options.add_argument('--memory-pressure-off')
+        options.add_argument('--max_old_space_size=4096')
+    # No fixed --remote-debugging-port: chromedriver picks a free one, so parallel
+    # workers on the same host don't fight over it
+    return configure_chrome_options(options, config)
+
+
+def _launch(browser, profile, config, driver_path=None, binary_path=None):
+    """Start a browser from explicit paths (None lets Selenium locate them).
+    
+    Returns (driver, binary_path) - Selenium Manager fills in the browser it found.
+    """
+    if browser == 'firefox':
+        options = FirefoxOptions()
+        options.add_argument('--headless')
+        options.add_argument(f'--width={WINDOW_SIZE[0]}')
+        options.add_argument(f'--height={WINDOW_SIZE[1]}')
+        if binary_path:
+            options.binary_location = binary_path
+        service = FirefoxService(executable_path=driver_path) if driver_path else FirefoxService()
+        return webdriver.Firefox(service=service, options=options), options.binary_location or None
+    options = chrome_options(config, profile)
+    if binary_path:
+        options.binary_location = binary_path
+    service = Service(executable_path=driver_path) if driver_path else Service()
+    return webdriver.Chrome(service=service, options=options), options.binary_location or None
+
+
+def _resolve_system_chrome():
+    chrome_binary, driver_binary = find_chrome_binaries()
+    if not chrome_binary and not driver_binary:
+        raise RuntimeError("No system Chrome or chromedriver found")
+    return driver_binary, chrome_binary
+
+
+def _resolve_chrome_wdm():
+    from webdriver_manager.chrome import ChromeDriverManager
+    return ChromeDriverManager().install(), None
+
+
+def _resolve_firefox_wdm():
+    from webdriver_manager.firefox import GeckoDriverManager
+    return GeckoDriverManager().install(), None
+
+
+# Startup strategies in the order they are probed: name -> (browser, options profile, path resolver).
+# Resolvers return (driver_path, binary_path); None lets Selenium find it.
+DRIVER_STRATEGIES = {
+    'chrome-auto': ('chrome', 'simple', lambda: (None, None)),
+    'chrome-wdm': ('chrome', 'full', _resolve_chrome_wdm),
+    'chrome-system': ('chrome', 'full', _resolve_system_chrome),
+    'chrome-minimal': ('chrome', 'minimal', lambda: (None, None)),
+    'firefox-auto': ('firefox', 'firefox', lambda: (None, None)),
+    'firefox-wdm': ('firefox', 'firefox', _resolve_firefox_wdm),
+}
+
+
+def strategies_for(browser, fallback=True):
+    """Strategy names to probe for a browser; Chrome falls back to Firefox unless fallback is off."""
+    names = [name for name, (b, _, _) in DRIVER_STRATEGIES.items() if b == browser]
+    if browser == 'chrome' and fallback:
+        names += [name for name, (b, _, _) in DRIVER_STRATEGIES.items() if b == 'firefox']
+    return names
+
+
+def create_driver(config=None, info=None):
+    """Start the configured browser, reusing this host's cached driver resolution when it is still valid.
+    
+    config "browser" picks chrome (default) or firefox; browser_fallback=False stops
+    Chrome from falling back to Firefox. On a cache miss (or when the cached setup no
+    longer starts) the strategies are probed in order and the first one that works is
+    cached for the next run. info, when given, receives the browser that actually
+    started, the strategy used and whether the cache was hit.
+    """
+    config = config or {}
+    info = info if info is not None else {}
+    requested = config.get('browser') or 'chrome'
+    if requested not in BROWSERS:
+        raise ValueError(f"Unknown browser '{requested}' (expected one of {', '.join(BROWSERS)})")
+    strategies = strategies_for(requested, config.get('browser_fallback', True))
+    
+    cached = load_resolution(requested)
+    if cached and cached.get('strategy') in strategies:
+        browser, profile, _ = DRIVER_STRATEGIES[cached['strategy']]
+        try:
+            driver, _ = _launch(browser, profile, config, cached.get('driver_path'), cached.get('binary_path'))
+            info.update(browser=browser, strategy=cached['strategy'], cached=True,
+                        browser_version=cached.get('browser_version'))
+            print(f"✅ {browser.title()} WebDriver initialized from cached {cached['strategy']} setup "
+                  f"(browser {cached.get('browser_version')}, driver {cached.get('driver_version')})")
+            return driver
+        except Exception as cached_error:
+            print(f"⚠️ Cached {cached['strategy']} setup failed ({cached_error}) - probing again")
+            clear_resolution(requested)
+    
+    print(f"🔍 Setting up {requested.title()} and its WebDriver...")
+    last_error = None
+    for name in strategies:
+        browser, profile, resolve = DRIVER_STRATEGIES[name]
+        if name == 'firefox-wdm' and not FIREFOX_AVAILABLE:
+            continue
+        try:
+            print(f"🔄 Attempting {name} setup...")
+            driver_path, binary_path = resolve()
+            driver, binary_path = _launch(browser, profile, config, driver_path, binary_path)
+        except Exception as e:
+            print(f"⚠️ {name} setup failed: {e}")
+            last_error = e
+            continue
+        
+        described = describe_driver(driver)
+        resolution = save_resolution(
+            requested, name, driver_path=driver_path or described['driver_path'], binary_path=binary_path,
+            browser_version=described['browser_version'], driver_version=described['driver_version']
+        )
+        info.update(browser=browser, strategy=name, cached=False, browser_version=resolution['browser_version'])
+        if browser != requested:
+            print(f"⚠️ {requested.title()} could not be started - this run uses {browser.title()}")
+        print(f"✅ {browser.title()} WebDriver initialized with {name} setup "
+              f"(browser {resolution['browser_version']}, driver {resolution['driver_version']}) - cached for next runs")
+        return driver
+    
+    print(f"❌ All {requested} setup methods failed")
+    raise last_error or RuntimeError(f"No {requested} setup method succeeded")
+
+
+def run_side_test(side_file_path, config=None):
+    """Run SIDE test with enhanced error handling for Streamlit Cloud.
+    
+    config keys: flaky_steps (step keys that may be retried), max_retries, retry_backoff,
+    resume_from ({"test_index", "step", "mode": "test"|"anchor"} to skip already-run steps,
+    plus "points" [{"test_index", "step"}] for further tests that resume mid-way),
+    tests (indices of the tests to run, in execution order; default all in file order),
+    isolation ("context" to run every test in a fresh browser context on the same browser),
+    network_policy (block lists from network_policy, enforced through CDP),
+    page_metrics (collect page performance metrics after open/customScreenshot steps),
+    har (write a compressed HAR per test; har_max_entries caps entries before sampling),
+    profile ("sampler" or "cprofile" - handled by __main__, which wraps the whole run),
+    browser ("chrome" or "firefox") and browser_fallback (see create_driver),
+    screenshot (customScreenshot defaults: format png/jpeg/webp, quality, full_page).
+    """
+    config = config or {}
+    recorder = RunRecorder(resume=config.get('resume_from'))
     
     if not SELENIUM_AVAILABLE:
         error_msg = "❌ Selenium is not available. Cannot run tests."
@@ -93,6 +496,7 @@ def run_side_test(side_file_path):
         with open('selenium_error.log', 'w') as f:
             f.write(error_msg + "\n")
             f.write("Please check Streamlit Cloud logs for package installation issues.\n")
+        recorder.finish('error', error_msg)
         return
     
     print(f"🔍 Loading SIDE file: {side_file_path}")
@@ -102,177 +506,194 @@ def run_side_test(side_file_path):
         print(f"✅ SIDE file loaded successfully with {len(side_data.get('tests', []))} tests")
     except Exception as e:
         print(f"❌ Failed to load SIDE file: {e}")
+        recorder.finish('error', f"Failed to load SIDE file: {e}")
         return
-
-    # Setup headless Chrome with optimized options for Streamlit Cloud
-    options = Options()
-    options.add_argument('--headless=new')
-    options.add_argument('--no-sandbox')
-    options.add_argument('--disable-dev-shm-usage')
-    options.add_argument('--disable-gpu')
-    options.add_argument('--disable-web-security')
-    options.add_argument('--disable-features=VizDisplayCompositor')
-    options.add_argument('--remote-debugging-port=9222')
-    options.add_argument('--window-size=1920,1080')
     
-    # Additional options for Streamlit Cloud compatibility
-    options.add_argument('--disable-software-rasterizer')
-    options.add_argument('--disable-background-timer-throttling')
-    options.add_argument('--disable-renderer-backgrounding')
-    options.add_argument('--disable-backgrounding-occluded-windows')
-    options.add_argument('--disable-ipc-flooding-protection')
-    options.add_argument('--disable-extensions')
-    options.add_argument('--disable-default-apps')
-    options.add_argument('--disable-hang-monitor')
-    options.add_argument('--disable-prompt-on-repost')
-    options.add_argument('--disable-domain-reliability')
-    options.add_argument('--disable-component-extensions-with-background-pages')
+    flaky_steps = set(config.get('flaky_steps') or [])
+    max_retries = int(config.get('max_retries', DEFAULT_MAX_RETRIES))
+    retry_backoff = float(config.get('retry_backoff', DEFAULT_RETRY_BACKOFF))
+    if flaky_steps:
+        print(f"🔁 {len(flaky_steps)} known flaky steps will be retried up to {max_retries} times")
     
-    # Memory and process optimizations
-    options.add_argument('--memory-pressure-off')
-    options.add_argument('--max_old_space_size=4096')
-    options.add_argument('--single-process')  # Important for resource-constrained environments
+    isolation = config.get('isolation', 'none')
+    screenshot_defaults = config.get('screenshot')
     
-    # Enhanced Chrome setup for Streamlit Cloud with auto-download
-    driver = None
+    tests = side_data.get('tests', [])
+    run_order = [i for i in config.get('tests', range(len(tests))) if 0 <= i < len(tests)]
+    recorder.extras['run_order'] = run_order  # Lets a resume continue in the same (scheduled) order
+    resume = config.get('resume_from')
+    start_test, start_step = resolve_resume_point(tests, resume)
+    # First step per resumed test; parallel runs add one point per shard
+    resume_steps = {start_test: start_step} if resume else {}
+    for point in (resume or {}).get('points', []):
+        t_index, s_index = resolve_resume_point(tests, dict(point, mode=resume.get('mode')))
+        resume_steps[t_index] = s_index
+    # Tests are skipped by position in run_order - scheduled runs are not in index order
+    start_position = run_order.index(start_test) if resume and start_test in run_order else 0
+    if resume:
+        recorder.resume = dict(resume, start_test=start_test, start_step=start_step)
+        print(f"⏩ Resuming at test {start_test+1}, step {start_step+1}")
+
+    mark('load SIDE')
+    driver_start = time.time()
+    driver_info = {}
     try:
-        print("🔍 Setting up Chrome and ChromeDriver...")
-        
-        # Strategy 1: Try with simple Chrome options first (most compatible)
-        try:
-            print("🔄 Attempting simple Chrome setup...")
-            simple_options = Options()
-            simple_options.add_argument('--headless=new')
-            simple_options.add_argument('--no-sandbox')
-            simple_options.add_argument('--disable-dev-shm-usage')
-            simple_options.add_argument('--disable-gpu')
-            simple_options.add_argument('--single-process')
-            
-            driver = webdriver.Chrome(options=simple_options)
-            print("✅ Chrome WebDriver initialized with simple options")
-            
-        except Exception as simple_error:
-            print(f"⚠️ Simple setup failed: {simple_error}")
-            
-            # Strategy 2: Try with webdriver-manager
-            try:
-                print("🔄 Attempting webdriver-manager setup...")
-                service = Service(ChromeDriverManager().install())
-                driver = webdriver.Chrome(service=service, options=options)
-                print("✅ Chrome WebDriver initialized with webdriver-manager")
-                
-            except Exception as wdm_error:
-                print(f"⚠️ WebDriver-manager failed: {wdm_error}")
-                
-                # Strategy 3: Try with downloaded Chrome (if available)
-                chrome_binary, driver_binary = get_chrome_paths()
-                
-                if chrome_binary and driver_binary:
-                    print(f"🔄 Attempting custom Chrome setup...")
-                    print(f"   Chrome: {chrome_binary}")
-                    print(f"   ChromeDriver: {driver_binary}")
-                    
-                    try:
-                        # Set Chrome binary path
-                        options.binary_location = chrome_binary
-                        
-                        # Try without explicit service first
-                        driver = webdriver.Chrome(options=options)
-                        print("✅ Chrome WebDriver initialized with custom Chrome (auto-service)")
-                        
-                    except Exception as custom_error:
-                        print(f"⚠️ Custom Chrome failed: {custom_error}")
-                        
-                        # Final fallback - try minimal setup
-                        try:
-                            print("🔄 Final fallback: minimal Chrome setup...")
-                            minimal_options = Options()
-                            minimal_options.add_argument('--headless')
-                            minimal_options.add_argument('--no-sandbox')
-                            minimal_options.add_argument('--disable-dev-shm-usage')
-                            
-                            driver = webdriver.Chrome(options=minimal_options)
-                            print("✅ Chrome WebDriver initialized with minimal setup")
-                            
-                        except Exception as minimal_error:
-                            print(f"❌ All Chrome setup methods failed: {minimal_error}")
-                            
-                            # Ultimate fallback: Try Firefox if available
-                            if FIREFOX_AVAILABLE:
-                                try:
-                                    print("🔄 Ultimate fallback: Attempting Firefox setup...")
-                                    firefox_options = FirefoxOptions()
-                                    firefox_options.add_argument('--headless')
-                                    firefox_options.add_argument('--no-sandbox')
-                                    
-                                    # Try Firefox with webdriver-manager
-                                    firefox_service = FirefoxService(GeckoDriverManager().install())
-                                    driver = webdriver.Firefox(service=firefox_service, options=firefox_options)
-                                    print("✅ Firefox WebDriver initialized as Chrome fallback")
-                                    
-                                except Exception as firefox_error:
-                                    print(f"❌ Firefox fallback also failed: {firefox_error}")
-                                    raise firefox_error
-                            else:
-                                raise minimal_error
-                else:
-                    print("❌ No Chrome binaries available and all methods failed")
-                    raise Exception("No Chrome setup method succeeded")
-                    
+        driver = create_driver(config, driver_info)
     except Exception as e:
-        print(f"Chrome setup error: {e}")
-        print("❌ Cannot initialize Chrome WebDriver - will attempt alternative approaches")
-        raise e
+        recorder.finish('error', f"Browser setup failed: {e}")
+        raise
+    recorder.extras['driver'] = dict(driver_info, startup_seconds=round(time.time() - driver_start, 3))
+    recorder.extras['browser'] = driver_info.get('browser')  # The browser that ran, not just the one asked for
+    mark('browser startup')
+    recorder.extras['startup'] = startup_report()
 
+    collect_metrics = bool(config.get('page_metrics'))
+    network_policy = config.get('network_policy')
+    network_stats = NetworkStats() if needs_performance_log(config) else None
+    events = EventCollector(driver, [network_stats], enabled=needs_performance_log(config))
+    capture_har = bool(config.get('har'))
+    har_files = []
+    
+    def enforce_network_policy():
+        if not network_policy:
+            return
+        try:
+            patterns = apply_network_policy(driver, network_policy)
+            if patterns:
+                print(f"🚫 Blocking {len(patterns)} URL patterns")
+        except Exception as e:
+            print(f"⚠️ Could not apply network policy: {e}")
+    
+    enforce_network_policy()
+    
     try:
-        for t_index, test in enumerate(side_data.get('tests', [])):
+        for position, t_index in enumerate(run_order):
+            test = tests[t_index]
+            if position < start_position:
+                continue
+            recorder.start_test(t_index, test)
             print(f"Running test: {test.get('name', t_index)}")
+            
+            isolated_context = None
+            if isolation == 'context':
+                try:
+                    isolated_context = open_isolated_context(driver)
+                    recorder.isolation = 'context'
+                    enforce_network_policy()  # Blocking is per tab
+                except Exception as e:
+                    # No CDP (e.g. Firefox fallback) - fall back to clearing state
+                    print(f"⚠️ Browser context isolation unavailable ({e}) - clearing cookies and storage instead")
+                    clear_browser_state(driver)
+                    recorder.isolation = 'cleared'
+            
+            har_writer = None
+            if capture_har and events.enabled:
+                events.collect()  # Earlier traffic belongs to the previous test
+                har_writer = HarWriter(
+                    har_filename(f"network_t{t_index+1}"),
+                    max_entries=int(config.get('har_max_entries', DEFAULT_MAX_ENTRIES))
+                )
+                events.consumers.append(har_writer)
+            
             for s_index, cmd in enumerate(test.get('commands', [])):
+                if s_index < resume_steps.get(t_index, 0):
+                    continue
                 command = (cmd.get('command') or '').strip()
                 target = cmd.get('target', '')
                 value = cmd.get('value', '')
                 print(f"-> Step {s_index+1}: {command} target={target} value={value}")
+                
+                key = step_key(test, t_index, cmd, s_index)
+                attempts = 1 + (max_retries if key in flaky_steps else 0)
+                step_start = time.time()
+                status, error = 'failed', None
+                for attempt in range(attempts):
+                    try:
+                        status = execute_command(driver, cmd, t_index, s_index, attempt, screenshot_defaults,
+                                                 base_url=side_data.get('url'))
+                        if attempt > 0:
+                            status = 'flaky'
+                            print(f"✅ Step {s_index+1} passed on retry {attempt}")
+                        break
+                    except Exception as e:
+                        error = str(e).splitlines()[0] if str(e) else type(e).__name__
+                        print(f"Error on step {s_index+1}: {e}")
+                        traceback.print_exc()
+                        if attempt + 1 < attempts:
+                            delay = retry_backoff * (2 ** attempt)
+                            print(f"🔁 Retrying known flaky step {s_index+1} in {delay:.1f}s...")
+                            time.sleep(delay)
+                        # otherwise continue to next step
+                
+                step_duration = round(time.time() - step_start, 3)
+                
+                metrics = None
+                if collect_metrics and status in ('passed', 'flaky') and command.lower() in METRIC_COMMANDS:
+                    try:
+                        metrics = collect_page_metrics(driver)
+                    except Exception as e:
+                        print(f"⚠️ Could not collect page metrics on step {s_index+1}: {e}")
+                
+                events.collect()
+                step_result = {
+                    'key': key,
+                    'test': test.get('name', f"Test {t_index+1}"),
+                    'test_index': t_index,
+                    'step': s_index,
+                    'command': command,
+                    'target': target,
+                    'status': status,
+                    'attempts': attempt + 1,
+                    'duration': step_duration,
+                    'error': error if status == 'failed' else None
+                }
+                if metrics:
+                    step_result['metrics'] = metrics
+                if status in ('passed', 'flaky') and command.lower() == 'customscreenshot':
+                    step_result['screenshot'] = screenshot_stem(t_index, s_index)  # Baselines are keyed by step, not file
+                recorder.record_step(step_result)
+            
+            if har_writer is not None:
+                events.collect()
+                events.consumers.remove(har_writer)
+                har_files.append(dict(har_writer.close(), test_index=t_index))
+            
+            if isolated_context:
                 try:
-                    if command.lower() == 'open':
-                        url = target
-                        driver.get(url)
-                        time.sleep(1)
-                    elif command.lower() in ('type', 'settext'):
-                        el = find_element(driver, target)
-                        el.clear()
-                        el.send_keys(value)
-                        time.sleep(0.3)
-                    elif command.lower() in ('sendkeys',):
-                        el = find_element(driver, target)
-                        el.send_keys(value)
-                        time.sleep(0.3)
-                    elif command.lower() == 'click':
-                        el = find_element(driver, target)
-                        el.click()
-                        time.sleep(0.5)
-                    elif command.lower() == 'pause':
-                        # value in milliseconds in SIDE usually
-                        ms = int(value) if value else 1000
-                        time.sleep(ms / 1000.0)
-                    elif command.lower() == 'customscreenshot':
-                        # save step-specific and global screenshot
-                        step_file = f"screenshot_t{t_index+1}_s{s_index+1}.png"
-                        driver.save_screenshot(step_file)
-                        driver.save_screenshot('screenshot.png')
-                        print(f"Saved screenshot: {step_file}")
-                    else:
-                        print(f"Unknown command: {command} - skipping")
+                    close_isolated_context(driver, isolated_context)
                 except Exception as e:
-                    print(f"Error on step {s_index+1}: {e}")
-                    traceback.print_exc()
-                    # continue to next step
+                    print(f"⚠️ Could not close browser context: {e}")
+        events.collect()
+        if network_stats is not None:
+            recorder.extras['network'] = network_stats.summary()
+        if har_files:
+            recorder.extras['har_files'] = har_files
+        recorder.finish()
         print("Test run finished")
+    except Exception as e:
+        recorder.finish('error', str(e))
+        raise
     finally:
         driver.quit()
 
 
 if __name__ == '__main__':
-    if len(sys.argv) != 2:
-        print('Usage: python main.py <path_to_side_file>')
+    if len(sys.argv) not in (2, 4) or (len(sys.argv) == 4 and sys.argv[2] != '--config'):
+        print('Usage: python main.py <path_to_side_file> [--config <run_config.json>]')
         sys.exit(1)
-    run_side_test(sys.argv[1])
\ No newline at end of file
+    run_config = None
+    if len(sys.argv) == 4:
+        with open(sys.argv[3], 'r') as f:
+            run_config = json.load(f)
+    if run_config and run_config.get('profile'):
+        # Profile files land next to the screenshots and are packaged with the results
+        from profiling import Profiler
+        profiler = Profiler(run_config['profile'])
+        try:
+            with profiler:
+                run_side_test(sys.argv[1], run_config)
+        finally:
+            profiler.write(os.getcwd())
+            print(f"📊 Profile ({run_config['profile']}) written")
+    else:
+        run_side_test(sys.argv[1], run_config)
@@ -0,0 +1,303 @@
+"""
+Metrics
+In-process counters and histograms for runs, browser startup, steps, database
+calls and caches, served in Prometheus text format on a local /metrics
+endpoint and as a JSON snapshot for the UI.
+"""
+
+import bisect
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRICS_HOST = os.environ.get('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.environ.get('METRICS_PORT', '9464'))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+SIZE_BUCKETS = (10e3, 100e3, 500e3, 1e6, 5e6, 10e6, 16e6)
+
+
+def _label_key(labelnames, labels):
+    missing = set(labelnames) - set(labels)
+    if missing:
+        raise ValueError(f"Missing labels: {', '.join(sorted(missing))}")
+    return tuple(str(labels[name]) for name in labelnames)
+
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values)) + list((extra or {}).items())
+    if not pairs:
+        return ''
+    escaped = (k + '="' + str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+               for k, v in pairs)
+    return '{' + ','.join(escaped) + '}'
+
+
+class Counter:
+    """Monotonically increasing count, one series per label combination."""
+    kind = 'counter'
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(_label_key(self.labelnames, labels), 0)
+
+    def samples(self):
+        with self._lock:
+            return [(f"{self.name}{_format_labels(self.labelnames, key)}", value)
+                    for key, value in sorted(self._values.items())]
+
+    def snapshot(self):
+        with self._lock:
+            return {','.join(key) or 'total': value for key, value in sorted(self._values.items())}
+
+
+class Gauge(Counter):
+    """Value that can go up and down."""
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram:
+    """Observations counted into cumulative buckets, plus count and sum."""
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            series = self._series.setdefault(key, {'counts': [0] * (len(self.buckets) + 1), 'sum': 0.0, 'count': 0})
+            series['counts'][bisect.bisect_left(self.buckets, value)] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        lines = []
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float('inf'),), series['counts']):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(float(bound))
+                    lines.append((f"{self.name}_bucket{_format_labels(self.labelnames, key, {'le': le})}", cumulative))
+                lines.append((f"{self.name}_sum{_format_labels(self.labelnames, key)}", round(series['sum'], 6)))
+                lines.append((f"{self.name}_count{_format_labels(self.labelnames, key)}", series['count']))
+        return lines
+
+    def _quantile(self, series, q):
+        """Bucket upper bound containing the q-quantile (None past the last bucket)."""
+        target = q * series['count']
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), series['counts']):
+            cumulative += count
+            if cumulative >= target:
+                return None if bound == float('inf') else bound
+        return None
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                ','.join(key) or 'total': {
+                    'count': series['count'],
+                    'sum': round(series['sum'], 4),
+                    'avg': round(series['sum'] / series['count'], 4) if series['count'] else None,
+                    'p50_le': self._quantile(series, 0.5),
+                    'p95_le': self._quantile(series, 0.95),
+                }
+                for key, series in sorted(self._series.items())
+            }
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def render_prometheus(self):
+        """Prometheus text exposition format."""
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(f"{name} {value}" for name, value in metric.samples())
+        return '\n'.join(lines) + '\n'
+
+    def snapshot(self):
+        return {name: metric.snapshot() for name, metric in self.metrics.items()}
+
+
+REGISTRY = Registry()
+
+
+def counter(name, help_text, labelnames=()):
+    return REGISTRY.register(Counter(name, help_text, labelnames))
+
+
+def gauge(name, help_text, labelnames=()):
+    return REGISTRY.register(Gauge(name, help_text, labelnames))
+
+
+def histogram(name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+    return REGISTRY.register(Histogram(name, help_text, labelnames, buckets))
+
+
+# ============================================================================
+# PORTAL METRICS
+# ============================================================================
+RUNS_STARTED = counter('portal_runs_started_total', 'Runner processes started', ['test_type'])
+RUNS_FINISHED = counter('portal_runs_finished_total', 'Runner processes finished, by run status', ['status'])
+RUN_DURATION = histogram('portal_run_duration_seconds', 'Wall time of a runner process', ['browser'])
+DRIVER_STARTUP = histogram('portal_driver_startup_seconds', 'Browser startup time', ['browser', 'cache'])
+STEP_LATENCY = histogram('portal_step_duration_seconds', 'SIDE step execution time', ['command', 'status'])
+SAVE_RUN_SECONDS = histogram('portal_save_run_seconds', 'Time to store a run in MongoDB')
+SAVE_RUN_BYTES = histogram('portal_save_run_bytes', 'Size of stored run artifacts', buckets=SIZE_BUCKETS)
+DB_QUERY_SECONDS = histogram('portal_db_query_seconds', 'MongoDB call latency', ['function'])
+DB_ERRORS = counter('portal_db_errors_total', 'MongoDB calls that raised', ['function'])
+CACHE_REQUESTS = counter('portal_cache_requests_total', 'Cache lookups', ['cache', 'result'])
+RUN_SLOTS_IN_USE = gauge('portal_run_slots_in_use', 'Run slots currently held')
+STARTUP_SECONDS = histogram('portal_startup_seconds', 'Process startup time (bootstrap and imports)', ['process'])
+
+
+def timed_query(fn):
+    """Decorator: observe a database function's latency (and exceptions) by function name."""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        except Exception:
+            DB_ERRORS.inc(function=fn.__name__)
+            raise
+        finally:
+            DB_QUERY_SECONDS.observe(time.perf_counter() - start, function=fn.__name__)
+    return wrapper
+
+
+def record_cache(cache, hit):
+    CACHE_REQUESTS.inc(cache=cache, result='hit' if hit else 'miss')
+
+
+def cache_hit_ratios():
+    """Hit ratio per cache name from CACHE_REQUESTS."""
+    totals = {}
+    for key, value in CACHE_REQUESTS._values.items():
+        cache, result = key
+        totals.setdefault(cache, {'hit': 0, 'miss': 0})[result] = value
+    return {
+        cache: round(counts['hit'] / (counts['hit'] + counts['miss']), 3)
+        for cache, counts in totals.items() if counts['hit'] + counts['miss']
+    }
+
+
+def observe_run_summary(summary, duration=None):
+    """Record the outcome of a runner process from its run_summary.json."""
+    RUNS_FINISHED.inc(status=summary.get('status') or 'unknown')
+    browser = summary.get('browser') or 'unknown'
+    if duration is not None:
+        RUN_DURATION.observe(duration, browser=browser)
+    startup = summary.get('startup') or {}
+    if startup.get('total_seconds') is not None:
+        STARTUP_SECONDS.observe(startup['total_seconds'], process='runner')
+    driver = summary.get('driver') or {}
+    if driver.get('startup_seconds') is not None:
+        DRIVER_STARTUP.observe(driver['startup_seconds'], browser=browser,
+                               cache='hit' if driver.get('cached') else 'miss')
+        record_cache('driver_resolution', driver.get('cached'))
+    for step in summary.get('steps', []):
+        if step.get('duration') is not None:
+            STEP_LATENCY.observe(step['duration'], command=(step.get('command') or '').lower(),
+                                 status=step.get('status', ''))
+
+
+def snapshot():
+    """JSON-friendly view of every metric plus derived cache hit ratios."""
+    data = REGISTRY.snapshot()
+    data['cache_hit_ratio'] = cache_hit_ratios()
+    return data
+
+
+# ============================================================================
+# HTTP ENDPOINT
+# ============================================================================
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.startswith('/metrics.json'):
+            body = json.dumps(snapshot(), default=str).encode()
+            content_type = 'application/json'
+        elif self.path.startswith('/metrics'):
+            body = REGISTRY.render_prometheus().encode()
+            content_type = 'text/plain; version=0.0.4'
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Scrapes would flood the app log
+
+
+_server = None
+_server_error = None  # Bind failure, remembered so Streamlit reruns don't retry and log it again
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(host=METRICS_HOST, port=METRICS_PORT):
+    """Serve /metrics once per process. Returns the bound address, or None if the port is taken.
+
+    The bind is attempted once; after a failure later calls return None quietly.
+    """
+    global _server, _server_error
+    with _server_lock:
+        if _server_error is not None:
+            return None
+        if _server is None:
+            try:
+                _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            except OSError as e:
+                _server_error = e
+                print(f"⚠️ Metrics endpoint not started on {host}:{port}: {e}")
+                return None
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, daemon=True).start()
+            print(f"✅ Metrics endpoint on http://{host}:{_server.server_address[1]}/metrics")
+        return _server.server_address
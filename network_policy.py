@@ -0,0 +1,116 @@
+"""
+Network Policy
+Per-app block lists enforced through Chrome DevTools request blocking, plus
+accounting of requests/bytes read back from Chrome's performance log.
+"""
+
+import json
+
+# Resource types are enforced as URL patterns: Network.setBlockedURLs is the
+# blocking primitive reachable through Selenium's synchronous CDP bridge
+RESOURCE_TYPE_PATTERNS = {
+    "Font": ["*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot", "*fonts.googleapis.com*", "*fonts.gstatic.com*"],
+    "Media": ["*.mp4", "*.webm", "*.ogg", "*.mp3", "*.m3u8", "*.mov", "*youtube.com/embed*", "*player.vimeo.com*"],
+    "Image": ["*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.avif", "*.svg", "*.ico"],
+    "Stylesheet": ["*.css"],
+}
+
+THIRD_PARTY_PRESET = [
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+    "*googlesyndication.com*", "*adservice.google.*", "*connect.facebook.net*",
+    "*hotjar.com*", "*segment.io*", "*segment.com/analytics*", "*mixpanel.com*",
+    "*clarity.ms*", "*intercom.io*", "*newrelic.com*", "*nr-data.net*", "*sentry.io*",
+]
+
+
+def empty_policy():
+    return {"block_patterns": [], "block_types": [], "block_third_party": False}
+
+
+def blocked_url_patterns(policy):
+    """Flatten a policy into the URL patterns handed to Chrome."""
+    if not policy:
+        return []
+    patterns = [p.strip() for p in policy.get("block_patterns", []) if p and p.strip()]
+    for resource_type in policy.get("block_types", []):
+        patterns.extend(RESOURCE_TYPE_PATTERNS.get(resource_type, []))
+    if policy.get("block_third_party"):
+        patterns.extend(THIRD_PARTY_PRESET)
+    # Keep order, drop duplicates
+    return list(dict.fromkeys(patterns))
+
+
+def apply_network_policy(driver, policy):
+    """Enable request blocking for the current tab. Returns the patterns applied."""
+    patterns = blocked_url_patterns(policy)
+    if not patterns:
+        return []
+    driver.execute_cdp_cmd('Network.enable', {})
+    driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': patterns})
+    return patterns
+
+
+def read_performance_events(driver):
+    """Drain Chrome's performance log into a list of DevTools events ({method, params})."""
+    events = []
+    for entry in driver.get_log('performance'):
+        try:
+            message = json.loads(entry['message'])['message']
+        except (KeyError, ValueError):
+            continue
+        events.append(message)
+    return events
+
+
+class NetworkStats:
+    """Counts requests, transferred bytes and blocked requests from DevTools events."""
+
+    def __init__(self):
+        self.requests = 0
+        self.transferred_bytes = 0
+        self.blocked_requests = 0
+        self.blocked_by_type = {}
+        self._types = {}
+        self._bytes_by_type = {}
+        self._loaded_by_type = {}
+
+    def consume(self, events):
+        for event in events:
+            method = event.get('method')
+            params = event.get('params', {})
+            request_id = params.get('requestId')
+            if method == 'Network.requestWillBeSent':
+                self.requests += 1
+                self._types[request_id] = params.get('type', 'Other')
+            elif method == 'Network.loadingFinished':
+                resource_type = self._types.get(request_id, 'Other')
+                size = int(params.get('encodedDataLength', 0))
+                self.transferred_bytes += size
+                self._bytes_by_type[resource_type] = self._bytes_by_type.get(resource_type, 0) + size
+                self._loaded_by_type[resource_type] = self._loaded_by_type.get(resource_type, 0) + 1
+            elif method == 'Network.loadingFailed' and params.get('blockedReason'):
+                resource_type = params.get('type') or self._types.get(request_id, 'Other')
+                self.blocked_requests += 1
+                self.blocked_by_type[resource_type] = self.blocked_by_type.get(resource_type, 0) + 1
+
+    def blocked_bytes_estimate(self):
+        """Bytes skipped, estimated from same-type requests that did load in this run.
+
+        Blocked requests never reach the network so their size is unknown; types
+        with no loaded sample contribute nothing, making this a lower bound.
+        """
+        estimate = 0
+        for resource_type, count in self.blocked_by_type.items():
+            loaded = self._loaded_by_type.get(resource_type)
+            if loaded:
+                estimate += count * self._bytes_by_type[resource_type] // loaded
+        return estimate
+
+    def summary(self):
+        return {
+            'requests': self.requests,
+            'transferred_bytes': self.transferred_bytes,
+            'blocked_requests': self.blocked_requests,
+            'blocked_by_type': self.blocked_by_type,
+            'blocked_bytes_estimate': self.blocked_bytes_estimate(),
+        }
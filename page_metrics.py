@@ -0,0 +1,118 @@
+"""
+Page Performance Metrics
+Collects Navigation/Resource Timing, Largest Contentful Paint, CLS and JS heap
+size from the application under test, and flags regressions across runs.
+"""
+
+# Runs inside the page via execute_async_script. LCP and layout shifts are only
+# exposed to PerformanceObservers, so observe the buffered entries briefly.
+METRICS_SCRIPT = """
+const done = arguments[arguments.length - 1];
+const result = {url: location.href};
+const nav = performance.getEntriesByType('navigation')[0];
+if (nav) {
+    result.ttfb = nav.responseStart - nav.requestStart;
+    result.dom_content_loaded = nav.domContentLoadedEventEnd;
+    result.load = nav.loadEventEnd;
+    result.transfer_bytes = nav.transferSize;
+}
+const resources = performance.getEntriesByType('resource');
+result.resources = resources.length;
+result.resource_bytes = resources.reduce((sum, r) => sum + (r.transferSize || 0), 0);
+result.slowest_resource = resources.reduce((max, r) => Math.max(max, r.duration), 0);
+if (performance.memory) {
+    result.js_heap = performance.memory.usedJSHeapSize;
+}
+let lcp = null, cls = 0;
+const observers = [];
+try {
+    const lcpObserver = new PerformanceObserver(list => {
+        const entries = list.getEntries();
+        if (entries.length) lcp = entries[entries.length - 1].startTime;
+    });
+    lcpObserver.observe({type: 'largest-contentful-paint', buffered: true});
+    observers.push(lcpObserver);
+    const clsObserver = new PerformanceObserver(list => {
+        for (const entry of list.getEntries()) {
+            if (!entry.hadRecentInput) cls += entry.value;
+        }
+    });
+    clsObserver.observe({type: 'layout-shift', buffered: true});
+    observers.push(clsObserver);
+} catch (e) {}
+setTimeout(() => {
+    observers.forEach(o => o.disconnect());
+    result.lcp = lcp;
+    result.cls = cls;
+    done(result);
+}, 50);
+"""
+
+# Metric name -> (label, unit); all are "lower is better"
+METRICS = {
+    'ttfb': ('Time to first byte', 'ms'),
+    'dom_content_loaded': ('DOMContentLoaded', 'ms'),
+    'load': ('Load event', 'ms'),
+    'lcp': ('Largest Contentful Paint', 'ms'),
+    'cls': ('Cumulative Layout Shift', ''),
+    'transfer_bytes': ('Document transfer', 'bytes'),
+    'resources': ('Resource requests', ''),
+    'resource_bytes': ('Resource transfer', 'bytes'),
+    'slowest_resource': ('Slowest resource', 'ms'),
+    'js_heap': ('JS heap used', 'bytes'),
+}
+
+REGRESSION_THRESHOLD = 0.2  # 20% worse than the recent median
+
+
+def _heap_from_cdp(driver):
+    """JS heap size via the DevTools Performance domain (Chrome only)."""
+    driver.execute_cdp_cmd('Performance.enable', {})
+    metrics = driver.execute_cdp_cmd('Performance.getMetrics', {}).get('metrics', [])
+    return next((m['value'] for m in metrics if m.get('name') == 'JSHeapUsedSize'), None)
+
+
+def collect_page_metrics(driver, timeout=5):
+    """Return a compact metrics record for the current page."""
+    driver.set_script_timeout(timeout)
+    raw = driver.execute_async_script(METRICS_SCRIPT) or {}
+    if raw.get('js_heap') is None:
+        try:
+            raw['js_heap'] = _heap_from_cdp(driver)
+        except Exception:
+            pass
+    record = {'url': raw.get('url')}
+    for name in METRICS:
+        value = raw.get(name)
+        if value is None:
+            continue
+        record[name] = round(value, 4) if name == 'cls' else int(round(value))
+    return record
+
+
+def _median(values):
+    values = sorted(values)
+    mid = len(values) // 2
+    return values[mid] if len(values) % 2 else (values[mid - 1] + values[mid]) / 2
+
+
+def find_regressions(current, previous, threshold=REGRESSION_THRESHOLD):
+    """Compare one step's metrics with the same step in earlier runs.
+
+    current: metrics dict; previous: list of metrics dicts (any order).
+    Returns {metric: {"value", "baseline", "change"}} for metrics that got worse.
+    """
+    regressions = {}
+    for name in METRICS:
+        if current.get(name) is None:
+            continue
+        history = [p[name] for p in previous if p.get(name) is not None]
+        if not history:
+            continue
+        baseline = _median(history)
+        if baseline <= 0:
+            continue
+        change = (current[name] - baseline) / baseline
+        if change > threshold:
+            regressions[name] = {'value': current[name], 'baseline': baseline, 'change': round(change, 3)}
+    return regressions
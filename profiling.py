@@ -0,0 +1,154 @@
+"""
+Profiling
+Opt-in profiling of test runs and page renders: deterministic cProfile
+(pstats) or a low-overhead stack sampler producing collapsed stacks that
+flamegraph tools (speedscope, flamegraph.pl) read directly.
+"""
+
+import cProfile
+import io
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+import zipfile
+from collections import Counter
+
+PROFILE_MODES = ('sampler', 'cprofile')
+PROFILE_PREFIX = 'profile'
+PROFILE_EXTENSIONS = ('.prof', '.folded', '.profile.txt')
+DEFAULT_SAMPLE_INTERVAL = 0.005  # seconds
+TOP_FUNCTIONS = 40
+
+
+class SamplingProfiler:
+    """Samples one thread's Python stack on a timer; the profiled code is not traced."""
+
+    def __init__(self, thread_id=None, interval=DEFAULT_SAMPLE_INTERVAL):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self._started = None
+        self.elapsed = 0.0
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def start(self):
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self.elapsed = time.perf_counter() - self._started
+
+    def collapsed(self):
+        """Collapsed stack format: one 'frame;frame;frame count' line per unique stack."""
+        return '\n'.join(f"{stack} {count}" for stack, count in self.stacks.most_common()) + '\n'
+
+    def summary(self, limit=TOP_FUNCTIONS):
+        """Functions by share of samples they appear in (inclusive) and on top of the stack (self)."""
+        inclusive, own = Counter(), Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(';')
+            for frame in set(frames):
+                inclusive[frame] += count
+            own[frames[-1]] += count
+        total = max(self.samples, 1)
+        lines = [f"{self.samples} samples every {self.interval * 1000:.0f} ms over {self.elapsed:.2f}s",
+                 f"{'incl%':>7} {'self%':>7}  function"]
+        for frame, count in inclusive.most_common(limit):
+            lines.append(f"{100 * count / total:7.1f} {100 * own[frame] / total:7.1f}  {frame}")
+        return '\n'.join(lines) + '\n'
+
+
+class Profiler:
+    """Context manager profiling the enclosed block in the calling thread.
+
+    mode "cprofile" traces every call (exact counts, higher overhead); "sampler"
+    only samples stacks, cheap enough for production runs.
+    """
+
+    def __init__(self, mode='sampler', interval=DEFAULT_SAMPLE_INTERVAL):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode: {mode}")
+        self.mode = mode
+        self.interval = interval
+        self._profiler = None
+
+    def __enter__(self):
+        if self.mode == 'cprofile':
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        else:
+            self._profiler = SamplingProfiler(interval=self.interval)
+            self._profiler.start()
+        return self
+
+    def __exit__(self, *exc):
+        if self.mode == 'cprofile':
+            self._profiler.disable()
+        else:
+            self._profiler.stop()
+        return False
+
+    def summary(self, limit=TOP_FUNCTIONS):
+        """Human-readable top functions."""
+        if self.mode == 'sampler':
+            return self._profiler.summary(limit)
+        out = io.StringIO()
+        pstats.Stats(self._profiler, stream=out).sort_stats('cumulative').print_stats(limit)
+        return out.getvalue()
+
+    def artifacts(self, prefix=PROFILE_PREFIX):
+        """Output files as {filename: bytes}: raw profile plus a text summary."""
+        files = {f"{prefix}.profile.txt": self.summary().encode()}
+        if self.mode == 'cprofile':
+            self._profiler.create_stats()
+            files[f"{prefix}.prof"] = marshal.dumps(self._profiler.stats)  # pstats / snakeviz format
+        else:
+            files[f"{prefix}.folded"] = self._profiler.collapsed().encode()
+        return files
+
+    def write(self, directory, prefix=PROFILE_PREFIX):
+        """Write artifacts into a directory. Returns the paths written."""
+        paths = []
+        for name, data in self.artifacts(prefix).items():
+            path = os.path.join(directory, name)
+            with open(path, 'wb') as f:
+                f.write(data)
+            paths.append(path)
+        return paths
+
+
+def is_profile_file(name):
+    return name.endswith(PROFILE_EXTENSIONS)
+
+
+def profile_files_in_zip(zip_bytes):
+    """Names of the profile files packaged in a results ZIP."""
+    if not zip_bytes:
+        return []
+    try:
+        with io.BytesIO(zip_bytes) as zb, zipfile.ZipFile(zb) as zf:
+            return sorted(n for n in zf.namelist() if is_profile_file(n))
+    except zipfile.BadZipFile:
+        return []
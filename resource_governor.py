@@ -0,0 +1,277 @@
+"""
+Resource Governor
+Admission control for test runs: each run needs a slot, slots are only handed
+out while live memory/CPU telemetry says another browser fits, and runaway
+browser process trees are killed once they pass a memory ceiling.
+"""
+
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from metrics import RUN_SLOTS_IN_USE
+from startup import lazy_module
+
+# Imported on the first telemetry call rather than at portal startup
+psutil = lazy_module('psutil')
+PSUTIL_AVAILABLE = psutil is not None
+
+MB = 1024 * 1024
+DEFAULT_RUN_MEMORY_MB = 400       # Expected peak of one runner + headless browser before any run is observed
+MEMORY_HEADROOM_MB = 150          # Kept free for the portal itself
+CPU_LIMIT = 90.0                  # Don't start a browser while the host is pegged
+DEFAULT_ADMISSION_TIMEOUT = 600   # seconds a run may wait in the queue
+WATCH_INTERVAL = 0.5              # seconds between process tree samples
+CPU_SAMPLE_INTERVAL = 1.0         # seconds a CPU reading is reused before psutil is asked again
+
+
+def process_tree_rss(pid):
+    """Resident memory (bytes) of a process and all of its descendants."""
+    try:
+        parent = psutil.Process(pid)
+        processes = [parent] + parent.children(recursive=True)
+    except psutil.Error:
+        return 0
+    total = 0
+    for process in processes:
+        try:
+            total += process.memory_info().rss
+        except psutil.Error:
+            pass  # Exited between listing and sampling
+    return total
+
+
+def kill_process_tree(pid):
+    """Kill a process and every descendant (browser, renderers, driver). Returns the number killed."""
+    if not PSUTIL_AVAILABLE:
+        try:
+            os.kill(pid, 9)
+            return 1
+        except OSError:
+            return 0
+    try:
+        parent = psutil.Process(pid)
+        processes = parent.children(recursive=True) + [parent]
+    except psutil.Error:
+        return 0
+    for process in processes:
+        try:
+            process.kill()
+        except psutil.Error:
+            pass
+    psutil.wait_procs(processes, timeout=5)
+    return len(processes)
+
+
+class ResourceGovernor:
+    """Hands out run slots based on live telemetry and watches running process trees.
+
+    Slots are granted first-come-first-served. A run is admitted when a slot is
+    free, available memory covers the expected peak of a run (learned from the
+    peaks of finished runs) plus what already-running runs may still grow into,
+    and CPU is below CPU_LIMIT. Without psutil only the slot count applies.
+    """
+
+    def __init__(self, max_slots=None, run_memory_mb=DEFAULT_RUN_MEMORY_MB,
+                 memory_ceiling_mb=None, cpu_limit=CPU_LIMIT):
+        self.max_slots = max_slots
+        self.run_memory_mb = run_memory_mb
+        self.memory_ceiling_mb = memory_ceiling_mb
+        self.cpu_limit = cpu_limit
+        self.killed = 0
+        self._cond = threading.Condition()
+        self._active = {}
+        self._queue = []
+        self._cpu_lock = threading.Lock()
+        self._cpu_percent = 0.0
+        self._cpu_sampled = 0.0
+
+    # ------------------------------------------------------------------
+    # Telemetry
+    # ------------------------------------------------------------------
+    def cpu_percent(self):
+        """Host CPU, sampled at most once per CPU_SAMPLE_INTERVAL.
+
+        psutil.cpu_percent(interval=None) measures since its previous call, so
+        every caller (sidebar, metrics gauge, worker heartbeat, admission) reads
+        this one cached sample instead of resetting the window for the others.
+        """
+        with self._cpu_lock:
+            now = time.monotonic()
+            if now - self._cpu_sampled >= CPU_SAMPLE_INTERVAL:
+                self._cpu_percent = psutil.cpu_percent(interval=None)
+                self._cpu_sampled = now
+            return self._cpu_percent
+
+    def telemetry(self):
+        """Current host memory and the shared CPU sample."""
+        if not PSUTIL_AVAILABLE:
+            return {'memory_total_mb': 0, 'memory_available_mb': 0, 'memory_percent': 0, 'cpu_percent': 0}
+        memory = psutil.virtual_memory()
+        return {
+            'memory_total_mb': memory.total // MB,
+            'memory_available_mb': memory.available // MB,
+            'memory_percent': memory.percent,
+            'cpu_percent': self.cpu_percent(),
+        }
+
+    def slot_limit(self):
+        """Configured slot count, or as many expected runs as fit in total memory."""
+        if self.max_slots:
+            return self.max_slots
+        if not PSUTIL_AVAILABLE:
+            return 1
+        total_mb = psutil.virtual_memory().total // MB
+        return max(1, int((total_mb - MEMORY_HEADROOM_MB) // self.run_memory_mb))
+
+    def ceiling_mb(self):
+        """Memory a single run's process tree may use before it is killed."""
+        if self.memory_ceiling_mb:
+            return self.memory_ceiling_mb
+        if not PSUTIL_AVAILABLE:
+            return None
+        total_mb = psutil.virtual_memory().total // MB
+        return max(self.run_memory_mb * 2, int(total_mb * 0.6))
+
+    def _blocked_reason(self):
+        """Why the next run cannot start right now, or None."""
+        if len(self._active) >= self.slot_limit():
+            return 'all run slots busy'
+        if not PSUTIL_AVAILABLE:
+            return None
+        stats = self.telemetry()
+        # Running runs may still grow towards the expected peak
+        pending_growth = sum(max(0, self.run_memory_mb - run['rss_mb']) for run in self._active.values())
+        needed = self.run_memory_mb + pending_growth + MEMORY_HEADROOM_MB
+        if self._active and stats['memory_available_mb'] < needed:
+            return f"low memory ({stats['memory_available_mb']} MB free, {needed:.0f} MB needed)"
+        if self._active and stats['cpu_percent'] >= self.cpu_limit:
+            return f"CPU busy ({stats['cpu_percent']:.0f}%)"
+        return None
+
+    # ------------------------------------------------------------------
+    # Admission
+    # ------------------------------------------------------------------
+    def acquire(self, label, timeout=DEFAULT_ADMISSION_TIMEOUT):
+        """Wait for a run slot. Returns a run id; raises TimeoutError if none frees up in time.
+
+        The first queued run is always admitted when nothing else is running, so a
+        busy host never deadlocks the queue.
+        """
+        run_id = uuid.uuid4().hex[:12]
+        deadline = time.time() + timeout if timeout else None
+        with self._cond:
+            self._queue.append(run_id)
+            try:
+                while True:
+                    reason = self._blocked_reason() if self._queue[0] == run_id else 'queued'
+                    if reason is None:
+                        break
+                    remaining = deadline - time.time() if deadline else None
+                    if remaining is not None and remaining <= 0:
+                        raise TimeoutError(f"No run slot became free within {timeout}s ({reason})")
+                    # Telemetry changes without notifications, so re-check periodically
+                    self._cond.wait(min(1.0, remaining) if remaining is not None else 1.0)
+            finally:
+                self._queue.remove(run_id)
+                self._cond.notify_all()
+            self._active[run_id] = {'label': label, 'started': time.time(), 'pid': None,
+                                    'rss_mb': 0, 'peak_mb': 0}
+            RUN_SLOTS_IN_USE.set(len(self._active))
+        return run_id
+
+    def release(self, run_id):
+        """Free a slot and fold the run's peak memory into the per-run estimate."""
+        with self._cond:
+            run = self._active.pop(run_id, None)
+            RUN_SLOTS_IN_USE.set(len(self._active))
+            if run and run['peak_mb']:
+                # Moving average of observed peaks, never below the baseline
+                self.run_memory_mb = max(DEFAULT_RUN_MEMORY_MB,
+                                         int(0.7 * self.run_memory_mb + 0.3 * run['peak_mb']))
+            self._cond.notify_all()
+        return run
+
+    @contextmanager
+    def slot(self, label, timeout=DEFAULT_ADMISSION_TIMEOUT):
+        run_id = self.acquire(label, timeout)
+        try:
+            yield run_id
+        finally:
+            self.release(run_id)
+
+    # ------------------------------------------------------------------
+    # Per-run accounting
+    # ------------------------------------------------------------------
+    def watch(self, run_id, process):
+        """Sample a run's process tree until it exits, killing it past the memory ceiling.
+
+        Returns a usage dict that is filled in while the process runs:
+        {"peak_memory_mb", "killed", "reason"}.
+        """
+        usage = {'peak_memory_mb': 0, 'killed': False, 'reason': None}
+        if not PSUTIL_AVAILABLE:
+            return usage
+        with self._cond:
+            if run_id in self._active:
+                self._active[run_id]['pid'] = process.pid
+
+        def monitor():
+            ceiling = self.ceiling_mb()
+            while process.poll() is None:
+                rss_mb = process_tree_rss(process.pid) // MB
+                usage['peak_memory_mb'] = max(usage['peak_memory_mb'], rss_mb)
+                with self._cond:
+                    run = self._active.get(run_id)
+                    if run:
+                        run['rss_mb'] = rss_mb
+                        run['peak_mb'] = usage['peak_memory_mb']
+                if ceiling and rss_mb > ceiling:
+                    usage['killed'] = True
+                    usage['reason'] = f"Run killed: browser processes used {rss_mb} MB (ceiling {ceiling} MB)"
+                    print(f"❌ {usage['reason']}")
+                    kill_process_tree(process.pid)
+                    self.killed += 1
+                    return
+                time.sleep(WATCH_INTERVAL)
+
+        threading.Thread(target=monitor, daemon=True).start()
+        return usage
+
+    def status(self):
+        """Slot usage and telemetry for display."""
+        with self._cond:
+            active = [
+                {'label': run['label'], 'running_for': round(time.time() - run['started']),
+                 'memory_mb': run['rss_mb'], 'peak_mb': run['peak_mb']}
+                for run in self._active.values()
+            ]
+            queued = len(self._queue)
+            blocked = self._blocked_reason()
+        return {
+            'slots': self.slot_limit(),
+            'in_use': len(active),
+            'queued': queued,
+            'active': active,
+            'blocked': blocked,
+            'run_memory_estimate_mb': self.run_memory_mb,
+            'memory_ceiling_mb': self.ceiling_mb(),
+            'killed': self.killed,
+            **self.telemetry(),
+        }
+
+
+def _env_int(name):
+    try:
+        return int(os.environ[name])
+    except (KeyError, ValueError):
+        return None
+
+
+# One governor per process - every Streamlit session shares it
+governor = ResourceGovernor(
+    max_slots=_env_int('MAX_CONCURRENT_RUNS'),
+    memory_ceiling_mb=_env_int('RUN_MEMORY_CEILING_MB'),
+)
@@ -0,0 +1,204 @@
+"""
+Run Comparison
+Aligns two runs of the same SIDE file by test and step from their stored
+step results and screenshot hashes - no results ZIP is opened - and reports
+per-step duration deltas, status changes and screenshot distances - or lines
+up the runs of one browser-matrix execution to compare browsers.
+"""
+
+from visual_diff import hash_distance
+
+SLOWER_RATIO = 1.2     # A step is "slower" when it takes 20% longer...
+MIN_DELTA = 0.2        # ...and at least this many seconds longer (ignores jitter on fast steps)
+
+
+def _step_id(step):
+    return step.get('key') or f"{step.get('test_index')}:{step.get('step')}"
+
+
+def status_change(before, after):
+    """Classify how a step's outcome moved between two runs."""
+    if before is None:
+        return 'added'
+    if after is None:
+        return 'removed'
+    if before == after:
+        return ''
+    if after == 'failed':
+        return 'regressed'
+    if before == 'failed':
+        return 'fixed'
+    return f"{before} → {after}"
+
+
+def timing_change(before, after, ratio=SLOWER_RATIO, min_delta=MIN_DELTA):
+    """'slower', 'faster' or '' for two durations in seconds."""
+    if before is None or after is None:
+        return ''
+    if after - before >= min_delta and after >= before * ratio:
+        return 'slower'
+    if before - after >= min_delta and before >= after * ratio:
+        return 'faster'
+    return ''
+
+
+def compare_steps(base_steps, other_steps):
+    """One row per step of either run, in the newer run's order (steps only in the base run last)."""
+    base = {_step_id(s): s for s in base_steps or []}
+    other = {_step_id(s): s for s in other_steps or []}
+    order = list(other) + [key for key in base if key not in other]
+    rows = []
+    for key in order:
+        a, b = base.get(key), other.get(key)
+        ref = b or a
+        before = a.get('duration') if a else None
+        after = b.get('duration') if b else None
+        delta = round(after - before, 3) if before is not None and after is not None else None
+        rows.append({
+            'key': key,
+            'test': ref.get('test'),
+            'test_index': ref.get('test_index'),
+            'step': ref.get('step'),
+            'command': ref.get('command'),
+            'target': ref.get('target'),
+            'base_status': a.get('status') if a else None,
+            'status': b.get('status') if b else None,
+            'base_duration': before,
+            'duration': after,
+            'delta': delta,
+            'delta_pct': round(100 * delta / before, 1) if delta is not None and before else None,
+            'status_change': status_change(a.get('status') if a else None, b.get('status') if b else None),
+            'timing': timing_change(before, after),
+            'error': b.get('error') if b else None,
+        })
+    return rows
+
+
+def compare_tests(step_rows):
+    """Per-test duration totals and status changes, from the aligned step rows."""
+    tests = {}
+    for row in step_rows:
+        test = tests.setdefault(row['test'], {'test': row['test'], 'base_duration': 0.0, 'duration': 0.0,
+                                              'regressed': 0, 'fixed': 0, 'slower': 0})
+        test['base_duration'] += row['base_duration'] or 0.0
+        test['duration'] += row['duration'] or 0.0
+        for flag in ('regressed', 'fixed'):
+            test[flag] += row['status_change'] == flag
+        test['slower'] += row['timing'] == 'slower'
+    for test in tests.values():
+        test['base_duration'] = round(test['base_duration'], 3)
+        test['duration'] = round(test['duration'], 3)
+        test['delta'] = round(test['duration'] - test['base_duration'], 3)
+    return list(tests.values())
+
+
+def compare_screenshots(base_diffs, other_diffs):
+    """Screenshot hash distance between the two runs per screenshot step.
+
+    Only the hashes are stored with a run, so any distance counts as changed.
+    """
+    base = {d['step']: d for d in base_diffs or [] if d.get('step')}
+    other = {d['step']: d for d in other_diffs or [] if d.get('step')}
+    rows = []
+    for step in sorted(set(base) | set(other)):
+        distance = hash_distance((base.get(step) or {}).get('hash'), (other.get(step) or {}).get('hash'))
+        if step not in base or step not in other:
+            change = 'added' if step not in base else 'removed'
+        else:
+            change = 'changed' if distance != 0 else ''
+        # vs_baseline: the newer run's own check against the stored baseline
+        rows.append({'step': step, 'distance': distance, 'change': change,
+                     'vs_baseline': (other.get(step) or {}).get('status')})
+    return rows
+
+
+def compare_runs(base_run, other_run):
+    """Full comparison of two stored run summaries (base = the older run)."""
+    steps = compare_steps(base_run.get('step_results'), other_run.get('step_results'))
+    before, after = base_run.get('run_duration'), other_run.get('run_duration')
+    return {
+        'steps': steps,
+        'tests': compare_tests(steps),
+        'screenshots': compare_screenshots(base_run.get('visual_diffs'), other_run.get('visual_diffs')),
+        'summary': {
+            'base_status': base_run.get('status'),
+            'status': other_run.get('status'),
+            'base_duration': before,
+            'duration': after,
+            'delta': round(after - before, 3) if before is not None and after is not None else None,
+            'regressed': sum(r['status_change'] == 'regressed' for r in steps),
+            'fixed': sum(r['status_change'] == 'fixed' for r in steps),
+            'slower': sum(r['timing'] == 'slower' for r in steps),
+            'faster': sum(r['timing'] == 'faster' for r in steps),
+        },
+    }
+
+
+def slowest_changes(step_rows, limit=10):
+    """Steps with the largest duration increase."""
+    return sorted((r for r in step_rows if r['delta'] is not None and r['delta'] > 0),
+                  key=lambda r: r['delta'], reverse=True)[:limit]
+
+
+# ============================================================================
+# BROWSER MATRIX
+# ============================================================================
+def compare_browsers(summaries):
+    """Per-step timings of one SIDE on several browsers ({browser: run summary}), aligned by step.
+
+    Durations and statuses are keyed by browser; spread is the slowest minus the
+    fastest browser's time for the step.
+    """
+    browsers = list(summaries)
+    steps = {b: {_step_id(s): s for s in (summaries[b] or {}).get('steps') or []} for b in browsers}
+    order = list(dict.fromkeys(key for b in browsers for key in steps[b]))
+    rows = []
+    for key in order:
+        present = {b: steps[b][key] for b in browsers if key in steps[b]}
+        ref = next(iter(present.values()))
+        durations = {b: s.get('duration') for b, s in present.items() if s.get('duration') is not None}
+        fastest = min(durations, key=durations.get) if durations else None
+        rows.append({
+            'key': key,
+            'test': ref.get('test'),
+            'test_index': ref.get('test_index'),
+            'step': ref.get('step'),
+            'command': ref.get('command'),
+            'target': ref.get('target'),
+            'durations': durations,
+            'statuses': {b: s.get('status') for b, s in present.items()},
+            'fastest': fastest if len(durations) > 1 else None,
+            'spread': round(max(durations.values()) - min(durations.values()), 3) if len(durations) > 1 else None,
+        })
+    totals = []
+    for b in browsers:
+        summary = summaries[b] or {}
+        totals.append({
+            'browser': b,
+            'ran_on': summary.get('browser') or b,  # Differs only if the requested browser fell back
+            'status': summary.get('status'),
+            'duration': summary.get('duration'),
+            'step_time': round(sum(s.get('duration') or 0.0 for s in steps[b].values()), 3),
+            'startup': (summary.get('driver') or {}).get('startup_seconds'),
+            'failed': sum(s.get('status') == 'failed' for s in steps[b].values()),
+            'fastest_steps': sum(r['fastest'] == b for r in rows),
+        })
+    return {'browsers': browsers, 'steps': rows, 'totals': totals}
+
+
+def browser_timings(runs):
+    """Run count, pass rate and mean/median duration per browser over stored runs."""
+    groups = {}
+    for run in runs:
+        groups.setdefault(run.get('browser') or 'unknown', []).append(run)
+    rows = []
+    for browser, browser_runs in sorted(groups.items()):
+        durations = sorted(r['run_duration'] for r in browser_runs if r.get('run_duration') is not None)
+        rows.append({
+            'browser': browser,
+            'runs': len(browser_runs),
+            'pass_rate': round(100 * sum(r.get('status') == 'passed' for r in browser_runs) / len(browser_runs), 1),
+            'mean_duration': round(sum(durations) / len(durations), 2) if durations else None,
+            'median_duration': durations[len(durations) // 2] if durations else None,
+        })
+    return rows
@@ -0,0 +1,454 @@
+"""
+Test Runner
+Executes SIDE files through main.py in an isolated subprocess and packages
+the log, screenshots and run summary into a results ZIP.
+"""
+
+import os
+import io
+import json
+import time
+import zipfile
+import tempfile
+import subprocess
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from driver_cache import BROWSERS
+from har_capture import HAR_EXTENSIONS
+from profiling import is_profile_file
+from screenshots import IMAGE_EXTENSIONS
+from metrics import RUNS_STARTED, observe_run_summary
+from resource_governor import governor, kill_process_tree
+
+logger = logging.getLogger(__name__)
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+RUN_SUMMARY_FILE = 'run_summary.json'
+RUN_CONFIG_FILE = 'run_config.json'
+DEFAULT_TIMEOUT = 300  # seconds
+CANCEL_POLL_INTERVAL = 1.0  # seconds between cancel checks while main.py runs
+RUN_BACKENDS = ('local', 'queue')  # This host, or the distributed worker pool (job_queue.py / worker.py)
+
+
+def _python_command():
+    """Pick the Python interpreter used to launch main.py."""
+    # Try different Python paths for different environments
+    python_candidates = [
+        os.path.join(PROJECT_DIR, "venv", "bin", "python"),  # Local venv
+        "python3",  # System Python 3
+        "python"    # System Python
+    ]
+
+    for candidate in python_candidates:
+        try:
+            if os.path.exists(candidate) or candidate in ["python3", "python"]:
+                return candidate
+        except:
+            continue
+
+    return "python3"  # Fallback
+
+
+def _wait(process, timeout, cancel=None):
+    """Wait for main.py, killing its process tree on timeout or when cancel is set.
+
+    Returns why the run was stopped, or None when it exited by itself.
+    """
+    deadline = time.time() + timeout
+    while True:
+        if cancel is not None and cancel.is_set():
+            kill_process_tree(process.pid)
+            return "Run cancelled"
+        remaining = deadline - time.time()
+        try:
+            process.wait(timeout=max(0, min(CANCEL_POLL_INTERVAL, remaining)))
+            return None
+        except subprocess.TimeoutExpired:
+            if time.time() >= deadline:
+                # Take the browser down too, not just main.py
+                kill_process_tree(process.pid)
+                return f"Test execution timed out after {timeout / 60:.0f} minutes"
+
+
+def _execute(workdir, side_data, app_name, test_type, config, timeout, cancel=None):
+    """Run main.py once inside workdir. Returns (side_path, log_path).
+
+    cancel is an optional threading.Event; setting it kills the run.
+    """
+    side_path = os.path.join(workdir, f"{app_name or 'app'}_{test_type}.side")
+    with open(side_path, 'w') as f:
+        json.dump(side_data, f, separators=(',', ':'))  # Compact JSON
+
+    log_path = os.path.join(workdir, 'run.log')
+    command = [_python_command(), os.path.join(PROJECT_DIR, "main.py"), side_path]
+
+    if config:
+        config_path = os.path.join(workdir, RUN_CONFIG_FILE)
+        with open(config_path, 'w') as f:
+            json.dump(config, f, separators=(',', ':'))
+        command += ['--config', config_path]
+
+    try:
+        with governor.slot(f"{app_name or 'app'}/{test_type}") as run_id:
+            RUNS_STARTED.inc(test_type=test_type)
+            started = time.time()
+            # Run inside the work directory so screenshots are created there
+            with open(log_path, 'w') as logf:
+                process = subprocess.Popen(
+                    command,
+                    cwd=workdir,
+                    stdout=logf,
+                    stderr=subprocess.STDOUT,
+                    env=dict(os.environ, PYTHONUNBUFFERED='1')
+                )
+                usage = governor.watch(run_id, process)
+                stopped = _wait(process, timeout, cancel)
+                if stopped:
+                    usage['reason'] = stopped
+            if usage['reason']:
+                # run_summary.json is flushed after every step, so progress up to here survives
+                with open(log_path, 'a') as logf:
+                    logf.write(f"\n\nERROR: {usage['reason']}")
+            summary = _record_resources(workdir, usage)
+            observe_run_summary(summary or {'status': 'error'}, time.time() - started)
+    except Exception as e:
+        with open(log_path, 'a') as logf:
+            logf.write(f"\n\nERROR: {str(e)}")
+    return side_path, log_path
+
+
+def _record_resources(workdir, usage):
+    """Add the run's memory usage (and why it was stopped, if it was) to its summary.
+
+    Returns the updated summary, or None when main.py never wrote one.
+    """
+    summary_path = os.path.join(workdir, RUN_SUMMARY_FILE)
+    if not os.path.exists(summary_path):
+        return None
+    try:
+        with open(summary_path, 'r') as f:
+            summary = json.load(f)
+        summary['resources'] = {'peak_memory_mb': usage['peak_memory_mb'], 'killed': usage['killed']}
+        if usage['reason'] and summary.get('status') == 'running':
+            summary['status'] = 'error'
+            summary['error'] = usage['reason']
+        with open(summary_path, 'w') as f:
+            json.dump(summary, f, separators=(',', ':'))
+        return normalize_run_summary(summary)
+    except Exception as e:
+        logger.warning(f"Could not record run resources: {e}")
+        return None
+
+
+def _package_results(workdir, files_to_zip):
+    """Zip result files and return the ZIP bytes."""
+    zip_path = os.path.join(workdir, 'results.zip')
+    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED, compresslevel=6) as zf:
+        for fpath in files_to_zip:
+            if os.path.exists(fpath):
+                arcname = os.path.basename(fpath)
+                # Screenshots are already compressed - deflating them again only costs CPU
+                stored = arcname.lower().endswith(IMAGE_EXTENSIONS)
+                zf.write(fpath, arcname, compress_type=zipfile.ZIP_STORED if stored else None)
+
+    # Return ZIP bytes
+    if os.path.exists(zip_path):
+        with open(zip_path, 'rb') as zf:
+            return zf.read()
+    else:
+        # Create minimal ZIP if main ZIP creation failed
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr('error.txt', 'Test execution failed - no results generated')
+        buffer.seek(0)
+        return buffer.getvalue()
+
+
+def _screenshot_files(workdir, limit=20):
+    """Screenshots produced in a work directory (limit to reasonable number)."""
+    return [
+        os.path.join(workdir, filename) for filename in sorted(os.listdir(workdir))
+        if filename.lower().endswith(IMAGE_EXTENSIONS)
+    ][:limit]
+
+
+def _har_files(workdir):
+    """Compressed HAR files written by main.py (one per test)."""
+    return [
+        os.path.join(workdir, filename) for filename in sorted(os.listdir(workdir))
+        if filename.endswith(HAR_EXTENSIONS)
+    ]
+
+
+def _profile_files(workdir):
+    """Profiler output written by main.py when the run config asks for profiling."""
+    return [
+        os.path.join(workdir, filename) for filename in sorted(os.listdir(workdir))
+        if is_profile_file(filename)
+    ]
+
+
+def run_test_and_get_results(side_data, app_name, test_type="test", config=None, timeout=DEFAULT_TIMEOUT,
+                             backend='local', cancel=None):
+    """Execute test and return ZIP results with optimizations.
+
+    config is forwarded to main.run_side_test (e.g. flaky_steps to retry,
+    resume_from to continue from a checkpoint, tests to run a subset).
+    backend "queue" hands the run to the worker pool instead of this host.
+    cancel (a threading.Event) stops a local run early; what ran so far is still packaged.
+    """
+    if backend == 'queue':
+        from job_queue import run_remote
+        return run_remote(side_data, app_name, test_type, config, timeout)
+    
+    with tempfile.TemporaryDirectory() as tmpdir:
+        side_path, log_path = _execute(tmpdir, side_data, app_name, test_type, config, timeout, cancel)
+
+        # Create optimized results ZIP
+        files_to_zip = []
+
+        # Add log file if it exists and has content
+        if os.path.exists(log_path) and os.path.getsize(log_path) > 0:
+            files_to_zip.append(log_path)
+
+        # Add SIDE file
+        if os.path.exists(side_path):
+            files_to_zip.append(side_path)
+
+        # Add per-step outcomes written by main.py
+        summary_path = os.path.join(tmpdir, RUN_SUMMARY_FILE)
+        if os.path.exists(summary_path):
+            files_to_zip.append(summary_path)
+
+        files_to_zip.extend(_screenshot_files(tmpdir))
+        files_to_zip.extend(_har_files(tmpdir))
+        files_to_zip.extend(_profile_files(tmpdir))
+        return _package_results(tmpdir, files_to_zip)
+
+
+def merge_run_summaries(summaries):
+    """Combine the summaries of parallel shards into one run summary."""
+    summaries = [s for s in summaries if s]
+    statuses = [s.get('status') for s in summaries]
+    if 'error' in statuses or not summaries:
+        status = 'error'
+    elif 'failed' in statuses:
+        status = 'failed'
+    else:
+        status = 'passed'
+    errors = [s['error'] for s in summaries if s.get('error')]
+    return {
+        'status': status,
+        'error': '; '.join(errors) or None,
+        'duration': max((s.get('duration', 0) for s in summaries), default=0),
+        'resume': None,
+        'checkpoint': None,
+        'workers': len(summaries),
+        'tests': sorted((t for s in summaries for t in s.get('tests', [])), key=lambda t: t['index']),
+        'har_files': [h for s in summaries for h in s.get('har_files', [])],
+        # Shard order and outcome - a resume continues every shard where it stopped
+        'run_order': [t for s in summaries for t in s.get('run_order') or []],
+        'shards': [{'run_order': s.get('run_order'), 'status': s.get('status')} for s in summaries],
+        'driver': summaries[0].get('driver') if summaries else None,
+        'browser': summaries[0].get('browser') if summaries else None,
+        'startup': summaries[0].get('startup') if summaries else None,
+        'resources': {
+            'peak_memory_mb': sum(s.get('resources', {}).get('peak_memory_mb', 0) for s in summaries),
+            'killed': any(s.get('resources', {}).get('killed') for s in summaries)
+        },
+        'steps': sorted((st for s in summaries for st in s.get('steps', [])),
+                        key=lambda st: (st['test_index'], st['step']))
+    }
+
+
+def _unpack_shard(zip_bytes, shard_dir, app_name, test_type):
+    """Extract a remote shard's results ZIP into its work directory. Returns (side_path, log_path)."""
+    try:
+        with io.BytesIO(zip_bytes) as zb, zipfile.ZipFile(zb) as zf:
+            for name in zf.namelist():
+                with open(os.path.join(shard_dir, os.path.basename(name)), 'wb') as f:
+                    f.write(zf.read(name))
+    except zipfile.BadZipFile as e:
+        logger.warning(f"Worker returned an unreadable results ZIP: {e}")
+    return (os.path.join(shard_dir, f"{app_name or 'app'}_{test_type}.side"),
+            os.path.join(shard_dir, 'run.log'))
+
+
+def _run_shards_remote(shard_dirs, side_data, app_name, groups, test_type, config, timeout):
+    """Queue every shard at once so the worker pool runs them side by side, then collect them."""
+    from job_queue import submit_job, wait_for_job, error_zip
+    job_ids = [submit_job(side_data, app_name, test_type, dict(config or {}, tests=group), timeout)
+               for group in groups]
+    outputs = []
+    for shard_dir, job_id in zip(shard_dirs, job_ids):
+        try:
+            zip_bytes = wait_for_job(job_id, timeout)
+        except Exception as e:
+            zip_bytes = error_zip(f"Distributed shard failed: {e}")
+        outputs.append(_unpack_shard(zip_bytes, shard_dir, app_name, test_type))
+    return outputs
+
+
+def run_tests_parallel(side_data, app_name, groups, test_type="test", config=None, timeout=DEFAULT_TIMEOUT,
+                       backend='local'):
+    """Run groups of tests (see scheduler.schedule_tests) in parallel runner processes.
+
+    Each group gets its own browser and work directory; logs, screenshots and
+    step outcomes are merged into a single results ZIP. With backend "queue"
+    every group becomes a job for the worker pool.
+    """
+    if len(groups) <= 1:
+        shard_config = dict(config or {}, tests=groups[0] if groups else [])
+        return run_test_and_get_results(side_data, app_name, test_type, shard_config, timeout, backend)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        shard_dirs = []
+        for w in range(len(groups)):
+            shard_dir = os.path.join(tmpdir, f"worker{w+1}")
+            os.makedirs(shard_dir)
+            shard_dirs.append(shard_dir)
+
+        if backend == 'queue':
+            outputs = _run_shards_remote(shard_dirs, side_data, app_name, groups, test_type, config, timeout)
+        else:
+            with ThreadPoolExecutor(max_workers=len(groups)) as pool:
+                futures = [
+                    pool.submit(_execute, shard_dir, side_data, app_name, test_type,
+                                dict(config or {}, tests=group), timeout)
+                    for shard_dir, group in zip(shard_dirs, groups)
+                ]
+                outputs = [f.result() for f in futures]
+
+        # Merge logs and summaries from every shard
+        log_path = os.path.join(tmpdir, 'run.log')
+        summaries = []
+        with open(log_path, 'w') as merged_log:
+            for w, (shard_dir, (side_path, shard_log)) in enumerate(zip(shard_dirs, outputs)):
+                merged_log.write(f"===== Worker {w+1}: tests {groups[w]} =====\n")
+                if os.path.exists(shard_log):
+                    with open(shard_log, 'r', errors='replace') as f:
+                        merged_log.write(f.read())
+                merged_log.write("\n")
+                shard_summary = os.path.join(shard_dir, RUN_SUMMARY_FILE)
+                if os.path.exists(shard_summary):
+                    with open(shard_summary, 'r') as f:
+                        summaries.append(normalize_run_summary(json.load(f)))
+                else:
+                    summaries.append({'status': 'error', 'error': f'Worker {w+1} produced no summary', 'steps': []})
+
+        summary_path = os.path.join(tmpdir, RUN_SUMMARY_FILE)
+        with open(summary_path, 'w') as f:
+            json.dump(merge_run_summaries(summaries), f, separators=(',', ':'))
+
+        files_to_zip = [log_path, outputs[0][0], summary_path]
+        seen = set()
+        for shard_dir in shard_dirs:
+            for path in _screenshot_files(shard_dir):
+                # Step screenshots are named by global test index, so only the latest screenshot.* can collide
+                if os.path.basename(path) not in seen:
+                    seen.add(os.path.basename(path))
+                    files_to_zip.append(path)
+        files_to_zip = files_to_zip[:3 + 20]
+        for w, shard_dir in enumerate(shard_dirs):
+            files_to_zip.extend(_har_files(shard_dir))
+            for path in _profile_files(shard_dir):
+                # Every worker writes profile.*, so prefix with the worker number
+                renamed = os.path.join(tmpdir, f"worker{w+1}_{os.path.basename(path)}")
+                os.replace(path, renamed)
+                files_to_zip.append(renamed)
+        return _package_results(tmpdir, files_to_zip)
+
+
+def run_browser_matrix(side_data, app_name, plans, test_type="test", timeout=DEFAULT_TIMEOUT, backend='local'):
+    """Run the same SIDE on several browsers at once. Returns {browser: results ZIP}.
+
+    plans maps each browser to {"groups": test groups, "config": run config} - every
+    browser is scheduled from its own history. Each gets its own run_tests_parallel
+    call (so its own shards, work directories and run slots) and runs strictly on
+    that browser - no fallback.
+    """
+    unknown = [b for b in plans if b not in BROWSERS]
+    if unknown:
+        raise ValueError(f"Unknown browser(s): {', '.join(unknown)}")
+    with ThreadPoolExecutor(max_workers=len(plans) or 1) as pool:
+        futures = {
+            browser: pool.submit(run_tests_parallel, side_data, app_name, plan['groups'], test_type,
+                                 dict(plan.get('config') or {}, browser=browser, browser_fallback=False),
+                                 timeout, backend)
+            for browser, plan in plans.items()
+        }
+        return {browser: future.result() for browser, future in futures.items()}
+
+
+def read_run_summary(zip_bytes):
+    """Read run_summary.json from a results ZIP.
+
+    Runs that died before main.py wrote a summary are reported as errors.
+    """
+    summary = None
+    if zip_bytes:
+        try:
+            with io.BytesIO(zip_bytes) as zb, zipfile.ZipFile(zb) as zf:
+                if RUN_SUMMARY_FILE in zf.namelist():
+                    summary = json.loads(zf.read(RUN_SUMMARY_FILE))
+        except Exception as e:
+            logger.warning(f"Could not read run summary: {e}")
+
+    if not summary:
+        return {'status': 'error', 'error': 'Runner produced no summary', 'steps': []}
+    return normalize_run_summary(summary)
+
+
+def normalize_run_summary(summary):
+    """Normalize a parsed run summary."""
+    if summary.get('status') == 'running':
+        # main.py was killed mid-run (e.g. timeout)
+        summary['status'] = 'error'
+        summary['error'] = summary.get('error') or 'Run did not finish'
+    return summary
+
+
+def _shard_resume_point(step_results, status=None, run_order=None):
+    """Resume point of one runner process, following its execution order."""
+    position = {t_index: p for p, t_index in enumerate(run_order or [])}
+    steps = sorted(step_results, key=lambda s: (position.get(s['test_index'], len(position) + s['test_index']), s['step']))
+    point = next(({'test_index': s['test_index'], 'step': s['step']} for s in steps if s.get('status') == 'failed'), None)
+    if point is None and status == 'error':
+        if steps:
+            point = {'test_index': steps[-1]['test_index'], 'step': steps[-1]['step'] + 1}
+        elif run_order:
+            point = {'test_index': run_order[0], 'step': 0}  # Died before its first step
+    if point is None:
+        return None
+    if point['test_index'] in position:
+        point['tests'] = run_order[position[point['test_index']]:]
+    return point
+
+
+def find_resume_point(step_results, status=None, run_order=None, shards=None):
+    """Where to resume a run: its first failed step, or the step after its checkpoint.
+
+    Returns {"test_index", "step"} or None when the run completed cleanly. With the
+    run's order it also returns "tests", the order to continue in; for parallel runs
+    every shard is resumed on its own and the shards after the first add "points".
+    """
+    if shards:
+        points = []
+        for shard in shards:
+            shard_tests = set(shard.get('run_order') or [])
+            point = _shard_resume_point([s for s in step_results or [] if s.get('test_index') in shard_tests],
+                                        shard.get('status'), shard.get('run_order'))
+            if point:
+                points.append(point)
+    else:
+        point = _shard_resume_point(step_results or [], status, run_order)
+        points = [point] if point else []
+    if not points:
+        return None
+    resume = {'test_index': points[0]['test_index'], 'step': points[0]['step']}
+    if all('tests' in p for p in points):
+        resume['tests'] = [t for p in points for t in p['tests']]
+    if len(points) > 1:
+        resume['points'] = [{'test_index': p['test_index'], 'step': p['step']} for p in points[1:]]
+    return resume
@@ -0,0 +1,118 @@
+"""
+Test Scheduler
+Selects which tests of a SIDE file to run and spreads them across parallel
+workers longest-processing-time-first using durations from earlier runs.
+"""
+
+import hashlib
+import heapq
+import json
+import re
+
+DEFAULT_TEST_DURATION = 30.0  # seconds, used when a test has never run
+TAG_PATTERN = re.compile(r"[@#]([\w-]+)")
+
+
+def test_key(test, t_index):
+    """Stable identifier for a test across runs of the same SIDE file."""
+    return test.get('id') or test.get('name') or str(t_index)
+
+
+def test_fingerprint(test):
+    """Content hash of a test's commands, used to detect changed tests.
+
+    Rendered tests carry their template's hash (template_fingerprint, see
+    side_templates), so generated values like ${timestamp()} don't count as changes.
+    """
+    if test.get('template_fingerprint'):
+        return test['template_fingerprint']
+    commands = [
+        {k: cmd.get(k, '') for k in ('command', 'target', 'value')}
+        for cmd in test.get('commands', [])
+    ]
+    return hashlib.sha1(json.dumps(commands, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def test_tags(side_data):
+    """Map test index -> set of tags.
+
+    Tags come from the names of suites that contain the test and from
+    @tag / #tag tokens in the test name.
+    """
+    tests = side_data.get('tests', [])
+    id_to_index = {t.get('id'): i for i, t in enumerate(tests) if t.get('id')}
+    tags = {i: set(TAG_PATTERN.findall(t.get('name', ''))) for i, t in enumerate(tests)}
+    for suite in side_data.get('suites', []):
+        for test_id in suite.get('tests', []):
+            if test_id in id_to_index and suite.get('name'):
+                tags[id_to_index[test_id]].add(suite['name'])
+    return tags
+
+
+def select_tests(side_data, history=None, changed_only=False, tags=None):
+    """Return the indices of the tests to run.
+
+    history is the output of db_manager.get_test_stats: {"fingerprints", "failed", "durations"}.
+    changed_only keeps tests whose commands changed since the last run (plus last run's
+    failures and never-run tests); tags keeps tests carrying any of the given tags.
+    """
+    history = history or {}
+    tests = side_data.get('tests', [])
+    selected = list(range(len(tests)))
+
+    if tags:
+        wanted = set(tags)
+        all_tags = test_tags(side_data)
+        selected = [i for i in selected if all_tags[i] & wanted]
+
+    if changed_only and history.get('fingerprints'):
+        previous = history['fingerprints']
+        failed = set(history.get('failed', []))
+        selected = [
+            i for i in selected
+            if previous.get(test_key(tests[i], i)) != test_fingerprint(tests[i])
+            or test_key(tests[i], i) in failed
+        ]
+    return selected
+
+
+def estimate_durations(side_data, indices, history=None):
+    """Expected duration per test index from history, falling back to the median."""
+    known = (history or {}).get('durations', {})
+    tests = side_data.get('tests', [])
+    values = sorted(known.values())
+    fallback = values[len(values) // 2] if values else DEFAULT_TEST_DURATION
+    return {i: known.get(test_key(tests[i], i), fallback) for i in indices}
+
+
+def schedule_tests(side_data, indices, history=None, workers=1, failed_first=True):
+    """Split tests across workers longest-processing-time-first.
+
+    Each test goes to the currently least-loaded worker, largest first, which keeps
+    the slowest worker close to optimal. Within a worker, tests that failed last time
+    run first for fast feedback, then longest first. Returns a list of index lists.
+    """
+    if not indices:
+        return []
+    tests = side_data.get('tests', [])
+    durations = estimate_durations(side_data, indices, history)
+    failed = set((history or {}).get('failed', [])) if failed_first else set()
+    workers = max(1, min(int(workers), len(indices)))
+
+    loads = [(0.0, w) for w in range(workers)]
+    groups = [[] for _ in range(workers)]
+    for i in sorted(indices, key=lambda i: durations[i], reverse=True):
+        load, w = heapq.heappop(loads)
+        groups[w].append(i)
+        heapq.heappush(loads, (load + durations[i], w))
+
+    for group in groups:
+        group.sort(key=lambda i: (test_key(tests[i], i) not in failed, -durations[i]))
+    return [g for g in groups if g]
+
+
+def expected_makespan(side_data, groups, history=None):
+    """Estimated wall time of a schedule - the busiest worker's total."""
+    indices = [i for g in groups for i in g]
+    durations = estimate_durations(side_data, indices, history)
+    return max((sum(durations[i] for i in g) for g in groups), default=0.0)
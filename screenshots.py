@@ -0,0 +1,116 @@
+"""
+Screenshot Capture
+Step screenshots through DevTools Page.captureScreenshot: PNG, JPEG or WebP
+with a quality setting, clipped to the command's target element or covering
+the full page. The browser encodes the image once and the bytes go straight
+to the step file. Browsers without CDP (Firefox) fall back to WebDriver PNGs.
+"""
+
+import base64
+import os
+
+# Page.captureScreenshot format -> file extension
+SCREENSHOT_FORMATS = {'png': '.png', 'jpeg': '.jpg', 'webp': '.webp'}
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp')
+IMAGE_MIME_TYPES = {'.png': 'image/png', '.jpg': 'image/jpeg', '.jpeg': 'image/jpeg', '.webp': 'image/webp'}
+DEFAULT_QUALITY = 80        # JPEG/WebP quality (1-100); PNG is lossless and ignores it
+LATEST_SCREENSHOT = 'screenshot'  # Most recent capture of the run, next to the per-step files
+
+# Element box in document coordinates - the clip is relative to the page, not the viewport
+ELEMENT_BOX_SCRIPT = """
+const r = arguments[0].getBoundingClientRect();
+return {x: r.left + window.scrollX, y: r.top + window.scrollY, width: r.width, height: r.height};
+"""
+
+
+def _flag(value):
+    return value if isinstance(value, bool) else str(value).strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def screenshot_options(defaults=None, value=''):
+    """Capture options from the run config's "screenshot" dict, overridden per step by the command value.
+
+    The value is "key=val;..." e.g. "format=jpeg;quality=60;full_page=true".
+    Raises ValueError for an unknown format.
+    """
+    options = {'format': 'png', 'quality': DEFAULT_QUALITY, 'full_page': False}
+    options.update(defaults or {})
+    for item in (value or '').split(';'):
+        key, sep, setting = item.partition('=')
+        if sep and key.strip():
+            options[key.strip().lower()] = setting.strip()
+    fmt = str(options['format']).strip().lower()
+    fmt = 'jpeg' if fmt == 'jpg' else fmt
+    if fmt not in SCREENSHOT_FORMATS:
+        raise ValueError(f"Unknown screenshot format '{fmt}' (expected one of {', '.join(SCREENSHOT_FORMATS)})")
+    return {
+        'format': fmt,
+        'quality': min(max(int(options['quality']), 1), 100),
+        'full_page': _flag(options['full_page']),
+    }
+
+
+def image_mime(filename):
+    return IMAGE_MIME_TYPES.get(os.path.splitext(filename)[1].lower(), 'application/octet-stream')
+
+
+def element_clip(driver, element):
+    box = driver.execute_script(ELEMENT_BOX_SCRIPT, element)
+    if not box or box['width'] <= 0 or box['height'] <= 0:
+        raise ValueError("Screenshot target has no visible size")
+    return dict(box, scale=1)
+
+
+def full_page_clip(driver):
+    metrics = driver.execute_cdp_cmd('Page.getLayoutMetrics', {})
+    size = metrics.get('cssContentSize') or metrics['contentSize']
+    return {'x': 0, 'y': 0, 'width': size['width'], 'height': size['height'], 'scale': 1}
+
+
+def capture_cdp(driver, options, element=None):
+    """Encoded image bytes from Page.captureScreenshot."""
+    params = {'format': options['format']}
+    if options['format'] != 'png':
+        params['quality'] = options['quality']
+    clip = element_clip(driver, element) if element is not None else (
+        full_page_clip(driver) if options['full_page'] else None)
+    if clip:
+        params['clip'] = clip
+        params['captureBeyondViewport'] = True  # Parts of the clip may be scrolled out of view
+    return base64.b64decode(driver.execute_cdp_cmd('Page.captureScreenshot', params)['data'])
+
+
+def capture_webdriver(driver, options, element=None):
+    """PNG bytes through plain WebDriver, for browsers without CDP."""
+    if element is not None:
+        return element.screenshot_as_png
+    if options['full_page'] and hasattr(driver, 'get_full_page_screenshot_as_png'):
+        return driver.get_full_page_screenshot_as_png()  # Firefox
+    return driver.get_screenshot_as_png()
+
+
+def save_step_screenshot(driver, stem, options, element=None):
+    """Capture once and write the bytes to {stem}{ext} and the run's latest screenshot.
+
+    Returns (filename, format actually written) - "png" when CDP is unavailable.
+    """
+    fmt = options['format']
+    try:
+        data = capture_cdp(driver, options, element)
+    except ValueError:
+        raise
+    except Exception as e:
+        # No execute_cdp_cmd (Firefox), or the browser rejected the capture parameters
+        if fmt != 'png':
+            print(f"⚠️ CDP screenshots unavailable ({e}) - saving PNG instead of {fmt}")
+        data, fmt = capture_webdriver(driver, options, element), 'png'
+    filename = stem + SCREENSHOT_FORMATS[fmt]
+    with open(filename, 'wb') as f:
+        f.write(data)
+    latest = LATEST_SCREENSHOT + SCREENSHOT_FORMATS[fmt]
+    with open(latest, 'wb') as f:
+        f.write(data)
+    for ext in set(SCREENSHOT_FORMATS.values()) - {SCREENSHOT_FORMATS[fmt]}:
+        if os.path.exists(LATEST_SCREENSHOT + ext):
+            os.remove(LATEST_SCREENSHOT + ext)  # Keep one "latest" file when the format changes
+    return filename, fmt
@@ -0,0 +1,241 @@
+"""
+SIDE Editor Model
+The manual editor's canonical SIDE document, changed only through small edit
+patches addressed by test/step id and kept with an undo/redo operation log,
+plus paging helpers so the UI renders one test and one page of steps at a time.
+"""
+
+import io
+import json
+import uuid
+from copy import deepcopy
+
+DEFAULT_PAGE_SIZE = 20
+STEP_FIELDS = ('command', 'target', 'value', 'comment')
+EXPORT_FORMATS = ('compact', 'pretty')
+
+
+def new_id():
+    return str(uuid.uuid4())
+
+
+def new_side(name):
+    return {
+        'id': new_id(),
+        'version': '1.0',
+        'name': name,
+        'url': '',
+        'tests': [],
+        'suites': [],
+        'urls': [],
+        'plugins': []
+    }
+
+
+def new_test(name):
+    return {'id': new_id(), 'name': name, 'commands': []}
+
+
+def new_step():
+    return {'id': new_id(), 'comment': '', 'command': '', 'target': '', 'targets': [], 'value': ''}
+
+
+def ensure_ids(side):
+    """Give every test and command an id - edits and widget keys are addressed by id."""
+    for test in side.setdefault('tests', []):
+        test.setdefault('id', new_id())
+        for cmd in test.setdefault('commands', []):
+            if not cmd.get('id'):
+                cmd['id'] = new_id()
+    return side
+
+
+def find_test(side, test_id):
+    """Index of a test by id (None when missing)."""
+    return next((i for i, t in enumerate(side['tests']) if t.get('id') == test_id), None)
+
+
+def find_step(test, step_id):
+    """Index of a command by id (None when missing)."""
+    return next((i for i, c in enumerate(test['commands']) if c.get('id') == step_id), None)
+
+
+def _test(side, test_id):
+    index = find_test(side, test_id)
+    if index is None:
+        raise KeyError(f"Unknown test {test_id}")
+    return side['tests'][index]
+
+
+_UNSET = object()
+
+
+def apply_edit(side, edit):
+    """Apply one edit patch to the document in place and return its inverse patch.
+
+    Edits are dicts with an "op" and the ids they touch:
+      set_side_name {value}
+      add_test {test, index?} / delete_test {test_id} / rename_test {test_id, value}
+      add_step {test_id, step, index?} / delete_step {test_id, step_id}
+      set_step_field {test_id, step_id, field, value | unset} / move_step {test_id, step_id, to}
+    """
+    op = edit['op']
+    if op == 'set_side_name':
+        inverse = {'op': op, 'value': side.get('name', '')}
+        side['name'] = edit['value']
+    elif op == 'add_test':
+        index = edit.get('index', len(side['tests']))
+        side['tests'].insert(index, edit['test'])
+        inverse = {'op': 'delete_test', 'test_id': edit['test']['id']}
+    elif op == 'delete_test':
+        index = find_test(side, edit['test_id'])
+        inverse = {'op': 'add_test', 'test': side['tests'].pop(index), 'index': index}
+    elif op == 'rename_test':
+        test = _test(side, edit['test_id'])
+        inverse = {'op': op, 'test_id': edit['test_id'], 'value': test.get('name', '')}
+        test['name'] = edit['value']
+    elif op == 'add_step':
+        commands = _test(side, edit['test_id'])['commands']
+        commands.insert(edit.get('index', len(commands)), edit['step'])
+        inverse = {'op': 'delete_step', 'test_id': edit['test_id'], 'step_id': edit['step']['id']}
+    elif op == 'delete_step':
+        test = _test(side, edit['test_id'])
+        index = find_step(test, edit['step_id'])
+        inverse = {'op': 'add_step', 'test_id': edit['test_id'], 'step': test['commands'].pop(index), 'index': index}
+    elif op == 'set_step_field':
+        test = _test(side, edit['test_id'])
+        cmd = test['commands'][find_step(test, edit['step_id'])]
+        old = cmd.get(edit['field'], _UNSET)
+        inverse = {'op': op, 'test_id': edit['test_id'], 'step_id': edit['step_id'], 'field': edit['field']}
+        inverse.update({'unset': True} if old is _UNSET else {'value': old})
+        if edit.get('unset'):
+            cmd.pop(edit['field'], None)
+        else:
+            cmd[edit['field']] = edit['value']
+    elif op == 'move_step':
+        test = _test(side, edit['test_id'])
+        index = find_step(test, edit['step_id'])
+        test['commands'].insert(edit['to'], test['commands'].pop(index))
+        inverse = {'op': op, 'test_id': edit['test_id'], 'step_id': edit['step_id'], 'to': index}
+    else:
+        raise ValueError(f"Unknown edit op: {op}")
+    return inverse
+
+
+class SideDocument:
+    """Editor document store: the working SIDE plus an operation log.
+
+    The loaded document is deep-copied once, so nothing is shared with the
+    upload tab or database results. Every change goes through apply() and is
+    logged with its inverse, which makes undo/redo, snapshots and "what changed
+    since load" cost O(edits) rather than a copy or diff of the whole document.
+    """
+
+    def __init__(self, side, copy=True):
+        self.doc = ensure_ids(deepcopy(side) if copy else side)
+        self._undo = []     # [(edit, inverse)] in application order
+        self._redo = []
+        self.version = 0    # Bumped on every change, including undo/redo
+
+    @property
+    def revision(self):
+        return len(self._undo)
+
+    def apply(self, edit):
+        self._undo.append((edit, apply_edit(self.doc, edit)))
+        self._redo.clear()
+        self.version += 1
+
+    def set_name(self, name):
+        """Name the document after the selected app - not a user edit, so it stays out of the log."""
+        if self.doc.get('name') != name:
+            self.doc['name'] = name
+            self.version += 1
+
+    def can_undo(self):
+        return bool(self._undo)
+
+    def can_redo(self):
+        return bool(self._redo)
+
+    def undo(self):
+        if self._undo:
+            edit, inverse = self._undo.pop()
+            apply_edit(self.doc, inverse)
+            self._redo.append(edit)
+            self.version += 1
+
+    def redo(self):
+        if self._redo:
+            edit = self._redo.pop()
+            self._undo.append((edit, apply_edit(self.doc, edit)))
+            self.version += 1
+
+    def snapshot(self):
+        """A cheap marker of the current state (a position in the log)."""
+        return self.revision
+
+    def restore(self, snapshot):
+        """Undo back to a snapshot taken earlier on this document."""
+        while self.revision > snapshot:
+            self.undo()
+
+    def changes(self):
+        """Net changes since load, from the log: [{"op", "test", "step", "field", "before", "after"}].
+
+        Field edits are folded per (step, field) and dropped when they end up back at
+        the loaded value; structural edits (tests/steps added, deleted, moved) are listed.
+        """
+        fields = {}
+        changes = []
+        for edit, inverse in self._undo:
+            op = edit['op']
+            if op in ('set_side_name', 'rename_test', 'set_step_field'):
+                key = (op, edit.get('test_id'), edit.get('step_id'), edit.get('field'))
+                before = fields[key]['before'] if key in fields else inverse.get('value')
+                fields[key] = {'op': op, 'test': edit.get('test_id'), 'step': edit.get('step_id'),
+                               'field': edit.get('field'), 'before': before, 'after': edit.get('value')}
+                continue
+            item = edit.get('test') or edit.get('step') or inverse.get('test') or inverse.get('step') or {}
+            changes.append({'op': op, 'test': edit.get('test_id') or item.get('id'), 'step': edit.get('step_id'),
+                            'field': None, 'before': None, 'after': item.get('name') or item.get('command')})
+        changes.extend(c for c in fields.values() if c['before'] != c['after'])
+        return changes
+
+    def is_dirty(self):
+        return bool(self.changes())
+
+
+def page_count(total, page_size=DEFAULT_PAGE_SIZE):
+    return max(1, -(-total // page_size))
+
+
+def page_bounds(total, page, page_size=DEFAULT_PAGE_SIZE):
+    """(start, end) indices of a 1-based page, clamped to the available pages."""
+    page = min(max(1, page), page_count(total, page_size))
+    start = (page - 1) * page_size
+    return start, min(start + page_size, total)
+
+
+def side_stats(side):
+    tests = side.get('tests', [])
+    return {'tests': len(tests), 'commands': sum(len(t.get('commands', [])) for t in tests)}
+
+
+def iter_export(side, fmt='compact'):
+    """Encoded .side file chunks - serialized incrementally, never held as one str."""
+    if fmt == 'pretty':
+        encoder = json.JSONEncoder(indent=2)
+    else:
+        encoder = json.JSONEncoder(separators=(',', ':'))
+    for chunk in encoder.iterencode(side):
+        yield chunk.encode()
+
+
+def export_side(side, fmt='compact'):
+    """The document as a .side file in a BytesIO, ready for a download."""
+    buffer = io.BytesIO()
+    for chunk in iter_export(side, fmt):
+        buffer.write(chunk)
+    buffer.seek(0)
+    return buffer
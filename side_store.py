@@ -0,0 +1,143 @@
+"""
+SIDE file storage helpers
+Content hashing and compact diff/overlay encoding used by db_manager to keep
+one copy of each SIDE file and store modified SIDEs as patches.
+"""
+
+import difflib
+import hashlib
+import json
+
+PATCH_VERSION = 1
+
+
+def side_hash(side_bytes: bytes) -> str:
+    """Return the SHA-256 content hash used as the side_files key."""
+    return hashlib.sha256(side_bytes).hexdigest()
+
+
+def dump_side(side_data) -> bytes:
+    """Serialize SIDE data the same compact way the runner does."""
+    return json.dumps(side_data, separators=(',', ':')).encode()
+
+
+def _canonical(obj) -> str:
+    return json.dumps(obj, sort_keys=True, separators=(',', ':'))
+
+
+def _diff_commands(orig_cmds, new_cmds):
+    """Encode command list changes as opcodes with field-level overlays."""
+    matcher = difflib.SequenceMatcher(
+        a=[_canonical(c) for c in orig_cmds],
+        b=[_canonical(c) for c in new_cmds],
+        autojunk=False
+    )
+    ops = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            continue
+        replacement = new_cmds[j1:j2]
+        if tag == 'replace':
+            # Replacements are usually param edits - keep only changed fields
+            # for the paired commands and splice in whatever is left over
+            paired = min(i2 - i1, j2 - j1)
+            overlay = []
+            for old, new in zip(orig_cmds[i1:i1 + paired], replacement[:paired]):
+                if list(old.keys()) != list(new.keys()):
+                    overlay = None
+                    break
+                overlay.append({k: v for k, v in new.items() if old.get(k) != v})
+            if overlay is not None:
+                ops.append({"at": i1, "fields": overlay})
+                if (i2 - i1) != (j2 - j1):
+                    ops.append({"at": i1 + paired, "end": i2, "cmds": replacement[paired:]})
+                continue
+        ops.append({"at": i1, "end": i2, "cmds": replacement})
+    return ops
+
+
+def diff_side(original, modified):
+    """Build a compact patch that turns original SIDE data into modified."""
+    patch = {"v": PATCH_VERSION, "set": {}, "tests": {}}
+
+    for key, value in modified.items():
+        if key != 'tests' and original.get(key) != value:
+            patch["set"][key] = value
+    removed = [k for k in original if k not in modified]
+    if removed:
+        patch["unset"] = removed
+    if list(original.keys()) != list(modified.keys()):
+        patch["order"] = list(modified.keys())
+
+    orig_tests = original.get('tests', [])
+    new_tests = modified.get('tests', [])
+    if len(orig_tests) != len(new_tests):
+        patch["set"]["tests"] = new_tests
+        return patch
+
+    for t_index, (old_test, new_test) in enumerate(zip(orig_tests, new_tests)):
+        if old_test == new_test:
+            continue
+        old_rest = {k: v for k, v in old_test.items() if k != 'commands'}
+        new_rest = {k: v for k, v in new_test.items() if k != 'commands'}
+        if old_rest != new_rest or list(old_test.keys()) != list(new_test.keys()):
+            patch["tests"][str(t_index)] = {"test": new_test}
+        else:
+            patch["tests"][str(t_index)] = {
+                "ops": _diff_commands(old_test.get('commands', []), new_test.get('commands', []))
+            }
+    return patch
+
+
+def apply_side_patch(original, patch):
+    """Rebuild modified SIDE data from the original and a diff_side patch."""
+    result = dict(original)
+    for key in patch.get("unset", []):
+        result.pop(key, None)
+    result.update(patch.get("set", {}))
+
+    test_changes = patch.get("tests", {})
+    if test_changes and "tests" not in patch.get("set", {}):
+        tests = list(result.get('tests', []))
+        for t_key, change in test_changes.items():
+            t_index = int(t_key)
+            if "test" in change:
+                tests[t_index] = change["test"]
+                continue
+            test = dict(tests[t_index])
+            cmds = list(test.get('commands', []))
+            # Apply in reverse so earlier indices stay valid
+            ops = list(enumerate(change.get("ops", [])))
+            for _, op in sorted(ops, key=lambda item: (item[1]["at"], item[0]), reverse=True):
+                start = op["at"]
+                if "fields" in op:
+                    for offset, fields in enumerate(op["fields"]):
+                        cmds[start + offset] = {**cmds[start + offset], **fields}
+                else:
+                    cmds[start:op["end"]] = op["cmds"]
+            test['commands'] = cmds
+            tests[t_index] = test
+        result['tests'] = tests
+
+    if "order" in patch:
+        result = {k: result[k] for k in patch["order"] if k in result}
+    return result
+
+
+def encode_modified_side(original_bytes, modified_bytes):
+    """Return a patch for modified bytes, or None if it cannot be expressed as one."""
+    if not original_bytes or not modified_bytes:
+        return None
+    try:
+        original = json.loads(original_bytes)
+        modified = json.loads(modified_bytes)
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(original, dict) or not isinstance(modified, dict):
+        return None
+
+    patch = diff_side(original, modified)
+    # Only keep the patch if it reproduces the exact bytes we were given
+    if dump_side(apply_side_patch(original, patch)) != modified_bytes:
+        return None
+    return patch
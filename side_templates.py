@@ -0,0 +1,255 @@
+"""
+SIDE Templates
+Compiles the ${...} placeholders of a SIDE document once - in step targets,
+alternative targets, values and the base URLs - so each set of parameters
+(or each data row) is substituted in O(templated fields).
+
+  ${name}            parameter (case-insensitive); unknown names are left as-is
+  ${email()}         unique address, ${email(example.org)} for another domain
+  ${timestamp()}     epoch seconds, ${timestamp(%Y-%m-%d)} for a strftime format
+  ${seq()}           1, 2, 3... continuing across data rows, ${seq(100)} to start elsewhere
+  ${uuid()}          random hex id
+  ${random(6)}       random digits of the given length
+"""
+
+import csv
+import datetime
+import io
+import random
+import re
+import uuid
+from urllib.parse import urljoin
+
+from scheduler import test_fingerprint
+
+PLACEHOLDER_RE = re.compile(r"\$\{\s*([A-Za-z_][\w.-]*)\s*(?:\((.*?)\))?\s*\}")
+STEP_TEMPLATE_FIELDS = ('target', 'value')
+DEFAULT_EMAIL_DOMAIN = 'example.com'
+
+
+# ============================================================================
+# GENERATORS
+# ============================================================================
+def _email(arg, state):
+    state['email'] = state.get('email', 0) + 1
+    return f"user+{uuid.uuid4().hex[:10]}{state['email']}@{arg or DEFAULT_EMAIL_DOMAIN}"
+
+
+def _timestamp(arg, state):
+    now = state['now']  # One instant per rendered document (set by SideTemplate.render)
+    return now.strftime(arg) if arg else str(int(now.timestamp()))
+
+
+def _seq(arg, state):
+    start = int(arg) if arg and arg.strip().lstrip('-').isdigit() else 1
+    state['seq'] = state.get('seq', start - 1) + 1
+    return str(state['seq'])
+
+
+def _uuid(arg, state):
+    return uuid.uuid4().hex
+
+
+def _random(arg, state):
+    length = int(arg) if arg and arg.strip().isdigit() else 6
+    return ''.join(random.choice('0123456789') for _ in range(length))
+
+
+GENERATORS = {
+    'email': _email,
+    'timestamp': _timestamp,
+    'seq': _seq,
+    'uuid': _uuid,
+    'random': _random,
+}
+
+
+# ============================================================================
+# COMPILATION
+# ============================================================================
+def compile_text(text):
+    """Split a string into literal and placeholder parts; None when it has no placeholders.
+
+    Parts are str literals or (kind, name, arg) tuples with kind "param" or "gen".
+    """
+    if not isinstance(text, str) or '${' not in text:
+        return None
+    parts, pos = [], 0
+    for match in PLACEHOLDER_RE.finditer(text):
+        name, arg = match.group(1), match.group(2)
+        if arg is not None and name.lower() not in GENERATORS:
+            continue  # ${unknown(...)} - not ours, keep it literally
+        if match.start() > pos:
+            parts.append(text[pos:match.start()])
+        if arg is not None:
+            parts.append(('gen', name.lower(), arg.strip()))
+        else:
+            parts.append(('param', name.lower(), match.group(0)))
+        pos = match.end()
+    if not any(isinstance(p, tuple) for p in parts):
+        return None
+    if pos < len(text):
+        parts.append(text[pos:])
+    return parts
+
+
+def render_parts(parts, params, state):
+    out = []
+    for part in parts:
+        if isinstance(part, str):
+            out.append(part)
+        elif part[0] == 'param':
+            # Unknown names may be Selenium IDE runtime variables (store commands)
+            out.append(str(params[part[1]]) if part[1] in params else part[2])
+        else:
+            out.append(GENERATORS[part[1]](part[2], state))
+    return ''.join(out)
+
+
+def render_text(text, params=None, state=None):
+    """Substitute one string (compiles on the fly - use SideTemplate for documents)."""
+    parts = compile_text(text)
+    if parts is None:
+        return text
+    state = {} if state is None else state
+    state.setdefault('now', datetime.datetime.now())
+    return render_parts(parts, _normalize(params), state)
+
+
+def _normalize(params):
+    return {str(k).strip().lower(): v for k, v in (params or {}).items() if k}
+
+
+class SideTemplate:
+    """A SIDE document with its templated fields located and parsed once.
+
+    render() returns a new document that shares every untemplated test and
+    command with the source; only the commands holding placeholders are copied.
+    """
+
+    def __init__(self, side):
+        self.side = side
+        self.url = compile_text(side.get('url'))
+        self.urls = {i: parts for i, u in enumerate(side.get('urls', [])) if (parts := compile_text(u))}
+        # {test index: {command index: {field: parts, ('targets', i): parts}}}
+        self.slots = {}
+        for t_index, test in enumerate(side.get('tests', [])):
+            for c_index, cmd in enumerate(test.get('commands', [])):
+                fields = {}
+                for field in STEP_TEMPLATE_FIELDS:
+                    parts = compile_text(cmd.get(field))
+                    if parts:
+                        fields[field] = parts
+                for i, alternative in enumerate(cmd.get('targets') or []):
+                    parts = compile_text(alternative[0] if isinstance(alternative, list) and alternative else None)
+                    if parts:
+                        fields[('targets', i)] = parts
+                if fields:
+                    self.slots.setdefault(t_index, {})[c_index] = fields
+        # Change detection compares the unrendered commands - rendered values differ per run
+        self.fingerprints = {t_index: test_fingerprint(side['tests'][t_index]) for t_index in self.slots}
+
+    @property
+    def field_count(self):
+        return (bool(self.url) + len(self.urls) +
+                sum(len(fields) for commands in self.slots.values() for fields in commands.values()))
+
+    def placeholders(self):
+        """Parameter names and generators used, e.g. {"params": [...], "generators": [...]}."""
+        all_parts = [self.url or []] + list(self.urls.values()) + [
+            parts for commands in self.slots.values() for fields in commands.values() for parts in fields.values()
+        ]
+        params, generators = set(), set()
+        for parts in all_parts:
+            for part in parts:
+                if isinstance(part, tuple):
+                    (params if part[0] == 'param' else generators).add(part[1])
+        return {'params': sorted(params), 'generators': sorted(generators)}
+
+    def render(self, params=None, state=None):
+        """The document with placeholders filled in from params (plus generators)."""
+        params = _normalize(params)
+        state = {} if state is None else state
+        state['now'] = datetime.datetime.now()  # Fresh per document, even when rows share state
+        side = dict(self.side)
+        if self.url:
+            side['url'] = render_parts(self.url, params, state)
+        if self.urls:
+            side['urls'] = [render_parts(self.urls[i], params, state) if i in self.urls else u
+                            for i, u in enumerate(self.side.get('urls', []))]
+        if not self.slots:
+            return side
+        tests = list(side.get('tests', []))
+        for t_index, commands in self.slots.items():
+            test = dict(tests[t_index], template_fingerprint=self.fingerprints[t_index])
+            test['commands'] = list(test['commands'])
+            for c_index, fields in commands.items():
+                cmd = dict(test['commands'][c_index])
+                for field, parts in fields.items():
+                    value = render_parts(parts, params, state)
+                    if isinstance(field, tuple):
+                        cmd['targets'] = [list(t) for t in cmd['targets']]
+                        cmd['targets'][field[1]][0] = value
+                    else:
+                        cmd[field] = value
+                test['commands'][c_index] = cmd
+            tests[t_index] = test
+        side['tests'] = tests
+        return side
+
+    def render_rows(self, rows, params=None):
+        """One rendered document per data row; row values override params.
+
+        Generator state is shared, so sequences continue from row to row.
+        """
+        base = _normalize(params)
+        state = {}
+        for row in rows:
+            yield self.render(dict(base, **_normalize(row)), state)
+
+
+def compile_side(side):
+    return SideTemplate(side)
+
+
+# ============================================================================
+# DATA ROWS
+# ============================================================================
+def parse_data_rows(data):
+    """Rows of a CSV file (header row = parameter names) as dicts."""
+    if isinstance(data, bytes):
+        data = data.decode('utf-8-sig')
+    return [row for row in csv.DictReader(io.StringIO(data)) if any((v or '').strip() for v in row.values())]
+
+
+def _absolute_opens(commands, base_url):
+    """Commands with relative `open` targets resolved against base_url (copied where changed)."""
+    if not base_url:
+        return commands
+    resolved = []
+    for cmd in commands:
+        if (cmd.get('command') or '').strip().lower() == 'open' and cmd.get('target'):
+            cmd = dict(cmd, target=urljoin(base_url, cmd['target']))
+        resolved.append(cmd)
+    return resolved
+
+
+def expand_data_rows(template, rows, params=None):
+    """One document whose tests are repeated per data row ("Login [row 2]"), for a single run.
+
+    A document has one base URL, so each row's relative `open` targets are made
+    absolute against that row's own rendered url - rows may point at different sites.
+    """
+    side = dict(template.side)
+    side['tests'] = []
+    for row_index, rendered in enumerate(template.render_rows(rows, params), start=1):
+        if row_index == 1:
+            side.update({key: rendered[key] for key in ('url', 'urls') if key in rendered})
+        for test in rendered.get('tests', []):
+            # Distinct ids keep per-test history and scheduling apart for every row;
+            # the fingerprint is taken before the row's opens are made absolute
+            side['tests'].append(dict(test, id=f"{test.get('id') or test.get('name')}-row{row_index}",
+                                      name=f"{test.get('name', 'Test')} [row {row_index}]",
+                                      template_fingerprint=test_fingerprint(test),
+                                      commands=_absolute_opens(test.get('commands', []), rendered.get('url'))))
+    return side
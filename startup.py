@@ -0,0 +1,256 @@
+"""
+Startup
+One-time environment bootstrap for the portal and the runner subprocess: a
+verified-environment stamp replaces per-start package checks, warning filters
+are installed once per process, heavy modules are imported on first use, and
+startup phases are timed.
+"""
+
+import hashlib
+import importlib
+import importlib.util
+import json
+import logging
+import os
+import sys
+import time
+import warnings
+
+logger = logging.getLogger(__name__)
+
+_PROCESS_START = time.perf_counter()
+
+STREAMLIT_CLOUD = os.path.exists("/mount/src")
+CLOUD_USER_SITE = "/home/appuser/.local/lib/python3.13/site-packages"
+STAMP_PATH = os.environ.get(
+    'ENV_STAMP_PATH', os.path.join(os.path.expanduser('~'), '.cache', 'testing-portal', 'env_stamp.json')
+)
+REQUIREMENTS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'requirements.txt')
+
+# Import names checked by the stamp (see streamlit_packages.ensure_packages)
+REQUIRED_MODULES = ('selenium', 'webdriver_manager', 'pymongo', 'requests', 'psutil', 'bs4')
+
+# Deprecation noise hidden from the UI and logs
+SUPPRESSED_WARNINGS = ('use_column_width', 'deprecated')
+
+
+# ============================================================================
+# LAZY IMPORTS
+# ============================================================================
+def module_available(name):
+    """Whether a module can be imported - found on the path without importing it."""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def module_version(name):
+    """Installed distribution version without importing the module ("Not installed" when missing)."""
+    from importlib import metadata
+    try:
+        return metadata.version(name)
+    except metadata.PackageNotFoundError:
+        return "Not installed"
+
+
+class LazyModule:
+    """Stand-in for a module that is imported on first attribute access."""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            started = time.perf_counter()
+            self._module = importlib.import_module(self._name)
+            _phases.append((f"import {self._name}", time.perf_counter() - started))
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = 'loaded' if self._module is not None else 'not loaded'
+        return f"<lazy module '{self._name}' ({state})>"
+
+
+def lazy_module(name):
+    """Module proxy, or None when the module isn't installed (keeps `if psutil:` checks working)."""
+    return LazyModule(name) if module_available(name) else None
+
+
+# ============================================================================
+# STARTUP TIMING
+# ============================================================================
+_phases = []        # [(phase, seconds)] in the order they finished
+_last_mark = _PROCESS_START
+
+
+def mark(phase):
+    """Record the time since the previous mark as a startup phase.
+
+    Only the first occurrence of a phase counts, so Streamlit reruns of the
+    script don't add to the report. Returns True when the phase was recorded.
+    """
+    global _last_mark
+    now = time.perf_counter()
+    first = all(name != phase for name, _ in _phases)
+    if first:
+        _phases.append((phase, now - _last_mark))
+    _last_mark = now
+    return first
+
+
+def startup_report():
+    """Startup phases and total seconds since this module was first imported."""
+    return {
+        'phases': [{'phase': phase, 'seconds': round(seconds, 4)} for phase, seconds in _phases],
+        'total_seconds': round(_last_mark - _PROCESS_START, 4),
+    }
+
+
+# ============================================================================
+# WARNING FILTERS
+# ============================================================================
+class _SuppressedWarningFilter(logging.Filter):
+    def filter(self, record):
+        message = record.getMessage().lower()
+        return not any(pattern in message for pattern in SUPPRESSED_WARNINGS)
+
+
+_warnings_configured = False
+
+
+def configure_warnings():
+    """Install the deprecation warning filters once per process (Streamlit reruns are no-ops)."""
+    global _warnings_configured
+    if _warnings_configured:
+        return
+    _warnings_configured = True
+
+    for pattern in SUPPRESSED_WARNINGS:
+        warnings.filterwarnings("ignore", message=f".*{pattern}.*")
+    os.environ['STREAMLIT_SUPPRESS_DEPRECATION_WARNINGS'] = 'true'
+    os.environ['PYTHONWARNINGS'] = 'ignore::DeprecationWarning,ignore::FutureWarning'
+
+    log_filter = _SuppressedWarningFilter()
+    for logger_name in ('streamlit', 'streamlit.web', 'streamlit.runtime'):
+        logging.getLogger(logger_name).addFilter(log_filter)
+
+
+_status_logged = False
+
+
+def log_system_status():
+    """Log interpreter and package availability once per process."""
+    global _status_logged
+    if _status_logged:
+        return
+    _status_logged = True
+    logger.info("🔍 System Status Check:")
+    for name, dist in (('selenium', 'selenium'), ('psutil', 'psutil'), ('pymongo', 'pymongo')):
+        available = module_available(name)
+        logger.info(f"  - {name}: {'✅ Available' if available else '❌ Missing'} (v{module_version(dist)})")
+    logger.info(f"  - Python: {sys.version}")
+    logger.info(f"  - Working Directory: {os.getcwd()}")
+    if not module_available('selenium'):
+        logger.error("❌ CRITICAL: Selenium not available - tests will fail!")
+        logger.info("💡 Check requirements.txt and Streamlit Cloud package installation")
+
+
+# ============================================================================
+# ENVIRONMENT STAMP
+# ============================================================================
+def environment_key():
+    """Identifies the environment the stamp was verified for: interpreter + requirements."""
+    digest = hashlib.sha256()
+    digest.update(sys.executable.encode())
+    digest.update(sys.version.encode())
+    try:
+        with open(REQUIREMENTS_FILE, 'rb') as f:
+            digest.update(f.read())
+    except OSError:
+        pass
+    return digest.hexdigest()[:16]
+
+
+def load_stamp():
+    try:
+        with open(STAMP_PATH) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def stamp_valid(stamp):
+    """Stamp matches this environment and every stamped module is still on the path."""
+    if not stamp or stamp.get('key') != environment_key():
+        return False
+    return all(module_available(name) for name in stamp.get('modules', []))
+
+
+def write_stamp(modules):
+    stamp = {'key': environment_key(), 'modules': list(modules), 'verified_at': time.time(),
+             'python': sys.version.split()[0]}
+    try:
+        os.makedirs(os.path.dirname(STAMP_PATH), exist_ok=True)
+        tmp_path = f"{STAMP_PATH}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(stamp, f)
+        os.replace(tmp_path, STAMP_PATH)
+    except OSError as e:
+        logger.warning(f"⚠️ Could not write environment stamp: {e}")
+    return stamp
+
+
+def clear_stamp():
+    try:
+        os.remove(STAMP_PATH)
+        return True
+    except OSError:
+        return False
+
+
+_bootstrapped = False
+
+
+def bootstrap_environment(force=False):
+    """Prepare the process once: Streamlit Cloud paths/env, then packages only if unverified.
+
+    The package installer (imports and, if needed, pip installs) runs at most once
+    per container - afterwards a matching stamp is checked with path lookups only.
+    Returns True when the environment is verified.
+    """
+    global _bootstrapped
+    if _bootstrapped and not force:
+        return True
+    _bootstrapped = True
+
+    if STREAMLIT_CLOUD:
+        os.environ["STREAMLIT_SERVER_FILE_WATCHER_TYPE"] = "none"
+        os.environ["STREAMLIT_RUNNER_POST_PROCESS_ENABLED"] = "false"
+        if CLOUD_USER_SITE not in sys.path and os.path.exists(CLOUD_USER_SITE):
+            sys.path.insert(0, CLOUD_USER_SITE)
+
+    if not force and stamp_valid(load_stamp()):
+        mark('environment (stamp)')
+        return True
+
+    verified = all(module_available(name) for name in REQUIRED_MODULES)
+    if not verified and STREAMLIT_CLOUD:
+        print("🔍 Environment not verified - checking required packages...")
+        try:
+            from streamlit_packages import ensure_packages
+            verified = ensure_packages()
+        except Exception as e:
+            print(f"⚠️ Package installer error: {e}")
+    if verified:
+        write_stamp(REQUIRED_MODULES)
+        print("✅ Environment verified and stamped")
+    else:
+        missing = [name for name in REQUIRED_MODULES if not module_available(name)]
+        print(f"⚠️ Environment incomplete, missing: {', '.join(missing)}")
+    mark('environment (verify)')
+    return verified
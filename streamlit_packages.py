@@ -112,7 +112,7 @@ def ensure_packages():
         print("⚠️  Some packages failed to install - check logs above")
         return False
 
-# Auto-run when imported
-if __name__ == "__main__" or os.path.exists("/mount/src"):
-    # Only run on Streamlit Cloud or when explicitly called
+# Run when called directly - the app calls ensure_packages() through
+# startup.bootstrap_environment(), only while the environment is unverified
+if __name__ == "__main__":
     ensure_packages()
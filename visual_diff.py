@@ -0,0 +1,147 @@
+"""
+Visual regression helpers
+NumPy pixel diffs of every screenshot that is not byte-identical to its
+baseline (one per step, keyed by test and command id); perceptual hashes are
+kept for run-to-run comparison.
+"""
+
+import io
+import json
+import os
+import zipfile
+
+from screenshots import IMAGE_EXTENSIONS
+from startup import lazy_module
+
+# NumPy and Pillow are imported on the first comparison, not when the portal starts
+np = lazy_module('numpy')
+Image = lazy_module('PIL.Image')
+VISUAL_DIFF_AVAILABLE = np is not None and Image is not None
+
+PIXEL_TOLERANCE = 24        # Per-channel delta ignored as antialiasing/compression noise
+CHANGED_RATIO = 0.001       # Fraction of pixels that must differ to flag a step
+DIFF_IMAGE_MAX_WIDTH = 800  # Diff images are stored with the run, keep them small
+RUN_SUMMARY_FILE = 'run_summary.json'
+
+
+def screenshot_step_name(filename):
+    """Map a screenshot filename to its file stem, or None for non-step images."""
+    stem, ext = os.path.splitext(os.path.basename(filename))
+    if ext.lower() not in IMAGE_EXTENSIONS or not stem.startswith('screenshot_'):
+        return None
+    return stem
+
+
+def screenshot_step_keys(zf):
+    """{file stem: step key} from the run summary's step results.
+
+    Keys are test id:command id, so a baseline follows its step when steps are
+    inserted, reordered or skipped; runs from before step keys were recorded
+    keep the positional file stem.
+    """
+    if RUN_SUMMARY_FILE not in zf.namelist():
+        return {}
+    try:
+        steps = json.loads(zf.read(RUN_SUMMARY_FILE)).get('steps', [])
+    except ValueError:
+        return {}
+    return {s['screenshot']: s['key'] for s in steps if s.get('screenshot') and s.get('key')}
+
+
+def extract_step_screenshots(zip_bytes):
+    """Return {step_key: image_bytes} for the per-step screenshots in a results ZIP."""
+    shots = {}
+    if not zip_bytes:
+        return shots
+    with io.BytesIO(zip_bytes) as zb, zipfile.ZipFile(zb) as zf:
+        keys = screenshot_step_keys(zf)
+        for name in zf.namelist():
+            stem = screenshot_step_name(name)
+            if stem:
+                shots[keys.get(stem, stem)] = zf.read(name)
+    return shots
+
+
+def _open_image(image_bytes):
+    img = Image.open(io.BytesIO(image_bytes))
+    img.draft('RGB', (img.width // 4, img.height // 4))  # Cheap JPEG downscale on decode
+    return img
+
+
+def perceptual_hash(image_bytes, hash_size=8):
+    """Difference hash (dHash) of an image as a hex string."""
+    img = _open_image(image_bytes).convert('L')
+    # Shrink in two steps - reduce() is much faster than a full-size resample
+    factor = max(1, min(img.width // (hash_size * 8), img.height // (hash_size * 8)))
+    if factor > 1:
+        img = img.reduce(factor)
+    small = np.asarray(img.resize((hash_size + 1, hash_size), Image.BILINEAR), dtype=np.int16)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    value = int(''.join('1' if b else '0' for b in bits), 2)
+    return f"{value:0{hash_size * hash_size // 4}x}"
+
+
+def hash_distance(hash_a, hash_b):
+    """Hamming distance between two hex perceptual hashes."""
+    if not hash_a or not hash_b:
+        return None
+    return bin(int(hash_a, 16) ^ int(hash_b, 16)).count('1')
+
+
+def pixel_diff(baseline_bytes, image_bytes, tolerance=PIXEL_TOLERANCE):
+    """Return (changed_ratio, diff_png_bytes) for two screenshots."""
+    base = np.asarray(Image.open(io.BytesIO(baseline_bytes)).convert('RGB'), dtype=np.int16)
+    new_img = Image.open(io.BytesIO(image_bytes)).convert('RGB')
+    new = np.asarray(new_img, dtype=np.int16)
+
+    if base.shape != new.shape:
+        # Different viewport - everything counts as changed
+        mask = np.ones(new.shape[:2], dtype=bool)
+    else:
+        mask = np.abs(new - base).max(axis=2) > tolerance
+    ratio = float(mask.mean())
+
+    # Faded current screenshot with changed pixels painted red
+    overlay = (new * 0.35 + 160).astype(np.uint8)
+    overlay[mask] = (220, 38, 38)
+    diff_img = Image.fromarray(overlay)
+    if diff_img.width > DIFF_IMAGE_MAX_WIDTH:
+        height = int(diff_img.height * DIFF_IMAGE_MAX_WIDTH / diff_img.width)
+        diff_img = diff_img.resize((DIFF_IMAGE_MAX_WIDTH, height), Image.NEAREST)
+    out = io.BytesIO()
+    diff_img.save(out, format='PNG', optimize=True)
+    return ratio, out.getvalue()
+
+
+def compare_screenshots(screenshots, baselines, changed_ratio=CHANGED_RATIO):
+    """Compare step screenshots against baselines.
+
+    Only byte-identical screenshots skip the pixel diff; a 64-bit hash can stay
+    the same (distance 0) when a label or price changes, so it is reported
+    for information but never decides the status.
+
+    screenshots: {step: image_bytes}; baselines: {step: {"hash": str, "image": bytes}}.
+    Returns one result dict per step with status "new", "unchanged" or "changed".
+    """
+    results = []
+    for step in sorted(screenshots):
+        image_bytes = screenshots[step]
+        result = {"step": step, "hash": perceptual_hash(image_bytes), "status": "new",
+                  "distance": None, "score": None, "diff_image": None}
+        baseline = baselines.get(step)
+        if baseline:
+            result["baseline_hash"] = baseline.get("hash")
+            result["distance"] = hash_distance(result["hash"], baseline.get("hash"))
+            if image_bytes == baseline.get("image"):
+                result["status"] = "unchanged"
+                result["score"] = 0.0
+            else:
+                score, diff_png = pixel_diff(baseline["image"], image_bytes)
+                result["score"] = score
+                if score >= changed_ratio:
+                    result["status"] = "changed"
+                    result["diff_image"] = diff_png
+                else:
+                    result["status"] = "unchanged"
+        results.append(result)
+    return results
@@ -1,124 +1,60 @@
-# Streamlit Cloud package installer - MUST BE FIRST
-import os
-import sys
-import warnings
-
-# Comprehensive warning suppression for deprecated Streamlit parameters
-warnings.filterwarnings("ignore", message=".*use_column_width.*")
-warnings.filterwarnings("ignore", message=".*deprecated.*", category=DeprecationWarning)
-warnings.filterwarnings("ignore", message=".*deprecated.*", category=FutureWarning)
-warnings.filterwarnings("ignore", message=".*use_column_width.*", category=DeprecationWarning)
-warnings.filterwarnings("ignore", message=".*use_column_width.*", category=FutureWarning)
-warnings.filterwarnings("ignore", message=".*use_column_width.*", category=UserWarning)
-
-# Set environment variable to suppress Streamlit warnings globally
-os.environ['STREAMLIT_SUPPRESS_DEPRECATION_WARNINGS'] = 'true'
-os.environ['PYTHONWARNINGS'] = 'ignore::DeprecationWarning,ignore::FutureWarning'
-
-# Fix for inotify limits and Python path on Streamlit Cloud
-if os.path.exists("/mount/src"):
-    print("🔍 Detected Streamlit Cloud environment - applying optimizations...")
-    os.environ["STREAMLIT_SERVER_FILE_WATCHER_TYPE"] = "none"
-    os.environ["STREAMLIT_RUNNER_POST_PROCESS_ENABLED"] = "false"
-    
-    # Fix Python path for Streamlit Cloud packages
-    user_site = "/home/appuser/.local/lib/python3.13/site-packages"
-    if user_site not in sys.path and os.path.exists(user_site):
-        sys.path.insert(0, user_site)
-        print(f"✅ Added {user_site} to Python path")
-    
-    try:
-        from streamlit_packages import ensure_packages
-        ensure_packages()
-    except Exception as e:
-        print(f"⚠️ Package installer error: {e}")
+# One-time environment bootstrap - MUST BE FIRST (see startup.py)
+from startup import (
+    bootstrap_environment, configure_warnings, lazy_module, log_system_status, mark, module_available,
+    startup_report
+)
+bootstrap_environment()
+configure_warnings()
 
 import streamlit as st
 import json
-import re
-import tempfile
-import subprocess
 import zipfile
 import io
 import time
-import base64
 import gc  # Garbage collection for memory management
 from typing import Dict, List
-from db_manager import save_run, get_recent_runs, delete_all_runs, delete_runs_for_app
-
-# Custom warning override to prevent UI warnings
-def custom_showwarning(message, category, filename, lineno, file=None, line=None):
-    """Custom warning handler that suppresses deprecated parameter warnings."""
-    msg_str = str(message)
-    if 'use_column_width' in msg_str or 'deprecated' in msg_str.lower():
-        return  # Suppress these warnings completely
-    # Show other warnings normally
-    import warnings
-    warnings._showwarning_orig(message, category, filename, lineno, file, line)
-
-# Override the warning display function
-import warnings
-if hasattr(warnings, '_showwarning_orig'):
-    pass  # Already overridden
-else:
-    warnings._showwarning_orig = warnings.showwarning
-    warnings.showwarning = custom_showwarning
-
-# Optional imports for enhanced monitoring
-try:
-    import psutil  # Process and system monitoring
-    PSUTIL_AVAILABLE = True
-except ImportError:
-    PSUTIL_AVAILABLE = False
-    psutil = None
+from db_manager import (
+    save_run, delete_all_runs, delete_runs_for_app,
+    get_baselines, set_baseline, delete_app_data, get_flaky_steps, get_step_history,
+    get_test_stats, get_app_settings, save_app_settings, get_page_metric_history,
+    get_latest_run_zip, get_run_sides, get_visual_diff_images, save_load_test, get_load_tests, search_run_logs
+)
+from page_metrics import METRICS, find_regressions
+from live_cache import run_cache
+from metrics import STARTUP_SECONDS, snapshot as metrics_snapshot, start_metrics_server
+from profiling import PROFILE_MODES, Profiler
+from resource_governor import governor
+from driver_cache import BROWSERS, load_resolution, clear_resolution
+from side_editor import (
+    STEP_FIELDS, EXPORT_FORMATS, SideDocument, new_side as new_side_document, new_test, new_step, find_test,
+    page_count, page_bounds, side_stats, export_side
+)
+from screenshots import DEFAULT_QUALITY, IMAGE_EXTENSIONS, SCREENSHOT_FORMATS, image_mime
+from run_compare import browser_timings, compare_browsers, compare_runs, slowest_changes
+from side_templates import compile_side, expand_data_rows, parse_data_rows
+from network_policy import RESOURCE_TYPE_PATTERNS, empty_policy
+from job_queue import queue_available, queue_status
+from runner import (
+    RUN_BACKENDS, run_browser_matrix, run_test_and_get_results, run_tests_parallel, read_run_summary, find_resume_point
+)
+from scheduler import test_tags, select_tests, schedule_tests, expected_makespan
 
-# Check selenium availability
-try:
-    import selenium
-    SELENIUM_AVAILABLE = True
-    selenium_version = selenium.__version__
-except ImportError:
-    SELENIUM_AVAILABLE = False
-    selenium_version = "Not installed"
+# Availability checks are path lookups - psutil/selenium are imported where they are used
+PSUTIL_AVAILABLE = module_available('psutil')
+SELENIUM_AVAILABLE = module_available('selenium')
+# Only needed on the pages that use them - imported on first use, not at portal startup
+har_capture = lazy_module('har_capture')
+load_test = lazy_module('load_test')
+visual_diff = lazy_module('visual_diff')
 
-# System status logging
 import logging
 logger = logging.getLogger(__name__)
-logger.info(f"🔍 System Status Check:")
-logger.info(f"  - Selenium: {'✅ Available' if SELENIUM_AVAILABLE else '❌ Missing'} (v{selenium_version})")
-logger.info(f"  - Psutil: {'✅ Available' if PSUTIL_AVAILABLE else '❌ Missing'}")
-logger.info(f"  - Python: {os.sys.version}")
-logger.info(f"  - Working Directory: {os.getcwd()}")
-
-if not SELENIUM_AVAILABLE:
-    logger.error("❌ CRITICAL: Selenium not available - tests will fail!")
-    logger.info("💡 Check requirements.txt and Streamlit Cloud package installation")
+log_system_status()
+mark('portal imports')
 
 # ============================================================================
 # PAGE CONFIGURATION
 # ============================================================================
-# Additional warning suppression at Streamlit level
-try:
-    import streamlit.logger
-    import logging
-    
-    # Create a custom filter for Streamlit's logger
-    class DeprecationWarningFilter(logging.Filter):
-        def filter(self, record):
-            # Filter out deprecation warnings from logs
-            message = getattr(record, 'getMessage', lambda: '')()
-            return not ('use_column_width' in message or 'deprecated' in message.lower())
-    
-    # Apply filter to Streamlit's loggers
-    for logger_name in ['streamlit', 'streamlit.web', 'streamlit.runtime']:
-        try:
-            logger = logging.getLogger(logger_name)
-            logger.addFilter(DeprecationWarningFilter())
-        except:
-            pass
-except:
-    pass
-
 st.set_page_config(
     page_title="Testing Portal", 
     page_icon="⚡", 
@@ -126,36 +62,35 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Prometheus-style /metrics endpoint (once per process, see metrics.py)
+start_metrics_server()
+if mark('page setup'):
+    STARTUP_SECONDS.observe(startup_report()['total_seconds'], process='portal')
+
 # Performance monitoring
-@st.cache_data(ttl=60)
 def get_system_stats():
-    """Get system performance statistics."""
-    if not PSUTIL_AVAILABLE:
-        return {'memory_percent': 0, 'memory_available': 0, 'cpu_percent': 0}
-    
-    try:
-        memory = psutil.virtual_memory()
-        return {
-            'memory_percent': memory.percent,
-            'memory_available': memory.available // (1024**2),  # MB
-            'cpu_percent': psutil.cpu_percent(interval=1)
-        }
-    except:
-        return {'memory_percent': 0, 'memory_available': 0, 'cpu_percent': 0}
+    """Get system performance statistics (non-blocking)."""
+    stats = governor.telemetry()
+    return {
+        'memory_percent': stats['memory_percent'],
+        'memory_available': stats['memory_available_mb'],
+        'cpu_percent': stats['cpu_percent']
+    }
 
-# Cache static data to improve performance
-@st.cache_data(ttl=300)  # Cache for 5 minutes
+# Run summaries and the app list come from the live run cache (see live_cache.py)
 def get_cached_apps():
     """Get cached list of applications."""
-    return list_apps_from_history()
+    return run_cache.app_names()
 
-@st.cache_data(ttl=60)  # Cache for 1 minute  
 def get_cached_recent_runs(limit=50):
-    """Get cached recent runs."""
-    try:
-        return get_recent_runs(limit)
-    except:
-        return []
+    """Get cached recent runs (results ZIPs via run_cache.zip and SIDE bytes via get_run_sides, on demand)."""
+    return run_cache.recent(limit)
+
+def run_has_side(run, field='original_side'):
+    """Whether a cached run summary has SIDE bytes stored, without fetching them."""
+    if field == 'modified_side' and run.get('modified_side_patch'):
+        return True
+    return bool(run.get(f'{field}_hash') or run.get(f'{field}_size'))
 
 # Custom CSS for professional styling
 st.markdown("""
@@ -260,13 +195,7 @@ def apply_param_map_and_screenshots(side_data: Dict, param_map: Dict, screenshot
 def list_apps_from_history():
     """Get list of unique app names from database."""
     try:
-        runs = get_recent_runs(200)
-        names = []
-        for r in runs:
-            name = r.get('app_name') or 'Unnamed'
-            if name not in names and name != 'Unnamed':
-                names.append(name)
-        return names
+        return run_cache.app_names()
     except:
         return []
 
@@ -284,98 +213,144 @@ def ping_url(url: str, timeout: int = 5):
     except Exception as e:
         return False, None, str(e)
 
-def run_test_and_get_results(side_data, app_name, test_type="test"):
-    """Execute test and return ZIP results with optimizations."""
-    with tempfile.TemporaryDirectory() as tmpdir:
-        side_path = os.path.join(tmpdir, f"{app_name or 'app'}_{test_type}.side")
-        with open(side_path, 'w') as f:
-            json.dump(side_data, f, separators=(',', ':'))  # Compact JSON
-        
-        log_path = os.path.join(tmpdir, 'run.log')
-        
-        # Change to the temp directory so screenshots are created there
-        original_cwd = os.getcwd()
-        os.chdir(tmpdir)
-        
-        try:
-            # Use optimized Python execution for different environments
-            main_script = os.path.join(original_cwd, "main.py")
-            
-            # Try different Python paths for different environments
-            python_candidates = [
-                os.path.join(original_cwd, "venv", "bin", "python"),  # Local venv
-                "python3",  # System Python 3
-                "python"    # System Python
-            ]
-            
-            python_cmd = None
-            for candidate in python_candidates:
-                try:
-                    if os.path.exists(candidate) or candidate in ["python3", "python"]:
-                        python_cmd = candidate
-                        break
-                except:
-                    continue
-            
-            if not python_cmd:
-                python_cmd = "python3"  # Fallback
-            
-            # Run with timeout and optimized settings
-            with open(log_path, 'w') as logf:
-                process = subprocess.run(
-                    [python_cmd, main_script, side_path], 
-                    stdout=logf, 
-                    stderr=subprocess.STDOUT,
-                    timeout=300,  # 5 minute timeout
-                    env=dict(os.environ, PYTHONUNBUFFERED='1')
-                )
-        except subprocess.TimeoutExpired:
-            with open(log_path, 'a') as logf:
-                logf.write("\n\nERROR: Test execution timed out after 5 minutes")
-        except Exception as e:
-            with open(log_path, 'a') as logf:
-                logf.write(f"\n\nERROR: {str(e)}")
-        finally:
-            os.chdir(original_cwd)
-        
-        # Create optimized results ZIP
-        files_to_zip = []
-        
-        # Add log file if it exists and has content
-        if os.path.exists(log_path) and os.path.getsize(log_path) > 0:
-            files_to_zip.append(log_path)
-        
-        # Add SIDE file
-        if os.path.exists(side_path):
-            files_to_zip.append(side_path)
-        
-        # Add screenshots (limit to reasonable number)
-        screenshot_count = 0
-        for filename in os.listdir(tmpdir):
-            if filename.lower().endswith(('.png', '.jpg', '.jpeg')) and screenshot_count < 20:
-                screenshot_path = os.path.join(tmpdir, filename)
-                files_to_zip.append(screenshot_path)
-                screenshot_count += 1
-        
-        # Create compressed ZIP
-        zip_path = os.path.join(tmpdir, 'results.zip')
-        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED, compresslevel=6) as zf:
-            for fpath in files_to_zip:
-                if os.path.exists(fpath):
-                    arcname = os.path.basename(fpath)
-                    zf.write(fpath, arcname)
-        
-        # Return ZIP bytes
-        if os.path.exists(zip_path):
-            with open(zip_path, 'rb') as zf:
-                return zf.read()
-        else:
-            # Create minimal ZIP if main ZIP creation failed
-            buffer = io.BytesIO()
-            with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zf:
-                zf.writestr('error.txt', 'Test execution failed - no results generated')
-            buffer.seek(0)
-            return buffer.getvalue()
+def selected_browsers():
+    """Browsers picked in the sidebar (Chrome when none are)."""
+    return list(st.session_state.get('run_browsers') or ['chrome'])
+
+def build_run_config(app_name, side_name, browser=None, **extra):
+    """Runner config shared by every execution path (uses the sidebar execution settings).
+    
+    browser pins the run to one browser (no fallback) instead of the sidebar choice.
+    """
+    if browser:
+        config = {'browser': browser, 'browser_fallback': False}
+    else:
+        browser = selected_browsers()[0]
+        # Plain Chrome keeps its Firefox fallback
+        config = {'browser': browser} if selected_browsers() != ['chrome'] else {}
+    # Known-flaky steps are per browser - a step broken on one browser only is a real failure
+    config['flaky_steps'] = get_flaky_steps(app_name, side_name, browser)
+    if st.session_state.get('isolate_tests'):
+        config['isolation'] = 'context'
+    if st.session_state.get('collect_page_metrics'):
+        config['page_metrics'] = True
+    if st.session_state.get('capture_har'):
+        config['har'] = True
+    screenshot_format = st.session_state.get('screenshot_format', 'png')
+    if screenshot_format != 'png' or st.session_state.get('screenshot_full_page'):
+        config['screenshot'] = {
+            'format': screenshot_format,
+            'quality': st.session_state.get('screenshot_quality', DEFAULT_QUALITY),
+            'full_page': bool(st.session_state.get('screenshot_full_page')),
+        }
+    if st.session_state.get('profile_runs'):
+        config['profile'] = st.session_state.get('profile_mode', 'sampler')
+    network_policy = get_app_settings(app_name).get('network_policy')
+    if network_policy:
+        config['network_policy'] = network_policy
+    config.update(extra)
+    return config
+
+def editor_key(selected_app, *parts):
+    """Session state key of a manual editor widget."""
+    return "ed_" + "_".join(str(p) for p in (selected_app,) + parts)
+
+def apply_editor_edit(edit, widget_key=None):
+    """Widget callback: apply one edit patch to the editor document (value read from the widget)."""
+    if widget_key is not None:
+        edit = dict(edit, value=st.session_state[widget_key])
+    st.session_state['side_doc'].apply(edit)
+
+def add_editor_step(test_id, page_key):
+    """Widget callback: append a step and jump to the page showing it."""
+    side_doc = st.session_state['side_doc']
+    side_doc.apply({'op': 'add_step', 'test_id': test_id, 'step': new_step()})
+    st.session_state[page_key] = page_count(len(side_doc.doc['tests'][find_test(side_doc.doc, test_id)]['commands']))
+
+def reset_editor_widgets(selected_app, keep_navigation=False):
+    """Forget editor widget state after the document is replaced (or rolled back by undo/redo)."""
+    prefix = editor_key(selected_app, '')
+    navigation = ('_test', '_page', '_details') if keep_navigation else ()
+    for key in [k for k in st.session_state if isinstance(k, str) and k.startswith(prefix)]:
+        if not (navigation and key.endswith(navigation)):
+            del st.session_state[key]
+
+def load_editor_document(side, selected_app, copy=True):
+    """Replace the editor document - deep-copied so it shares nothing with the source.
+
+    It is named after the app before any edit, so the edit log starts clean.
+    """
+    side_doc = SideDocument(side, copy=copy)
+    side_doc.set_name(selected_app or 'New SIDE')
+    st.session_state['side_doc'] = side_doc
+    reset_editor_widgets(selected_app)
+
+def undo_editor_edit(selected_app, redo=False):
+    """Widget callback: undo (or redo) the last editor edit."""
+    side_doc = st.session_state['side_doc']
+    side_doc.redo() if redo else side_doc.undo()
+    # Field widgets still hold the old text - let them re-read the document
+    reset_editor_widgets(selected_app, keep_navigation=True)
+
+def latest_har_plan(app_name, side_name):
+    """HTTP replay plan from the HAR files captured in the latest run of a SIDE file."""
+    zip_bytes = get_latest_run_zip(app_name, side_name)
+    if not zip_bytes:
+        return []
+    plan = []
+    with io.BytesIO(zip_bytes) as zb, zipfile.ZipFile(zb) as zf:
+        for name in sorted(n for n in zf.namelist() if n.endswith(har_capture.HAR_EXTENSIONS)):
+            har = har_capture.load_har(zf.read(name), name)
+            plan.extend(load_test.http_plan_from_har(har.get('log', {}).get('entries', [])))
+    return plan
+
+def baseline_side_name(side_name, browser=None):
+    """Baselines are kept per browser - rendering differs - with Chrome under the plain SIDE name."""
+    return side_name if browser in (None, 'chrome') else f"{side_name} [{browser}]"
+
+def run_visual_regression(zip_bytes, app_name, side_name, browser=None):
+    """Diff a run's step screenshots against stored baselines, seeding missing ones."""
+    if not zip_bytes or not visual_diff.VISUAL_DIFF_AVAILABLE:
+        return []
+    
+    side_name = baseline_side_name(side_name, browser)
+    try:
+        screenshots = visual_diff.extract_step_screenshots(zip_bytes)
+        if not screenshots:
+            return []
+        results = visual_diff.compare_screenshots(screenshots, get_baselines(app_name, side_name))
+        for result in results:
+            if result['status'] == 'new':
+                # First time we see this step - it becomes the baseline
+                set_baseline(app_name, side_name, result['step'], screenshots[result['step']], result['hash'])
+        return results
+    except Exception as e:
+        logger.warning(f"Visual regression check failed: {e}")
+        return []
+
+def render_browser_comparison(summaries):
+    """Per-browser totals of a matrix run and the steps whose timing differs most."""
+    comparison = compare_browsers(summaries)
+    st.markdown("#### 🌐 Browser Comparison")
+    st.dataframe([{'browser': t['browser'].title(), 'ran on': t['ran_on'], 'status': t['status'],
+                   'run (s)': t['duration'], 'steps (s)': t['step_time'], 'startup (s)': t['startup'],
+                   'failed steps': t['failed'], 'fastest steps': t['fastest_steps']}
+                  for t in comparison['totals']],
+                 use_container_width=True)
+    mismatched = [r for r in comparison['steps'] if len(set(r['statuses'].values())) > 1]
+    if mismatched:
+        st.warning(f"{len(mismatched)} step(s) have a different outcome per browser: "
+                   + ", ".join(f"{r['test']} #{(r['step'] or 0) + 1}" for r in mismatched[:5]))
+    spread = sorted((r for r in comparison['steps'] if r['spread']), key=lambda r: r['spread'], reverse=True)[:10]
+    if spread:
+        st.markdown("**Largest per-step timing differences**")
+        rows = []
+        for r in spread:
+            row = {'test': r['test'], 'step': (r['step'] or 0) + 1, 'command': r['command'], 'target': r['target']}
+            row.update({f"{b} (s)": r['durations'].get(b) for b in comparison['browsers']})
+            row.update({'fastest': r['fastest'], 'spread (s)': r['spread']})
+            rows.append(row)
+        st.dataframe(rows, use_container_width=True)
 
 # ============================================================================
 # SIDEBAR CONFIGURATION
@@ -387,6 +362,7 @@ with st.sidebar:
     # Database Management
     if st.button('Clear All Data', key='delete_all_db', help="Delete all test runs from database"):
         deleted = delete_all_runs()
+        run_cache.refresh()
         st.warning(f"Deleted {deleted} runs from database")
     
     # App Management
@@ -401,6 +377,8 @@ with st.sidebar:
     # Delete app option
     if selected_app and st.button("Delete Application", key="del_app_btn", help="Remove all runs for this application"):
         deleted = delete_runs_for_app(selected_app)
+        delete_app_data(selected_app)
+        run_cache.refresh()
         st.info(f"Deleted {deleted} runs for application '{selected_app}'")
         safe_rerun()
 
@@ -418,6 +396,63 @@ with st.sidebar:
         if k:
             user_params[k] = v
     
+    # Execution settings
+    st.markdown("### Execution")
+    run_timeout_minutes = st.number_input("Run timeout (minutes)", min_value=1, max_value=60, value=5, key="run_timeout")
+    run_timeout = int(run_timeout_minutes * 60)
+    isolate_tests = st.checkbox(
+        "Isolate tests in fresh browser contexts", value=False, key="isolate_tests",
+        help="Each test gets its own cookies, storage and cache on one shared browser"
+    )
+    st.checkbox(
+        "Collect page performance metrics", value=False, key="collect_page_metrics",
+        help="Navigation timing, LCP, CLS and JS heap after every open and screenshot step"
+    )
+    st.checkbox(
+        "Capture network HAR", value=False, key="capture_har",
+        help="Compressed HAR per test, viewable as a waterfall in the history tab"
+    )
+    
+    # Screenshot encoding - JPEG/WebP files are a fraction of a PNG's size
+    st.selectbox("Screenshot format", list(SCREENSHOT_FORMATS), key="screenshot_format", format_func=str.upper,
+                 help="Per step, a customScreenshot value like format=jpeg;quality=60;full_page=true overrides this")
+    if st.session_state.get('screenshot_format', 'png') != 'png':
+        st.slider("Screenshot quality", min_value=10, max_value=100, value=DEFAULT_QUALITY, key="screenshot_quality")
+    st.checkbox("Full-page screenshots", value=False, key="screenshot_full_page",
+                help="Capture the whole scrollable page instead of the browser window")
+    
+    # Several browsers run the same tests side by side, each saved as its own run
+    st.multiselect("Browsers", BROWSERS, default=["chrome"], key="run_browsers", format_func=str.title,
+                   help="Pick more than one to run uploaded tests on every browser in parallel (headless)")
+    
+    # Profiling - diagnose slow runs or renders without redeploying
+    profile_runs = st.checkbox("Profile runs", value=False, key="profile_runs",
+                               help="Profiles the runner process; output is saved with the run")
+    profile_render = st.checkbox("Profile page render", value=False, key="profile_render",
+                                 help="Profiles this page's render; output is shown at the bottom of the page")
+    if profile_runs or profile_render:
+        st.selectbox("Profiler", PROFILE_MODES, key="profile_mode",
+                     format_func=lambda m: {"sampler": "Stack sampler (low overhead)", "cprofile": "cProfile (exact)"}[m])
+    
+    # Where runs execute: this host or the distributed worker pool (worker.py)
+    if queue_available():
+        queue = queue_status()
+        st.radio("Execute runs on", RUN_BACKENDS, key="run_backend", horizontal=True,
+                 format_func=lambda b: {"local": "This host", "queue": "Worker pool"}[b])
+        st.caption(f"👷 {queue['workers']} worker(s) online · {queue['queued']} queued · {queue['running']} running")
+        if st.session_state.get('run_backend') == 'queue' and not queue['workers']:
+            st.warning("No workers online - start one with `python worker.py`")
+    
+    # Run slots handed out by the resource governor
+    slots = governor.status()
+    st.progress(min(slots['in_use'] / slots['slots'], 1.0),
+                text=f"Run slots: {slots['in_use']}/{slots['slots']} in use, {slots['queued']} queued")
+    if PSUTIL_AVAILABLE:
+        st.caption(f"{slots['memory_available_mb']} MB free · CPU {slots['cpu_percent']:.0f}% · "
+                   f"~{slots['run_memory_estimate_mb']} MB per run · ceiling {slots['memory_ceiling_mb']} MB")
+    for active_run in slots['active']:
+        st.caption(f"▶️ {active_run['label']} - {active_run['running_for']}s, {active_run['memory_mb']} MB")
+    
     st.markdown("---")
     st.caption("Selenium Testing Platform v1.0")
 
@@ -430,22 +465,12 @@ def render_app_tab(selected_app):
     """Render the main application interface for the selected app."""
     
     # Initialize session state for new SIDE files
-    if 'new_side' not in st.session_state:
-        st.session_state['new_side'] = {
-            'id': 'new-side',
-            'version': '1.0',
-            'name': selected_app or 'New SIDE',
-            'tests': [],
-            'suites': [],
-            'urls': [],
-            'plugins': []
-        }
+    if 'side_doc' not in st.session_state:
+        st.session_state['side_doc'] = SideDocument(new_side_document(selected_app or 'New SIDE'), copy=False)
     
-    # Update the SIDE file name if app changes
-    new_side = st.session_state['new_side']
-    if new_side['name'] != (selected_app or 'New SIDE'):
-        new_side['name'] = selected_app or 'New SIDE'
-        st.session_state['new_side'] = new_side
+    # The SIDE file follows the selected app's name - outside the edit log, so
+    # undo and "changes since load" only ever see the user's own edits
+    st.session_state['side_doc'].set_name(selected_app or 'New SIDE')
     
     st.markdown(f'<h2 class="section-header">Application: {selected_app}</h2>', unsafe_allow_html=True)
     
@@ -495,6 +520,36 @@ def render_app_tab(selected_app):
                 else:
                     st.warning("Please enter a URL first")
 
+    # ========================================================================
+    # NETWORK POLICY SECTION
+    # ========================================================================
+    with st.expander("Network Policy", expanded=False):
+        st.caption("Requests matching these rules are blocked in the browser during runs of this application.")
+        policy = {**empty_policy(), **get_app_settings(selected_app).get('network_policy', {})}
+        
+        block_third_party = st.checkbox(
+            "Block common analytics, ads and monitoring scripts", value=policy['block_third_party'],
+            key=f"net_third_party_{selected_app}"
+        )
+        block_types = st.multiselect(
+            "Block resource types", list(RESOURCE_TYPE_PATTERNS), default=policy['block_types'],
+            key=f"net_types_{selected_app}"
+        )
+        block_patterns = st.text_area(
+            "Blocked URL patterns (one per line, * wildcards)", value="\n".join(policy['block_patterns']),
+            key=f"net_patterns_{selected_app}", placeholder="*cdn.example.com/videos/*"
+        )
+        if st.button("Save Network Policy", key=f"save_net_policy_{selected_app}"):
+            new_policy = {
+                'block_patterns': [p.strip() for p in block_patterns.splitlines() if p.strip()],
+                'block_types': block_types,
+                'block_third_party': block_third_party
+            }
+            if save_app_settings(selected_app, network_policy=new_policy):
+                st.success("Network policy saved!")
+            else:
+                st.error("Could not save network policy")
+    
     # ========================================================================
     # SIDE FILE MANAGEMENT
     # ========================================================================
@@ -525,22 +580,12 @@ def render_app_tab(selected_app):
                 
                 if side_params:
                     st.markdown("#### Parameter Mapping")
-                    user_params_lc = {k.lower(): v for k, v in user_params.items()}
                     
                     for idx, p in enumerate(side_params):
                         key = f"t{p['test']}_s{p['step']}"
+                        # ${...} placeholders are kept and filled in by the template at run time
                         default_val = p.get('value', '')
                         
-                        # Auto-detect placeholders like ${KEY}
-                        try:
-                            match = re.search(r"\$\{([^}]+)\}", str(default_val))
-                            if match:
-                                placeholder = match.group(1).strip().lower()
-                                if placeholder in user_params_lc:
-                                    default_val = user_params_lc[placeholder]
-                        except:
-                            pass
-                        
                         st.write(f"**Test {p['test']+1} Step {p['step']+1}:** `{p['name']}` (current: `{p['value']}`)")
                         val = st.text_input(
                             f"Value for {p['name']} ({key})", 
@@ -549,6 +594,23 @@ def render_app_tab(selected_app):
                         )
                         param_map[key] = val
                 
+                # Placeholders anywhere in targets, values and URLs (see side_templates.py)
+                used = compile_side(side_data).placeholders()
+                data_rows = []
+                if used['params'] or used['generators']:
+                    st.markdown("#### Template Placeholders")
+                    missing = [name for name in used['params'] if name not in {k.lower() for k in user_params}]
+                    st.caption(
+                        f"Parameters: {', '.join(used['params']) or 'none'} · "
+                        f"generators: {', '.join(used['generators']) or 'none'}"
+                        + (f" · not set in the sidebar (left as-is): {', '.join(missing)}" if missing else "")
+                    )
+                    data_file = st.file_uploader("Data rows (CSV, header = parameter names) - tests run once per row",
+                                                 type=["csv"], key=f"data_rows_{selected_app}")
+                    if data_file is not None:
+                        data_rows = parse_data_rows(data_file.getvalue())
+                        st.caption(f"📄 {len(data_rows)} data row(s)")
+                
                 if screenshot_steps:
                     st.markdown("#### Screenshot Options")
                     screenshot_choices = st.multiselect(
@@ -557,11 +619,23 @@ def render_app_tab(selected_app):
                         key=f"screenshots_{selected_app}"
                     )
                 
+                # Test selection and parallel scheduling
+                st.markdown("#### Test Selection")
+                all_tags = sorted({tag for tags in test_tags(side_data).values() for tag in tags})
+                sel_col1, sel_col2, sel_col3 = st.columns(3)
+                with sel_col1:
+                    tag_filter = st.multiselect("Only tests tagged", all_tags, key=f"tag_filter_{selected_app}") if all_tags else []
+                    changed_only = st.checkbox("Only changed or previously failed tests", key=f"changed_only_{selected_app}")
+                with sel_col2:
+                    failed_first = st.checkbox("Run previously failed tests first", value=True, key=f"failed_first_{selected_app}")
+                with sel_col3:
+                    parallel_workers = st.number_input("Parallel workers", min_value=1, max_value=4, value=1, key=f"workers_{selected_app}")
+                
                 # Add button to load into manual editor
                 col1, col2 = st.columns(2)
                 with col1:
                     if st.button("Load into Manual Editor", key=f"load_manual_{selected_app}"):
-                        st.session_state['new_side'] = side_data.copy()
+                        load_editor_document(side_data, selected_app)
                         st.success("SIDE file loaded into manual editor! Check the 'Create Manual' tab.")
                         
                 with col2:
@@ -585,49 +659,128 @@ def render_app_tab(selected_app):
                             elif screenshot_choices:
                                 apply_param_map_and_screenshots(side_data, {}, screenshot_choices)
                             
+                            # Compiled once, then filled in per parameter set / data row
+                            template = compile_side(side_data)
+                            if data_rows:
+                                side_data = expand_data_rows(template, data_rows, user_params)
+                            else:
+                                side_data = template.render(user_params)
+                            
                             # Step 2: Execute test
                             status_text.text("🔄 Running test automation...")
                             progress_bar.progress(40)
                             
+                            # Selection and scheduling use each browser's own history
+                            browsers = selected_browsers()
+                            plans = {}
+                            for browser in browsers:
+                                test_history = get_test_stats(selected_app, uploaded_file.name, browser=browser)
+                                selected_tests = select_tests(side_data, test_history, changed_only=changed_only, tags=tag_filter)
+                                if selected_tests:
+                                    plans[browser] = (selected_tests, test_history)
+                            if not plans:
+                                raise ValueError("No tests match the current selection")
+                            run_plans = {
+                                browser: {
+                                    'groups': schedule_tests(side_data, selected_tests, test_history,
+                                                             workers=parallel_workers, failed_first=failed_first),
+                                    'config': build_run_config(selected_app, uploaded_file.name,
+                                                               browser=browser if len(browsers) > 1 else None),
+                                }
+                                for browser, (selected_tests, test_history) in plans.items()
+                            }
+                            browser, (selected_tests, test_history) = next(iter(plans.items()))
+                            test_groups = run_plans[browser]['groups']
+                            status_text.text(
+                                f"🔄 Running {len(selected_tests)} test(s) on {len(test_groups)} worker(s) "
+                                f"(~{expected_makespan(side_data, test_groups, test_history):.0f}s expected)..."
+                            )
+                            
+                            blocked = governor.status()['blocked']
+                            if blocked:
+                                status_text.text(f"⏳ Waiting for a free run slot ({blocked})...")
+                            
                             start_time = time.time()
-                            zip_bytes = run_test_and_get_results(side_data, selected_app, "uploaded")
+                            backend = st.session_state.get('run_backend', 'local')
+                            if len(run_plans) > 1:
+                                # Every browser at once - wall time is the slowest browser, not the sum
+                                status_text.text(f"🔄 Running on {', '.join(b.title() for b in run_plans)} in parallel...")
+                                results = run_browser_matrix(side_data, selected_app, run_plans, "uploaded",
+                                                             timeout=run_timeout, backend=backend)
+                            else:
+                                results = {browser: run_tests_parallel(side_data, selected_app, test_groups, "uploaded",
+                                                                       config=run_plans[browser]['config'],
+                                                                       timeout=run_timeout, backend=backend)}
                             execution_time = time.time() - start_time
+                            summaries = {browser: read_run_summary(zip_bytes) for browser, zip_bytes in results.items()}
+                            
+                            progress_bar.progress(70)
+                            status_text.text("🖼️ Comparing screenshots with baselines...")
+                            visual_diffs = {
+                                browser: run_visual_regression(zip_bytes, selected_app, uploaded_file.name,
+                                                               summaries[browser].get('browser') or browser)
+                                for browser, zip_bytes in results.items()
+                            }
                             
                             progress_bar.progress(80)
                             status_text.text("💾 Saving results to database...")
                             
-                            # Step 3: Save to database
-                            try:
-                                save_run(
-                                    selected_app, user_params, param_map, 
-                                    screenshot_choices, zip_bytes, 
-                                    original_side_bytes=uploaded_bytes, 
-                                    modified_side_bytes=json.dumps(side_data, separators=(',', ':')).encode()
-                                )
-                                
-                                progress_bar.progress(100)
-                                status_text.text("✅ Test completed successfully!")
-                                
-                                # Provide download link
-                                st.success(f"Test completed in {execution_time:.2f} seconds!")
-                                st.download_button(
-                                    "📥 Download Results ZIP", 
-                                    zip_bytes, 
-                                    f"{selected_app}_results_{int(time.time())}.zip", 
-                                    "application/zip",
-                                    key=f"download_main_{selected_app}_{int(time.time())}"
-                                )
-                                
-                            except Exception as db_error:
-                                st.error(f"Database save error: {str(db_error)}")
-                                # Still offer download even if DB save fails
-                                st.download_button(
-                                    "📥 Download Results ZIP (DB Save Failed)", 
-                                    zip_bytes, 
-                                    f"{selected_app}_results_{int(time.time())}.zip", 
-                                    "application/zip",
-                                    key=f"download_main_error_{selected_app}_{int(time.time())}"
-                                )
+                            # Step 3: Save to database - one run per browser
+                            modified_side_bytes = json.dumps(side_data, separators=(',', ':')).encode()
+                            for browser, zip_bytes in results.items():
+                                run_summary = summaries[browser]
+                                label = f"{browser.title()}: " if len(results) > 1 else ""
+                                try:
+                                    save_run(
+                                        selected_app, user_params, param_map, 
+                                        screenshot_choices, zip_bytes, 
+                                        original_side_bytes=uploaded_bytes, 
+                                        modified_side_bytes=modified_side_bytes,
+                                        side_name=uploaded_file.name,
+                                        visual_diffs=visual_diffs[browser],
+                                        run_summary=run_summary
+                                    )
+                                    
+                                    # Provide download link
+                                    failed_steps = [s for s in run_summary['steps'] if s['status'] == 'failed']
+                                    flaky_passes = [s for s in run_summary['steps'] if s['status'] == 'flaky']
+                                    if run_summary['status'] == 'passed':
+                                        st.success(f"{label}Test completed in {execution_time:.2f} seconds!")
+                                    elif run_summary['status'] == 'failed':
+                                        st.error(f"{label}Test finished in {execution_time:.2f} seconds with {len(failed_steps)} failed step(s)")
+                                    else:
+                                        st.error(f"{label}Test run errored: {run_summary.get('error')}")
+                                    if run_summary.get('browser') and run_summary['browser'] != browser:
+                                        st.warning(f"{browser.title()} could not be started - this run used {run_summary['browser'].title()}")
+                                    if flaky_passes:
+                                        st.info(f"🔁 {label}{len(flaky_passes)} flaky step(s) passed after retry")
+                                    changed_steps = [d['step'] for d in visual_diffs[browser] if d['status'] == 'changed']
+                                    if changed_steps:
+                                        st.warning(f"{label}Visual changes detected in {len(changed_steps)} step(s): {', '.join(changed_steps)}")
+                                    st.download_button(
+                                        f"📥 Download {browser.title()} Results ZIP" if label else "📥 Download Results ZIP", 
+                                        zip_bytes, 
+                                        f"{selected_app}_{browser}_results_{int(time.time())}.zip", 
+                                        "application/zip",
+                                        key=f"download_main_{selected_app}_{browser}_{int(time.time())}"
+                                    )
+                                    
+                                except Exception as db_error:
+                                    st.error(f"{label}Database save error: {str(db_error)}")
+                                    # Still offer download even if DB save fails
+                                    st.download_button(
+                                        "📥 Download Results ZIP (DB Save Failed)", 
+                                        zip_bytes, 
+                                        f"{selected_app}_{browser}_results_{int(time.time())}.zip", 
+                                        "application/zip",
+                                        key=f"download_main_error_{selected_app}_{browser}_{int(time.time())}"
+                                    )
+                            run_cache.refresh()
+                            
+                            progress_bar.progress(100)
+                            status_text.text("✅ Test completed successfully!")
+                            if len(results) > 1:
+                                render_browser_comparison(summaries)
                             
                         except Exception as e:
                             progress_bar.progress(100)
@@ -638,7 +791,83 @@ def render_app_tab(selected_app):
                             # Clear progress indicators after a delay
                             time.sleep(2)
                             progress_container.empty()
-                        
+
+                # Load testing - replay this flow with many concurrent users
+                with st.expander("🔥 Load Test", expanded=False):
+                    st.caption("HTTP replay is cheap and scales to many users; browser users run the full flow in a shared pool of headless browsers.")
+                    lt_col1, lt_col2, lt_col3 = st.columns(3)
+                    with lt_col1:
+                        lt_mode = st.radio("Mode", ["HTTP replay", "Browser users"], key=f"lt_mode_{selected_app}")
+                        lt_users = st.number_input("Virtual users", min_value=1, max_value=500, value=10, key=f"lt_users_{selected_app}")
+                    with lt_col2:
+                        lt_ramp = st.number_input("Ramp-up (seconds)", min_value=0.0, max_value=600.0, value=5.0, key=f"lt_ramp_{selected_app}")
+                        lt_iterations = st.number_input("Iterations per user", min_value=1, max_value=100, value=3, key=f"lt_iter_{selected_app}")
+                    with lt_col3:
+                        lt_think = st.number_input("Think time (seconds)", min_value=0.0, max_value=30.0, value=0.5, key=f"lt_think_{selected_app}")
+                        lt_use_har = st.checkbox("Replay requests captured in the latest HAR", key=f"lt_har_{selected_app}",
+                                                 disabled=lt_mode != "HTTP replay")
+
+                    if st.button("Start Load Test", key=f"lt_start_{selected_app}"):
+                        lt_status = st.empty()
+                        try:
+                            if lt_mode == "HTTP replay":
+                                plan = load_test.http_plan_from_side(side_data)
+                                if lt_use_har:
+                                    har_plan = latest_har_plan(selected_app, uploaded_file.name)
+                                    if har_plan:
+                                        plan = har_plan
+                                    else:
+                                        st.info("No captured HAR found for this file - replaying open commands only")
+                                report = load_test.load_test_http(
+                                    plan, int(lt_users), lt_ramp, int(lt_iterations), lt_think, max_duration=run_timeout,
+                                    on_progress=lambda n, t: lt_status.text(f"🔄 {n} requests in {t:.0f}s...")
+                                )
+                            else:
+                                report = load_test.load_test_browsers(
+                                    side_data, int(lt_users), lt_ramp, int(lt_iterations), lt_think, max_duration=run_timeout,
+                                    on_progress=lambda n, t: lt_status.text(f"🔄 {n} steps in {t:.0f}s...")
+                                )
+                            lt_status.empty()
+                            save_load_test(selected_app, uploaded_file.name, {
+                                'mode': lt_mode, 'users': int(lt_users), 'ramp_up': lt_ramp,
+                                'iterations': int(lt_iterations), 'think_time': lt_think
+                            }, report)
+                            st.session_state[f'load_test_{selected_app}'] = report
+                        except Exception as e:
+                            lt_status.empty()
+                            st.error(f"Load test failed: {e}")
+
+                    report = st.session_state.get(f'load_test_{selected_app}')
+                    if report:
+                        totals = report['totals']
+                        m1, m2, m3, m4 = st.columns(4)
+                        m1.metric("Requests", totals['requests'])
+                        m2.metric("Throughput", f"{totals['throughput']}/s")
+                        m3.metric("p95 latency", f"{totals['p95'] or 0:.0f} ms")
+                        m4.metric("Error rate", f"{totals['error_rate'] * 100:.1f}%")
+                        st.caption(f"p50 {totals['p50'] or 0:.0f} ms · p90 {totals['p90'] or 0:.0f} ms · "
+                                   f"p99 {totals['p99'] or 0:.0f} ms · max {totals['max'] or 0:.0f} ms · {totals['duration']}s")
+                        if report['timeline']:
+                            timeline = {row['second']: row for row in report['timeline']}
+                            st.line_chart({
+                                'throughput (/s)': {s: r['throughput'] for s, r in timeline.items()},
+                                'p95 (ms)': {s: r['p95'] for s, r in timeline.items() if r['p95'] is not None},
+                            })
+                        st.table([{'label': label, **stats} for label, stats in report['breakdown'].items()])
+
+                    previous_tests = get_load_tests(selected_app)
+                    if previous_tests:
+                        st.markdown("**Previous load tests**")
+                        st.table([{
+                            'when': lt['timestamp'].strftime('%Y-%m-%d %H:%M') if lt.get('timestamp') else '',
+                            'file': lt.get('side_name', ''),
+                            'mode': lt.get('settings', {}).get('mode', ''),
+                            'users': lt.get('totals', {}).get('users'),
+                            'throughput': lt.get('totals', {}).get('throughput'),
+                            'p95 (ms)': lt.get('totals', {}).get('p95'),
+                            'errors': lt.get('totals', {}).get('errors'),
+                        } for lt in previous_tests])
+
             except Exception as e:
                 st.error(f"Error processing file: {e}")
     
@@ -648,8 +877,8 @@ def render_app_tab(selected_app):
         # Option to load from database
         st.markdown("#### Load from Database")
         try:
-            all_runs = get_recent_runs(100)
-            db_side_files = [r for r in all_runs if r.get('original_side') and r.get('app_name') == selected_app]
+            all_runs = get_cached_recent_runs(100)
+            db_side_files = [r for r in all_runs if run_has_side(r) and r.get('app_name') == selected_app]
             if db_side_files:
                 db_file_names = [f"{r.get('side_name', 'Unnamed')} - {r.get('timestamp', '').strftime('%Y-%m-%d %H:%M') if r.get('timestamp') else 'Unknown'}" for r in db_side_files]
                 selected_db_file = st.selectbox("Select SIDE file from database", db_file_names, key=f"db_file_select_{selected_app}")
@@ -658,8 +887,8 @@ def render_app_tab(selected_app):
                     selected_idx = db_file_names.index(selected_db_file)
                     selected_run = db_side_files[selected_idx]
                     try:
-                        db_side_data = json.loads(selected_run['original_side'])
-                        st.session_state['new_side'] = db_side_data.copy()
+                        db_side_data = json.loads(get_run_sides(selected_run['_id'])['original_side'])
+                        load_editor_document(db_side_data, selected_app, copy=False)  # Freshly parsed, nothing shares it
                         st.success("✅ SIDE file loaded from database for editing!")
                         st.info("🔄 Scroll down to see the loaded tests and steps for editing.")
                         # Don't rerun - let the user see the loaded content immediately
@@ -669,20 +898,21 @@ def render_app_tab(selected_app):
             st.error(f"Failed to fetch database files: {e}")
         
         # Ensure new_side is refreshed from session state after potential loading
-        new_side = st.session_state['new_side']
+        side_doc = st.session_state['side_doc']
+        new_side = side_doc.doc
         
         st.markdown("---")
         
         # Show current SIDE file status
         st.markdown("#### Current SIDE File Status")
         col1, col2 = st.columns(2)
+        stats = side_stats(new_side)
         with col1:
             st.write(f"**SIDE File Name:** {new_side.get('name', 'New SIDE')}")
-            st.write(f"**Number of Tests:** {len(new_side.get('tests', []))}")
+            st.write(f"**Number of Tests:** {stats['tests']}")
         with col2:
-            if new_side.get('tests'):
-                total_commands = sum(len(test.get('commands', [])) for test in new_side['tests'])
-                st.write(f"**Total Commands:** {total_commands}")
+            if stats['tests']:
+                st.write(f"**Total Commands:** {stats['commands']}")
                 st.write(f"**SIDE Version:** {new_side.get('version', '1.0')}")
         
         # Debug info for loaded SIDE
@@ -691,77 +921,100 @@ def render_app_tab(selected_app):
         
         # Add new test
         if st.button('Add Test', key=f'add_test_{selected_app}'):
-            new_side['tests'].append({
-                'id': f'test-{len(new_side["tests"])+1}',
-                'name': f'Test {len(new_side["tests"])+1}',
-                'commands': []
-            })
-            st.session_state['new_side'] = new_side
+            side_doc.apply({'op': 'add_test', 'test': new_test(f'Test {len(new_side["tests"])+1}')})
+            st.session_state[editor_key(selected_app, 'test')] = new_side['tests'][-1]['id']
             st.success('Test added!')
-            safe_rerun()
         
-        # Edit existing tests
-        for t_idx, test in enumerate(new_side['tests']):
-            with st.expander(f"Test: {test['name']}", expanded=False):
-                
-                # Test controls
-                col1, col2 = st.columns([3, 1])
-                with col1:
-                    test['name'] = st.text_input(f"Test Name", value=test['name'], key=f"test_name_{selected_app}_{t_idx}")
-                with col2:
-                    if st.button('Delete Test', key=f'del_test_{selected_app}_{t_idx}'):
-                        new_side['tests'].pop(t_idx)
-                        st.session_state['new_side'] = new_side
-                        safe_rerun()
-                
-                # Commands/Steps - Show all command details
-                for c_idx, cmd in enumerate(test['commands']):
-                    with st.expander(f"Step {c_idx+1}: {cmd.get('command', '')} - {cmd.get('target', '')[:50]}{'...' if len(cmd.get('target', '')) > 50 else ''}", expanded=False):
-                        col1, col2, col3, col4 = st.columns([2, 2, 2, 1])
-                        
-                        with col1:
-                            cmd['command'] = st.text_input(
-                                "Command", value=cmd.get('command',''), 
-                                key=f"cmd_{selected_app}_{t_idx}_{c_idx}",
-                                placeholder="e.g., open, click, type"
-                            )
-                        with col2:
-                            cmd['target'] = st.text_area(
-                                "Target", value=cmd.get('target',''), 
-                                key=f"target_{selected_app}_{t_idx}_{c_idx}",
-                                placeholder="CSS selector, XPath, or URL",
-                                height=100
-                            )
-                        with col3:
-                            cmd['value'] = st.text_area(
-                                "Value", value=cmd.get('value',''), 
-                                key=f"value_{selected_app}_{t_idx}_{c_idx}",
-                                placeholder="Text, value, or data",
-                                height=100
-                            )
-                        with col4:
-                            st.write("")  # Spacing
-                            if st.button('Delete', key=f'del_step_{selected_app}_{t_idx}_{c_idx}', help="Delete step"):
-                                test['commands'].pop(c_idx)
-                                st.session_state['new_side'] = new_side
-                                safe_rerun()
-                        
-                        # Show additional command details if available
-                        if cmd.get('comment'):
-                            st.text_area("Comment", value=cmd.get('comment', ''), 
-                                       key=f"comment_{selected_app}_{t_idx}_{c_idx}", 
-                                       placeholder="Step description or notes")
-                        
-                        # Show all other properties
-                        other_props = {k: v for k, v in cmd.items() if k not in ['command', 'target', 'value', 'comment']}
-                        if other_props:
-                            st.json(other_props)
+        # Undo/redo walk the edit log; changes since load are read from it too
+        undo_col1, undo_col2, undo_col3 = st.columns([1, 1, 4])
+        undo_col1.button('↩️ Undo', key=f'undo_{selected_app}', disabled=not side_doc.can_undo(),
+                         on_click=undo_editor_edit, args=(selected_app,))
+        undo_col2.button('↪️ Redo', key=f'redo_{selected_app}', disabled=not side_doc.can_redo(),
+                         on_click=undo_editor_edit, args=(selected_app, True))
+        changes = side_doc.changes()
+        with undo_col3.expander(f"📝 Changes since load ({len(changes)})"):
+            if changes:
+                test_labels = {t['id']: t.get('name', '') for t in new_side['tests']}
+                st.table([
+                    {'Change': c['op'].replace('_', ' '), 'Test': test_labels.get(c['test'], c['test'] or ''),
+                     'Field': c['field'] or '', 'Before': str(c['before'] or ''), 'After': str(c['after'] or '')}
+                    for c in changes
+                ])
+            else:
+                st.caption("No changes since the document was loaded.")
+        
+        # Edit one test and one page of its steps at a time - widgets only exist for
+        # what is on screen and every change is applied to new_side as a patch
+        if new_side['tests']:
+            editor_test_names = {t['id']: t.get('name', '') for t in new_side['tests']}
+            test_select_key = editor_key(selected_app, 'test')
+            if st.session_state.get(test_select_key) not in editor_test_names:
+                st.session_state[test_select_key] = new_side['tests'][0]['id']
+            
+            col1, col2, col3 = st.columns([3, 3, 1])
+            with col1:
+                edit_test_id = st.selectbox("Test", list(editor_test_names), format_func=lambda i: editor_test_names[i],
+                                            key=test_select_key)
+            test = new_side['tests'][find_test(new_side, edit_test_id)]
+            with col2:
+                name_key = editor_key(selected_app, edit_test_id, 'name')
+                st.text_input("Test Name", value=test['name'], key=name_key, on_change=apply_editor_edit,
+                              args=({'op': 'rename_test', 'test_id': edit_test_id}, name_key))
+            with col3:
+                st.write("")  # Spacing
+                st.button('Delete Test', key=editor_key(selected_app, edit_test_id, 'delete'),
+                          on_click=apply_editor_edit, args=({'op': 'delete_test', 'test_id': edit_test_id},))
+            
+            commands = test['commands']
+            page_key = editor_key(selected_app, edit_test_id, 'page')
+            pages = page_count(len(commands))
+            # The page lives in session_state only (no value=), since callbacks also write it
+            if page_key not in st.session_state:
+                st.session_state[page_key] = 1
+            elif st.session_state[page_key] > pages:
+                st.session_state[page_key] = pages
+            page_col1, page_col2 = st.columns([1, 3])
+            with page_col1:
+                page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, key=page_key)
+            with page_col2:
+                show_details = st.checkbox("Show comments and extra properties", key=editor_key(selected_app, 'details'))
+            start, end = page_bounds(len(commands), page)
+            if commands:
+                st.caption(f"Steps {start+1}-{end} of {len(commands)}")
+            
+            for c_idx in range(start, end):
+                cmd = commands[c_idx]
+                step_id = cmd['id']
+                row = st.columns([1, 3, 4, 4, 1])
+                row[0].markdown(f"**{c_idx+1}**")
+                for column, field, placeholder in (
+                    (row[1], 'command', 'e.g., open, click, type'),
+                    (row[2], 'target', 'CSS selector, XPath, or URL'),
+                    (row[3], 'value', 'Text, value, or data'),
+                ):
+                    field_key = editor_key(selected_app, edit_test_id, step_id, field)
+                    column.text_input(
+                        field.title(), value=cmd.get(field, ''), key=field_key, placeholder=placeholder,
+                        label_visibility="collapsed" if c_idx > start else "visible",
+                        on_change=apply_editor_edit,
+                        args=({'op': 'set_step_field', 'test_id': edit_test_id, 'step_id': step_id, 'field': field}, field_key)
+                    )
+                row[4].button('🗑️', key=editor_key(selected_app, edit_test_id, step_id, 'delete'), help="Delete step",
+                              on_click=apply_editor_edit,
+                              args=({'op': 'delete_step', 'test_id': edit_test_id, 'step_id': step_id},))
                 
-                # Add step button
-                if st.button('Add Step', key=f'add_step_{selected_app}_{t_idx}'):
-                    test['commands'].append({'command': '', 'target': '', 'value': ''})
-                    st.session_state['new_side'] = new_side
-                    safe_rerun()
+                if show_details:
+                    comment_key = editor_key(selected_app, edit_test_id, step_id, 'comment')
+                    st.text_input("Comment", value=cmd.get('comment', ''), key=comment_key,
+                                  placeholder="Step description or notes", on_change=apply_editor_edit,
+                                  args=({'op': 'set_step_field', 'test_id': edit_test_id, 'step_id': step_id,
+                                         'field': 'comment'}, comment_key))
+                    other_props = {k: v for k, v in cmd.items() if k not in STEP_FIELDS + ('id',)}
+                    if other_props:
+                        st.json(other_props, expanded=False)
+            
+            st.button('Add Step', key=editor_key(selected_app, edit_test_id, 'add_step'),
+                      on_click=add_editor_step, args=(edit_test_id, page_key))
         
         # Save and run manual SIDE file
         if new_side['tests']:
@@ -784,6 +1037,7 @@ def render_app_tab(selected_app):
                             modified_side_bytes=None, 
                             side_name=manual_side_name
                         )
+                        run_cache.refresh()
                         st.success(f'SIDE file "{manual_side_name}" saved to database for app "{selected_app}"!')
                     except Exception as e:
                         st.error(f'Failed to save to database: {e}')
@@ -803,7 +1057,13 @@ def render_app_tab(selected_app):
                         with st.spinner("Running manual test..."):
                             test_side = dict(new_side)
                             test_side['tests'] = [new_side['tests'][sel_test]]
-                            zip_bytes = run_test_and_get_results(test_side, selected_app, "manual")
+                            test_side = compile_side(test_side).render(user_params)
+                            manual_run_name = f"manual_run_{test_names[sel_test]}"
+                            run_config = build_run_config(selected_app, manual_run_name)
+                            zip_bytes = run_test_and_get_results(test_side, selected_app, "manual", config=run_config, timeout=run_timeout,
+                                                                 backend=st.session_state.get('run_backend', 'local'))
+                            run_summary = read_run_summary(zip_bytes)
+                            visual_diffs = run_visual_regression(zip_bytes, selected_app, manual_run_name, run_summary.get('browser'))
                             
                             # Save manual test run to database
                             try:
@@ -811,8 +1071,11 @@ def render_app_tab(selected_app):
                                     selected_app, user_params, {}, [], zip_bytes,
                                     original_side_bytes=json.dumps(test_side).encode(),
                                     modified_side_bytes=None,
-                                    side_name=f"manual_run_{test['name']}"
+                                    side_name=manual_run_name,
+                                    visual_diffs=visual_diffs,
+                                    run_summary=run_summary
                                 )
+                                run_cache.refresh()
                                 st.success('Manual test run saved to database!')
                             except Exception as e:
                                 st.error(f'Failed to save test run: {e}')
@@ -824,13 +1087,23 @@ def render_app_tab(selected_app):
                                 mime='application/zip'
                             )
             
-            # Download SIDE file
-            side_json = json.dumps(new_side, indent=2)
-            b64 = base64.b64encode(side_json.encode()).decode()
-            st.markdown(
-                f'<a href="data:application/json;base64,{b64}" download="{selected_app or "new"}.side">Download SIDE File</a>', 
-                unsafe_allow_html=True
-            )
+            # Download SIDE file - serialized only when asked for, and only again after edits
+            export_col1, export_col2 = st.columns([1, 2])
+            with export_col1:
+                export_format = st.radio("SIDE export format", EXPORT_FORMATS, horizontal=True,
+                                         key=f'side_export_format_{selected_app}')
+            with export_col2:
+                export_key = (id(side_doc), side_doc.version, export_format)
+                prepared = st.session_state.get('side_export')
+                if not (prepared and prepared['key'] == export_key):
+                    prepared = None
+                    if st.button('📦 Prepare SIDE Download', key=f'side_export_prepare_{selected_app}'):
+                        prepared = {'key': export_key, 'data': export_side(new_side, export_format)}
+                        st.session_state['side_export'] = prepared
+                if prepared:
+                    st.download_button('📥 Download SIDE File', data=prepared['data'],
+                                       file_name=f'{selected_app or "new"}.side', mime='application/json',
+                                       key=f'side_export_download_{selected_app}')
     
     with tab3:
         st.markdown("### Test Run History")
@@ -849,6 +1122,196 @@ def render_app_tab(selected_app):
                         st.metric("CPU Usage", f"{stats['cpu_percent']:.1f}%")
                 except:
                     pass
+                
+                resolutions = {browser: load_resolution(browser) for browser in BROWSERS}
+                for browser, resolution in resolutions.items():
+                    if resolution:
+                        st.caption(
+                            f"{browser.title()} setup: {resolution['strategy']} · browser {resolution.get('browser_version') or '?'} · "
+                            f"driver {resolution.get('driver_version') or '?'} · cached {resolution.get('resolved_at', '')[:16]}"
+                        )
+                    else:
+                        st.caption(f"{browser.title()} setup: not resolved yet - probed on its next run")
+                if any(resolutions.values()) and st.button("Re-detect Browser Setup", key=f"reset_driver_cache_{selected_app}"):
+                    clear_resolution()
+                    st.success("Browser setup will be probed again on the next run")
+                
+                with st.expander("Metrics Snapshot", expanded=False):
+                    metrics_address = start_metrics_server()
+                    if metrics_address:
+                        st.caption(f"Prometheus endpoint: http://{metrics_address[0]}:{metrics_address[1]}/metrics")
+                    else:
+                        st.caption("Prometheus endpoint not running - its port was taken when the portal started")
+                    cache_status = run_cache.status()
+                    st.caption(f"Run cache: {cache_status['mode']} · {cache_status['cached_runs']} runs · "
+                               f"{cache_status['events']} change events")
+                    startup = startup_report()
+                    st.caption(f"Portal startup: {startup['total_seconds']:.2f}s · " + " · ".join(
+                        f"{p['phase']} {p['seconds']:.2f}s" for p in startup['phases']))
+                    st.json(metrics_snapshot())
+        
+        # Full-text search over indexed step errors, log lines and URLs (no ZIPs are opened)
+        if st.checkbox("🔎 Search Run Logs", key=f"log_search_{selected_app}"):
+            search_col1, search_col2, search_col3 = st.columns([3, 1, 1])
+            with search_col1:
+                log_query = st.text_input("Error text, selector or URL", key=f"log_query_{selected_app}",
+                                          placeholder="e.g. NoSuchElement, #login-btn, /checkout")
+            with search_col2:
+                log_days = st.selectbox("Within", [1, 7, 30, None], index=1, key=f"log_days_{selected_app}",
+                                        format_func=lambda d: f"{d} day(s)" if d else "All time")
+            with search_col3:
+                all_apps = st.checkbox("All apps", key=f"log_all_apps_{selected_app}")
+            if log_query:
+                hits = search_run_logs(log_query, app_name=None if all_apps else selected_app, days=log_days)
+                if hits:
+                    st.caption(f"{len(hits)} match(es) in {len({h['run_id'] for h in hits})} run(s)")
+                    st.dataframe(
+                        [{'time': h['timestamp'].strftime('%Y-%m-%d %H:%M') if h.get('timestamp') else '',
+                          'app': h.get('app_name'), 'side': h.get('side_name'), 'kind': h['kind'],
+                          'test': h.get('test') or '', 'step': h['step'] + 1 if h.get('step') is not None else '',
+                          'target': h.get('target') or '', 'text': h['text'], 'run': str(h['run_id'])}
+                         for h in hits],
+                        use_container_width=True
+                    )
+                else:
+                    st.info("No indexed errors, log lines or URLs match. Runs saved before indexing are not searchable.")
+        
+        # Two runs of one SIDE file aligned by step, from stored step results and screenshot hashes
+        if st.checkbox("⚖️ Compare Runs", key=f"compare_{selected_app}"):
+            app_runs = [r for r in get_cached_recent_runs(limit=100)
+                        if r.get('app_name') == selected_app and r.get('side_name') and r.get('step_results')]
+            compare_sides = sorted({r['side_name'] for r in app_runs})
+            if compare_sides:
+                compare_side = st.selectbox("SIDE file", compare_sides, key=f"compare_side_{selected_app}")
+                side_runs = [r for r in app_runs if r['side_name'] == compare_side]  # Newest first
+                run_labels = {
+                    str(r['_id']): f"{r['timestamp'].strftime('%Y-%m-%d %H:%M') if r.get('timestamp') else 'Unknown'}"
+                                   f"{' · ' + r['browser'].title() if r.get('browser') else ''}"
+                                   f" · {r.get('status', 'unknown')} · {r.get('run_duration') or 0:.1f}s"
+                    for r in side_runs
+                }
+                if len({r.get('browser') for r in side_runs}) > 1:
+                    # Pick a Chrome and a Firefox run below for a step-by-step browser comparison
+                    st.markdown("**Per-browser timing**")
+                    st.dataframe(browser_timings(side_runs), use_container_width=True)
+                if len(side_runs) < 2:
+                    st.info("At least two runs with step results are needed to compare.")
+                else:
+                    run_ids = list(run_labels)
+                    cmp_col1, cmp_col2 = st.columns(2)
+                    base_id = cmp_col1.selectbox("Base run", run_ids, index=1, format_func=run_labels.get,
+                                                 key=f"compare_base_{selected_app}")
+                    other_id = cmp_col2.selectbox("Compared run", run_ids, index=0, format_func=run_labels.get,
+                                                  key=f"compare_other_{selected_app}")
+                    runs_by_id = {str(r['_id']): r for r in side_runs}
+                    comparison = compare_runs(runs_by_id[base_id], runs_by_id[other_id])
+                    summary = comparison['summary']
+                    m1, m2, m3, m4 = st.columns(4)
+                    m1.metric("Duration", f"{summary['duration'] or 0:.1f}s",
+                              f"{summary['delta']:+.1f}s" if summary['delta'] is not None else None,
+                              delta_color="inverse")
+                    m2.metric("Regressed steps", summary['regressed'], f"{summary['fixed']} fixed", delta_color="off")
+                    m3.metric("Slower steps", summary['slower'], f"{summary['faster']} faster", delta_color="off")
+                    m4.metric("Status", summary['status'] or 'unknown', f"was {summary['base_status'] or 'unknown'}",
+                              delta_color="off")
+                    
+                    slowest = slowest_changes(comparison['steps'])
+                    if slowest:
+                        st.markdown("**Biggest slowdowns**")
+                        st.dataframe([{'test': r['test'], 'step': (r['step'] or 0) + 1, 'command': r['command'],
+                                       'target': r['target'], 'before (s)': r['base_duration'],
+                                       'after (s)': r['duration'], 'delta (s)': r['delta'],
+                                       'delta %': r['delta_pct']} for r in slowest],
+                                     use_container_width=True)
+                    
+                    only_changed = st.checkbox("Only changed steps", value=True, key=f"compare_changed_{selected_app}")
+                    rows = [r for r in comparison['steps'] if not only_changed or r['status_change'] or r['timing']]
+                    st.markdown("**Steps**")
+                    st.dataframe([{'test': r['test'], 'step': (r['step'] or 0) + 1 if r['step'] is not None else '',
+                                   'command': r['command'], 'target': r['target'],
+                                   'status': f"{r['base_status'] or '-'} → {r['status'] or '-'}",
+                                   'change': r['status_change'] or r['timing'], 'before (s)': r['base_duration'],
+                                   'after (s)': r['duration'], 'delta (s)': r['delta'], 'error': r['error'] or ''}
+                                  for r in rows],
+                                 use_container_width=True)
+                    with st.expander("Per-test totals"):
+                        st.dataframe(comparison['tests'], use_container_width=True)
+                    if comparison['screenshots']:
+                        with st.expander("Screenshots (perceptual hash distance)"):
+                            st.dataframe(comparison['screenshots'], use_container_width=True)
+            else:
+                st.info("No runs with step results for this application yet.")
+        
+        # Flaky step overview per SIDE file
+        if st.checkbox("Show Flaky Steps", key=f"flaky_{selected_app}"):
+            side_names = sorted({r.get('side_name') for r in get_cached_recent_runs(limit=100)
+                                 if r.get('app_name') == selected_app and r.get('side_name')})
+            if side_names:
+                flaky_side = st.selectbox("SIDE file", side_names, key=f"flaky_side_{selected_app}")
+                history = [h for h in get_step_history(selected_app, flaky_side)
+                           if h['classification'] in ('flaky', 'failing')]
+                if history:
+                    st.dataframe(
+                        [{'browser': h.get('browser') or 'chrome',
+                          'test': h.get('test'), 'command': h.get('command'), 'target': h.get('target'),
+                          'classification': h['classification'], 'runs': h.get('runs', 0),
+                          'failures': h.get('failures', 0), 'recent': ''.join(h.get('outcomes', []))}
+                         for h in history],
+                        use_container_width=True
+                    )
+                    st.caption("Flaky steps are retried automatically with backoff on the next run.")
+                else:
+                    st.info("No flaky or failing steps recorded for this SIDE file.")
+            else:
+                st.info("No named SIDE runs recorded yet.")
+        
+        # Page performance trends of the application under test
+        if st.checkbox("Show Page Performance", key=f"page_perf_{selected_app}"):
+            perf_sides = sorted({r.get('side_name') for r in get_cached_recent_runs(limit=100)
+                                 if r.get('app_name') == selected_app and r.get('side_name')})
+            perf_side = st.selectbox("SIDE file", perf_sides, key=f"perf_side_{selected_app}") if perf_sides else None
+            metric_history = get_page_metric_history(selected_app, perf_side) if perf_side else []
+            if metric_history:
+                latest, previous = metric_history[-1], metric_history[:-1]
+                
+                # Regressions of the latest run against the median of earlier runs
+                regression_rows = []
+                for key, step in latest['steps'].items():
+                    earlier = [run['steps'][key]['metrics'] for run in previous if key in run['steps']]
+                    for metric, info in find_regressions(step['metrics'], earlier).items():
+                        regression_rows.append({
+                            'test': step.get('test'), 'step': step.get('step', 0) + 1, 'command': step.get('command'),
+                            'metric': METRICS[metric][0], 'value': info['value'], 'median before': info['baseline'],
+                            'change': f"+{info['change'] * 100:.0f}%"
+                        })
+                if regression_rows:
+                    st.warning(f"{len(regression_rows)} metric regression(s) in the latest run")
+                    st.dataframe(regression_rows, use_container_width=True)
+                elif previous:
+                    st.success("No page performance regressions in the latest run")
+                
+                # Trend of one metric for one step across runs
+                step_labels = {}
+                for run in metric_history:
+                    for key, step in run['steps'].items():
+                        step_labels[key] = f"{step.get('test')} - Step {step.get('step', 0) + 1}: {step.get('command')} {step.get('target', '')[:40]}"
+                trend_col1, trend_col2 = st.columns(2)
+                with trend_col1:
+                    trend_step = st.selectbox("Step", list(step_labels), format_func=step_labels.get, key=f"perf_step_{selected_app}")
+                with trend_col2:
+                    trend_metric = st.selectbox("Metric", list(METRICS), format_func=lambda m: METRICS[m][0], key=f"perf_metric_{selected_app}")
+                trend = {
+                    run['timestamp'].strftime('%m-%d %H:%M:%S'): run['steps'][trend_step]['metrics'].get(trend_metric)
+                    for run in metric_history
+                    if trend_step in run['steps'] and run['timestamp'] and run['steps'][trend_step]['metrics'].get(trend_metric) is not None
+                }
+                if trend:
+                    st.line_chart({METRICS[trend_metric][0]: trend})
+                    st.caption(f"Unit: {METRICS[trend_metric][1] or 'count'}")
+                else:
+                    st.info("No values recorded for this metric yet.")
+            else:
+                st.info("No page metrics recorded yet - enable 'Collect page performance metrics' in the sidebar.")
         
         # History pagination and filtering
         col1, col2, col3 = st.columns([2, 2, 1])
@@ -858,7 +1321,7 @@ def render_app_tab(selected_app):
             sort_order = st.selectbox("Sort by", ["Newest First", "Oldest First"], key=f"hist_sort_{selected_app}")
         with col3:
             if st.button("🔄 Refresh", key=f"hist_refresh_{selected_app}"):
-                st.cache_data.clear()
+                run_cache.refresh()
                 st.rerun()
         
         try:
@@ -890,7 +1353,9 @@ def render_app_tab(selected_app):
                     expanded_key = f"expanded_{selected_app}_{i}"
                     is_expanded = st.session_state.get(expanded_key, False)
                     
-                    with st.expander(f"{ts_str} - {run.get('app_name','')}", expanded=is_expanded):
+                    status_icon = {'passed': '✅', 'failed': '❌', 'error': '⚠️'}.get(run.get('status'), '')
+                    browser_tag = f" · {run['browser'].title()}" if run.get('browser') else ""
+                    with st.expander(f"{status_icon} {ts_str} - {run.get('app_name','')}{browser_tag}".strip(), expanded=is_expanded):
                         # Store expansion state
                         st.session_state[expanded_key] = True
                         
@@ -914,39 +1379,162 @@ def render_app_tab(selected_app):
                         with details_col2:
                             screenshots = run.get('screenshot_steps', [])
                             
-                            # Enhanced screenshot info with preview
-                            zip_bytes = run.get('zip_file', b'')
-                            if zip_bytes:
-                                try:
-                                    with io.BytesIO(zip_bytes) as zb, zipfile.ZipFile(zb) as zf:
-                                        screenshot_files = [name for name in zf.namelist() 
-                                                          if name.lower().endswith(('.png', '.jpg', '.jpeg'))]
-                                        
-                                        if screenshot_files:
-                                            st.write(f"**Screenshots:** {len(screenshot_files)} files")
-                                            # Show screenshot filenames as preview
-                                            with st.expander(f"📸 Preview ({len(screenshot_files)} screenshots)", expanded=False):
-                                                for img_name in sorted(screenshot_files):
-                                                    st.text(f"• {img_name}")
-                                        else:
-                                            st.write(f"**Screenshots:** {len(screenshots)} steps configured (no files)")
-                                except:
-                                    st.write(f"**Screenshots:** {len(screenshots)} steps")
+                            # Built from the stored summary - the ZIP is only fetched for the artifacts below
+                            screenshot_files = [s['screenshot'] for s in run.get('step_results') or [] if s.get('screenshot')]
+                            if screenshot_files:
+                                st.write(f"**Screenshots:** {len(screenshot_files)} files")
+                                with st.expander(f"📸 Preview ({len(screenshot_files)} screenshots)", expanded=False):
+                                    for img_name in screenshot_files:
+                                        st.text(f"• {img_name}")
                             else:
                                 st.write(f"**Screenshots:** {len(screenshots)} steps")
                             
                             # Show file sizes if available
-                            zip_size = len(zip_bytes) // 1024
+                            zip_size = (run.get('zip_size') or 0) // 1024
                             if zip_size > 0:
                                 st.write(f"**Results Size:** {zip_size} KB")
                             else:
                                 st.write("**Results Size:** No data")
+                            
+                            network = run.get('network')
+                            if network:
+                                st.write(
+                                    f"**Network:** {network.get('requests', 0)} requests, "
+                                    f"{network.get('transferred_bytes', 0) // 1024} KB transferred, "
+                                    f"{network.get('blocked_requests', 0)} blocked "
+                                    f"(~{network.get('blocked_bytes_estimate', 0) // 1024} KB skipped)"
+                                )
+                            
+                            # Results ZIP and SIDE files are fetched only when asked for - fetching them for
+                            # every listed run on every rerun would churn the ZIP cache
+                            load_artifacts = zip_size > 0 and st.checkbox(
+                                "📦 Load artifacts (downloads, screenshots, profiles)", key=f"artifacts_{run['_id']}"
+                            )
+                            zip_bytes = run_cache.zip(run['_id']) if load_artifacts else b''
+                            
+                            profile_files = run.get('profile_files') or []
+                            if profile_files and zip_bytes and st.checkbox(f"📊 Profile ({len(profile_files)} files)", key=f"profile_{i}"):
+                                with io.BytesIO(zip_bytes) as zb, zipfile.ZipFile(zb) as zf:
+                                    for name in profile_files:
+                                        data = zf.read(name)
+                                        if name.endswith('.profile.txt'):
+                                            st.code(data.decode(errors='replace'), language=None)
+                                        st.download_button(f"📥 {name}", data, name, key=f"profile_dl_{i}_{name}")
+                                st.caption(".folded files open in speedscope or flamegraph.pl; .prof files in pstats or snakeviz.")
+                            
+                            resources = run.get('resources')
+                            if resources and resources.get('peak_memory_mb'):
+                                killed = " - killed at memory ceiling" if resources.get('killed') else ""
+                                st.write(f"**Peak Memory:** {resources['peak_memory_mb']} MB{killed}")
+                            
+                            visual_diffs = run.get('visual_diffs', [])
+                            if visual_diffs:
+                                changed = run.get('visual_changes', 0)
+                                label = f"{changed} changed" if changed else "no changes"
+                                st.write(f"**Visual Check:** {label} ({len(visual_diffs)} steps)")
+                        
+                        # Step outcomes recorded by the runner
+                        step_results = run.get('step_results', [])
+                        if step_results:
+                            failed = sum(1 for s in step_results if s.get('status') == 'failed')
+                            retried = sum(1 for s in step_results if s.get('status') == 'flaky')
+                            st.write(f"**Status:** {run.get('status', 'unknown')} — {len(step_results)} steps, "
+                                     f"{failed} failed, {retried} passed on retry")
+                            if run.get('run_error'):
+                                st.caption(f"Error: {run['run_error']}")
+                            if run.get('resume'):
+                                resume = run['resume']
+                                st.caption(f"Resumed at test {resume.get('start_test', 0)+1}, step {resume.get('start_step', 0)+1}")
+                            
+                            # Resume from checkpoint instead of replaying the whole flow
+                            resume_point = find_resume_point(step_results, run.get('status'),
+                                                             run.get('run_order'), run.get('shards'))
+                            if resume_point and (run_has_side(run, 'modified_side') or run_has_side(run)):
+                                resume_col1, resume_col2 = st.columns([2, 1])
+                                with resume_col1:
+                                    resume_mode = st.radio(
+                                        f"Resume from test {resume_point['test_index']+1}, step {resume_point['step']+1}",
+                                        ["anchor", "test"],
+                                        format_func=lambda m: "Nearest 'open' before the failing step" if m == "anchor" else "Start of the failing test",
+                                        key=f"resume_mode_{i}", horizontal=True
+                                    )
+                                with resume_col2:
+                                    if st.button("⏩ Resume Run", key=f"resume_{i}"):
+                                        with st.spinner("Resuming test run..."):
+                                            sides = get_run_sides(run['_id'])
+                                            resume_side = json.loads(sides.get('modified_side') or sides['original_side'])
+                                            # Continue the original selection in its original (scheduled) order
+                                            resume_from = {k: v for k, v in resume_point.items() if k != 'tests'}
+                                            resume_extra = {'tests': resume_point['tests']} if resume_point.get('tests') else {}
+                                            # Finish on the browser the run started on
+                                            run_config = build_run_config(
+                                                selected_app, run.get('side_name'), browser=run.get('browser'),
+                                                resume_from=dict(resume_from, mode=resume_mode, parent_run=str(run.get('_id'))),
+                                                **resume_extra
+                                            )
+                                            resumed_zip = run_test_and_get_results(
+                                                resume_side, selected_app, "resume", config=run_config, timeout=run_timeout,
+                                                backend=st.session_state.get('run_backend', 'local')
+                                            )
+                                            resumed_summary = read_run_summary(resumed_zip)
+                                            try:
+                                                save_run(
+                                                    selected_app, run.get('user_params', {}), run.get('param_map', {}),
+                                                    run.get('screenshot_steps', []), resumed_zip,
+                                                    original_side_bytes=sides.get('original_side'),
+                                                    modified_side_bytes=sides.get('modified_side'),
+                                                    side_name=run.get('side_name'),
+                                                    visual_diffs=run_visual_regression(resumed_zip, selected_app, run.get('side_name'),
+                                                                                       resumed_summary.get('browser')),
+                                                    run_summary=resumed_summary
+                                                )
+                                                run_cache.refresh()
+                                            except Exception as e:
+                                                st.error(f"Failed to save resumed run: {e}")
+                                            st.info(f"Resumed run finished with status: {resumed_summary['status']}")
+                                            st.download_button(
+                                                "📥 Resumed Results ZIP", resumed_zip,
+                                                f"{selected_app}_resumed_{int(time.time())}.zip", "application/zip",
+                                                key=f"dl_resumed_{i}"
+                                            )
+                            if st.checkbox("Show Step Results", key=f"steps_{i}"):
+                                st.dataframe(
+                                    [{k: s.get(k) for k in ('test', 'step', 'command', 'target', 'status', 'attempts', 'duration', 'error')}
+                                     for s in step_results],
+                                    use_container_width=True
+                                )
+                        
+                        # Visual regression details for changed steps
+                        changed_diffs = [d for d in run.get('visual_diffs', []) if d.get('status') == 'changed']
+                        if changed_diffs and st.checkbox(f"🖼️ Show Visual Changes ({len(changed_diffs)})", key=f"visual_{i}"):
+                            # Summaries carry no diff images - fetch them once the changes are opened
+                            diff_images = get_visual_diff_images(run['_id'])
+                            for d_idx, diff in enumerate(changed_diffs):
+                                diff_col1, diff_col2 = st.columns([3, 1])
+                                with diff_col1:
+                                    if diff_images.get(diff['step']):
+                                        safe_st_image(
+                                            image=diff_images[diff['step']],
+                                            caption=f"{diff['step']} - {diff.get('score', 0) * 100:.2f}% pixels changed"
+                                        )
+                                with diff_col2:
+                                    st.write(f"**Step:** {diff['step']}")
+                                    st.write(f"**Hash distance:** {diff.get('distance')}")
+                                    if st.button("✅ Accept as Baseline", key=f"accept_baseline_{i}_{d_idx}"):
+                                        shots = visual_diff.extract_step_screenshots(run_cache.zip(run['_id']))
+                                        if diff['step'] in shots and set_baseline(
+                                            run.get('app_name'), baseline_side_name(run.get('side_name'), run.get('browser')), diff['step'],
+                                            shots[diff['step']], diff.get('hash')
+                                        ):
+                                            st.success("Baseline updated!")
+                                        else:
+                                            st.error("Could not update baseline")
                         
                         # Download buttons in single row
                         btn_col1, btn_col2, btn_col3, btn_col4 = st.columns(4)
                         
+                        sides = get_run_sides(run['_id']) if load_artifacts else {}
                         with btn_col1:
-                            zip_bytes = run.get('zip_file', b'')
                             if zip_bytes:
                                 st.download_button(
                                     '📥 Results ZIP', data=zip_bytes, 
@@ -956,18 +1544,18 @@ def render_app_tab(selected_app):
                                 )
                         
                         with btn_col2:
-                            if run.get('original_side'):
+                            if sides.get('original_side'):
                                 st.download_button(
-                                    '📄 Original SIDE', data=run.get('original_side'), 
+                                    '📄 Original SIDE', data=sides['original_side'], 
                                     file_name=f'{selected_app}_original.side', 
                                     mime='application/json', 
                                     key=f"orig_{run.get('_id', i)}"
                                 )
                         
                         with btn_col3:
-                            if run.get('modified_side'):
+                            if sides.get('modified_side'):
                                 st.download_button(
-                                    '📝 Modified SIDE', data=run.get('modified_side'), 
+                                    '📝 Modified SIDE', data=sides['modified_side'], 
                                     file_name=f'{selected_app}_modified.side', 
                                     mime='application/json', 
                                     key=f"mod_{run.get('_id', i)}"
@@ -985,7 +1573,7 @@ def render_app_tab(selected_app):
                                             st.write(f"🔍 **Debug: All files in ZIP:** {zf.namelist()}")
                                         
                                         for name in zf.namelist():
-                                            if name.lower().endswith(('.png', '.jpg', '.jpeg')):
+                                            if name.lower().endswith(IMAGE_EXTENSIONS):
                                                 screenshot_files.append(name)
                                                 if debug_mode:
                                                     st.write(f"✅ **Found screenshot:** {name}")
@@ -1054,7 +1642,7 @@ def render_app_tab(selected_app):
                                                                 image=img_data,
                                                                 caption=f"Screenshot: {name}",
                                                                 use_container_width=True,
-                                                                output_format="PNG"
+                                                                output_format="auto"
                                                             )
                                                             
                                                             # Add download button for individual screenshot
@@ -1062,7 +1650,7 @@ def render_app_tab(selected_app):
                                                                 "💾 Download This Screenshot",
                                                                 data=img_data,
                                                                 file_name=name,
-                                                                mime="image/png",
+                                                                mime=image_mime(name),
                                                                 key=f"dl_img_{i}_{idx}_{name.replace('.', '_')}"
                                                             )
                                                         except Exception as img_error:
@@ -1072,7 +1660,7 @@ def render_app_tab(selected_app):
                                                                 "💾 Download (Display Failed)",
                                                                 data=img_data,
                                                                 file_name=name,
-                                                                mime="image/png",
+                                                                mime=image_mime(name),
                                                                 key=f"dl_img_err_{i}_{idx}_{name.replace('.', '_')}"
                                                             )
                                         else:
@@ -1083,12 +1671,57 @@ def render_app_tab(selected_app):
                                     if st.checkbox("Show Error Details", key=f"img_debug_{i}"):
                                         st.exception(e)
                         
+                        # Network waterfall - HARs are only decompressed when asked for
+                        har_names = []
+                        if zip_bytes:
+                            try:
+                                with io.BytesIO(zip_bytes) as zb, zipfile.ZipFile(zb) as zf:
+                                    har_names = sorted(n for n in zf.namelist() if n.endswith(har_capture.HAR_EXTENSIONS))
+                            except Exception:
+                                har_names = []
+                        if har_names and st.checkbox(f"🌐 Network Waterfall ({len(har_names)} HAR files)", key=f"har_{i}"):
+                            har_name = st.selectbox("HAR file", har_names, key=f"har_select_{i}")
+                            try:
+                                with io.BytesIO(zip_bytes) as zb, zipfile.ZipFile(zb) as zf:
+                                    har_data = zf.read(har_name)
+                                har = har_capture.load_har(har_data, har_name)
+                                rows = har_capture.waterfall_rows(har)
+                                st.caption(har.get('log', {}).get('comment', ''))
+                                if rows:
+                                    st.vega_lite_chart(
+                                        {"values": rows},
+                                        {
+                                            "mark": {"type": "bar", "tooltip": True},
+                                            "encoding": {
+                                                "y": {"field": "request", "type": "nominal", "sort": None,
+                                                      "axis": {"labelLimit": 400}, "title": None},
+                                                "x": {"field": "start", "type": "quantitative", "title": "ms"},
+                                                "x2": {"field": "end"},
+                                                "color": {"field": "type", "type": "nominal"},
+                                                "tooltip": [
+                                                    {"field": "url"}, {"field": "status"}, {"field": "duration"},
+                                                    {"field": "wait"}, {"field": "size"}
+                                                ]
+                                            },
+                                            "height": max(200, 16 * len(rows))
+                                        },
+                                        use_container_width=True
+                                    )
+                                else:
+                                    st.info("No requests recorded in this HAR file.")
+                                st.download_button(
+                                    "💾 Download HAR", data=har_data, file_name=har_name,
+                                    mime="application/octet-stream", key=f"dl_har_{i}"
+                                )
+                            except Exception as e:
+                                st.error(f"Could not load HAR file: {e}")
+                        
                         # Additional Gallery View Option
                         if zip_bytes:
                             try:
                                 with io.BytesIO(zip_bytes) as zb, zipfile.ZipFile(zb) as zf:
                                     screenshot_files = [name for name in zf.namelist() 
-                                                      if name.lower().endswith(('.png', '.jpg', '.jpeg'))]
+                                                      if name.lower().endswith(IMAGE_EXTENSIONS)]
                                     
                                     if len(screenshot_files) > 1:
                                         if st.button(f"🖼️ Gallery View ({len(screenshot_files)} screenshots)", key=f"gallery_{i}"):
@@ -1109,13 +1742,13 @@ def render_app_tab(selected_app):
                                                             image=img_data,
                                                             caption=name,
                                                             use_container_width=True,
-                                                            output_format="PNG"
+                                                            output_format="auto"
                                                         )
                                                         st.download_button(
                                                             "💾",
                                                             data=img_data,
                                                             file_name=name,
-                                                            mime="image/png",
+                                                            mime=image_mime(name),
                                                             key=f"gallery_dl_{i}_{idx}_{name.replace('.', '_')}",
                                                             help=f"Download {name}"
                                                         )
@@ -1125,7 +1758,7 @@ def render_app_tab(selected_app):
                                                             "💾 Download",
                                                             data=img_data,
                                                             file_name=name,
-                                                            mime="image/png",
+                                                            mime=image_mime(name),
                                                             key=f"gallery_dl_err_{i}_{idx}_{name.replace('.', '_')}",
                                                             help=f"Download {name} (display failed)"
                                                         )
@@ -1152,7 +1785,15 @@ def render_app_tab(selected_app):
 # ============================================================================
 # MAIN EXECUTION
 # ============================================================================
-if selected_app:
+if selected_app and st.session_state.get('profile_render'):
+    render_profiler = Profiler(st.session_state.get('profile_mode', 'sampler'))
+    with render_profiler:
+        render_app_tab(selected_app)
+    with st.expander("📊 Render Profile", expanded=True):
+        st.code(render_profiler.summary(), language=None)
+        for name, data in render_profiler.artifacts(f"render_{int(time.time())}").items():
+            st.download_button(f"📥 {name}", data, name, key=f"render_profile_{name}")
+elif selected_app:
     render_app_tab(selected_app)
 else:
     st.markdown('<h3 class="section-header">Select or create an application from the sidebar to get started</h3>', unsafe_allow_html=True)
@@ -0,0 +1,150 @@
+"""
+Runner Worker
+Pulls SIDE jobs from the shared job queue (job_queue.py), runs them with the
+local runner and uploads the results ZIP, heartbeating while it works.
+
+  python worker.py                  # one worker on this machine
+  python worker.py --processes 3    # three local worker processes
+  MONGO_URI=mongodb://... python worker.py --name build-agent-1
+"""
+
+import argparse
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+
+from job_queue import (
+    HEARTBEAT_INTERVAL, claim_job, finish_job, heartbeat, queue_available, register_worker,
+    requeue_expired, unregister_worker
+)
+from resource_governor import governor
+from runner import run_test_and_get_results
+
+IDLE_POLL_INTERVAL = 2.0   # seconds between queue polls while idle
+
+
+class Worker:
+    """One job at a time: claim, run locally, upload, repeat."""
+
+    def __init__(self, name=None, poll_interval=IDLE_POLL_INTERVAL):
+        self.id = name or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.poll_interval = poll_interval
+        self.jobs_done = 0
+        self._job_id = None
+        self._cancel = threading.Event()  # Set when the running job's lease is lost
+        self._stop = threading.Event()            # No new jobs - the current one still finishes
+        self._heartbeat_stop = threading.Event()  # Set once the current job is done, so its lease holds
+
+    def _heartbeat_loop(self):
+        while not self._heartbeat_stop.wait(HEARTBEAT_INTERVAL):
+            try:
+                stats = {k: v for k, v in governor.status().items() if k != 'active'}
+                if not heartbeat(self.id, self._job_id, stats) and self._job_id is not None:
+                    if not self._cancel.is_set():
+                        print(f"⚠️ Job {self._job_id} was reassigned or cancelled - stopping its run")
+                    # Another worker may already be running it - don't hold a browser for nothing
+                    self._cancel.set()
+            except Exception as e:
+                print(f"⚠️ Heartbeat failed: {e}")
+
+    def run_job(self, job):
+        self._cancel.clear()
+        self._job_id = job['_id']
+        print(f"🔄 Job {job['_id']}: {job.get('app_name')}/{job.get('test_type')} (attempt {job.get('attempts')})")
+        started = time.time()
+        try:
+            zip_bytes = run_test_and_get_results(
+                json.loads(job['side']), job.get('app_name'), job.get('test_type', 'test'),
+                config=job.get('config') or None, timeout=job.get('timeout') or 300, backend='local',
+                cancel=self._cancel
+            )
+            accepted = finish_job(self.id, job['_id'], zip_bytes=zip_bytes)
+        except Exception as e:
+            print(f"❌ Job {job['_id']} failed: {e}")
+            accepted = finish_job(self.id, job['_id'], error=f"Worker {self.id}: {e}")
+        finally:
+            self._job_id = None
+        if accepted:
+            self.jobs_done += 1
+        state = 'uploaded' if accepted else 'discarded (job no longer ours)'
+        print(f"✅ Job {job['_id']} finished in {time.time() - started:.1f}s - {state}")
+
+    def serve(self):
+        register_worker(self.id, {'host': socket.gethostname(), 'pid': os.getpid(),
+                                  'slots': governor.slot_limit()})
+        heartbeat_thread = threading.Thread(target=self._heartbeat_loop, daemon=True)
+        heartbeat_thread.start()
+        print(f"✅ Worker {self.id} waiting for jobs")
+        try:
+            while not self._stop.is_set():
+                try:
+                    requeue_expired()
+                    job = claim_job(self.id)
+                except Exception as e:
+                    print(f"⚠️ Queue unavailable: {e}")
+                    job = None
+                if job is None:
+                    self._stop.wait(self.poll_interval)
+                    continue
+                self.run_job(job)
+        finally:
+            # run_job has returned - only now may the lease lapse
+            self._stop.set()
+            self._heartbeat_stop.set()
+            unregister_worker(self.id)
+            print(f"🛑 Worker {self.id} stopped after {self.jobs_done} job(s)")
+
+    def stop(self, *_):
+        """Graceful shutdown: finish (and keep heartbeating) the running job, then exit."""
+        self._stop.set()
+
+
+def spawn_local_workers(count, name=None, poll_interval=IDLE_POLL_INTERVAL):
+    """Run several worker processes on this machine (a stand-in for separate hosts)."""
+    processes = []
+    for i in range(count):
+        command = [sys.executable, os.path.abspath(__file__), '--poll', str(poll_interval)]
+        if name:
+            command += ['--name', f"{name}-{i+1}"]
+        processes.append(subprocess.Popen(command))
+    print(f"✅ Started {count} worker processes")
+    try:
+        for process in processes:
+            process.wait()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.send_signal(signal.SIGTERM)
+        for process in processes:
+            process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Testing Portal runner worker")
+    parser.add_argument('--name', help="Worker id (default host-pid-random)")
+    parser.add_argument('--processes', type=int, default=1, help="Local worker processes to start")
+    parser.add_argument('--poll', type=float, default=IDLE_POLL_INTERVAL, help="Seconds between idle queue polls")
+    args = parser.parse_args()
+
+    if not queue_available():
+        print("❌ Job queue unavailable - check MONGO_URI")
+        sys.exit(1)
+    if args.processes > 1:
+        spawn_local_workers(args.processes, args.name, args.poll)
+        return
+
+    worker = Worker(args.name, args.poll)
+    signal.signal(signal.SIGTERM, worker.stop)
+    try:
+        worker.serve()
+    except KeyboardInterrupt:
+        worker.stop()
+
+
+if __name__ == '__main__':
+    main()